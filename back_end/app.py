@@ -1,26 +1,37 @@
+import os
 from flask import Flask
-from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
-from main_app.extensions import db
+from main_app.extensions import db, storage, response_cache, compression, instrumentation, metrics, slow_query_log, change_feed
 from main_app.routes.main_routes import register_routes
+from main_app.commands import register_commands
+from main_app.serialization import FastJSONProvider
 
 
 
-migrate = Migrate()
 jwt = JWTManager()
 
-def create_app():
+def create_app(config_object='config.Config'):
     app = Flask(__name__)
-    app.config.from_object('config.Config')
+    app.config.from_object(config_object)
+    app.json = FastJSONProvider(app)
 
     db.init_app(app)
-    migrate.init_app(app, db)
     jwt.init_app(app)
+    storage.init_app(app)
+    response_cache.init_app(app)
+    compression.init_app(app)
+    instrumentation.init_app(app)
+    metrics.init_app(app)
+    slow_query_log.init_app(app)
+    change_feed.init_app(app)
 
     register_routes(app)
+    register_commands(app)
 
     return app
 
 if __name__ == '__main__':
+    # שרת פיתוח בלבד. בפרודקשן: gunicorn -c gunicorn.conf.py wsgi:app
     app = create_app()
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    app.run(host=os.getenv('FLASK_RUN_HOST', '127.0.0.1'), port=int(os.getenv('FLASK_RUN_PORT', 5000)),
+            debug=os.getenv('FLASK_DEBUG', 'false').lower() in ('1', 'true'))
@@ -0,0 +1,107 @@
+"""Home-screen load time: one request per list versus a single POST /batch.
+
+Starts gunicorn (gthread, one worker) and loads the lists a client shows on its
+home screen - clusters, posts, an event, a lesson category and the unanswered
+questions - the way the client does today, one request after the other, and as
+one POST /batch. --rtt-ms adds a simulated network round trip to every request,
+so the waterfall cost shows up the way it does on a mobile connection. The batch
+is measured with BATCH_MAX_WORKERS=1 (sub-requests in sequence) and with
+--workers threads (independent reads in parallel).
+
+    cd back_end && python -m benchmarks.bench_batch
+    cd back_end && python -m benchmarks.bench_batch --rtt-ms 150 --rounds 30
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import tempfile
+import time
+from benchmarks.loadtest import prepare_work_dir, start_server, wait_until_ready
+from benchmarks.run_benchmarks import percentile
+
+# רשימת האירועים יושבת על '/' ומוסתרת ע"י נתיב הבית, לכן אירוע בודד
+HOME_SCREEN = ['/clusters', '/posts?fields=id,title', '/1', '/category/1', '/questions/unanswered']
+
+
+def round_trip(connection, rtt, method, path, body=None):
+    time.sleep(rtt)
+    headers = {'Content-Type': 'application/json'} if body is not None else {}
+    connection.request(method, path, body=body, headers=headers)
+    response = connection.getresponse()
+    data = response.read()
+    if response.status != 200:
+        raise SystemExit(f"{method} {path} returned {response.status}: {data[:200]!r}")
+    return data
+
+
+def waterfall(connection, rtt):
+    for path in HOME_SCREEN:
+        round_trip(connection, rtt, 'GET', path)
+
+
+def batch(connection, rtt):
+    body = json.dumps({'requests': [{'id': path, 'path': path} for path in HOME_SCREEN]})
+    data = json.loads(round_trip(connection, rtt, 'POST', '/batch', body))
+    failed = [item['id'] for item in data['responses'] if item['status'] != 200]
+    if failed:
+        raise SystemExit(f"batch sub-requests failed: {failed}")
+
+
+def measure(port, load, rtt, rounds):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    try:
+        load(connection, 0)
+        timings = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            load(connection, rtt)
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+    finally:
+        connection.close()
+
+
+def run_server(args, work_dir, batch_workers, loads):
+    os.environ['BATCH_MAX_WORKERS'] = str(batch_workers)
+    server_args = argparse.Namespace(server='gunicorn', worker_class='gthread', workers=1, port=args.port, cache='none')
+    process, _ = start_server(server_args, work_dir)
+    try:
+        wait_until_ready(f"http://127.0.0.1:{args.port}", process)
+        return {name: measure(args.port, load, args.rtt_ms / 1000, args.rounds) for name, load in loads.items()}
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rtt-ms', type=float, default=80, help='Simulated network round trip per request.')
+    parser.add_argument('--rounds', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=4, help='BATCH_MAX_WORKERS for the parallel batch run.')
+    parser.add_argument('--scale', default='1k')
+    parser.add_argument('--port', type=int, default=8767)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='seminary-bench-batch-')
+    try:
+        prepare_work_dir(argparse.Namespace(work_dir=work_dir, scale=args.scale, media_files=2))
+        results = run_server(args, work_dir, 1, {
+            f"{len(HOME_SCREEN)} requests": waterfall,
+            'batch, sequential': batch,
+        })
+        results.update(run_server(args, work_dir, args.workers, {
+            f"batch, {args.workers} threads": batch,
+        }))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"\nhome screen, {args.rtt_ms:.0f} ms simulated round trip, {args.rounds} loads")
+    print(f"{'':<20}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, timings in results.items():
+        print(f"{name:<20}{percentile(timings, 50):>10.1f}{percentile(timings, 95):>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
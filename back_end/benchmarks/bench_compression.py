@@ -0,0 +1,68 @@
+"""Compression benchmark: CPU time per response vs. bytes saved for each encoding and level.
+
+    cd back_end && python -m benchmarks.bench_compression --rows 2000
+"""
+import argparse
+import random
+import time
+from benchmarks.bench_serialization import seed
+from benchmarks.common import create_benchmark_app
+
+
+def measure(label, compress, payload, repeat):
+    timings = []
+    compressed = b''
+    for _ in range(repeat):
+        started = time.process_time()
+        compressed = compress(payload)
+        timings.append(time.process_time() - started)
+    best = min(timings) * 1000
+    saved = len(payload) - len(compressed)
+    print(f"{label:<28} cpu {best:8.2f} ms   size {len(compressed) / 1024:8.1f} KiB   "
+          f"ratio {len(payload) / len(compressed):5.1f}x   saved {saved / 1024 / max(best, 0.001):8.1f} KiB/cpu-ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--chunk-size', type=int, default=16 * 1024)
+    args = parser.parse_args()
+
+    random.seed(1)
+    app = create_benchmark_app()
+    with app.app_context():
+        from main_app.compression import GzipCompressor, BrotliCompressor, compress_stream, brotli
+        from main_app.models.schemas import POST_SCHEMA
+
+        seed(args.rows)
+        payload = app.json.dumps(POST_SCHEMA.dump()).encode()
+
+    def whole(make_compressor):
+        def compress(data):
+            compressor = make_compressor()
+            return compressor.compress(data) + compressor.finish()
+        return compress
+
+    def streamed(make_compressor):
+        # אותו payload בחלקים, עם flush אחרי כל חלק - כמו תגובה מוזרמת
+        def compress(data):
+            chunks = [data[i:i + args.chunk_size] for i in range(0, len(data), args.chunk_size)]
+            return b''.join(compress_stream(chunks, make_compressor()))
+        return compress
+
+    print(f"/posts payload for {args.rows} posts: {len(payload) / 1024:.1f} KiB")
+    for level in (1, 6, 9):
+        measure(f"gzip level {level}", whole(lambda: GzipCompressor(level)), payload, args.repeat)
+    measure("gzip level 6 (streamed)", streamed(lambda: GzipCompressor(6)), payload, args.repeat)
+
+    if brotli is None:
+        print("brotli not installed - skipping br")
+        return
+    for level in (1, 4, 6, 11):
+        measure(f"brotli level {level}", whole(lambda: BrotliCompressor(level)), payload, args.repeat)
+    measure("brotli level 4 (streamed)", streamed(lambda: BrotliCompressor(4)), payload, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+"""Concurrent-connection capacity at fixed memory: slow media downloads plus list requests.
+
+Starts gunicorn with a fixed number of workers (one by default) per worker class,
+keeps --connections clients downloading a --file-mb lesson file at --read-kbps
+each (a small receive buffer, so the server really waits on every client), and
+meanwhile probes the list endpoints in forum_routes, events_routes and
+lesson_routes. Reports how many downloads were served at the same time, their
+time to first byte, the probe latency and the peak RSS of the workers.
+
+    cd back_end && python -m benchmarks.bench_concurrency
+    cd back_end && python -m benchmarks.bench_concurrency --classes gthread,gevent --connections 300 --duration 20
+"""
+import argparse
+import glob
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import urllib.request
+from benchmarks.loadtest import prepare_work_dir, start_server, wait_until_ready
+from benchmarks.run_benchmarks import percentile
+
+# רשימת האירועים יושבת על '/' ומוסתרת ע"י נתיב הבית, לכן אירוע בודד
+PROBE_PATHS = ['/posts?fields=id,title', '/1', '/category/1', '/clusters']
+RECEIVE_BUFFER = 16 * 1024
+
+
+class Downloads:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.first_byte = []
+        self.completed = 0
+        self.starved = 0
+        self.errors = 0
+
+    def started(self, waited):
+        with self.lock:
+            self.first_byte.append(waited)
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def finished(self, completed):
+        with self.lock:
+            self.in_flight -= 1
+            if completed:
+                self.completed += 1
+
+
+def download(port, path, read_bytes_per_second, downloads, deadline):
+    while time.monotonic() < deadline:
+        requested = time.monotonic()
+        receiving = False
+        try:
+            # חיבור גולמי עם buffer קבלה קטן - אחרת ה-kernel בולע את כל הקובץ והשרת לא מחכה ללקוח
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as client:
+                client.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER)
+                client.settimeout(120)
+                client.connect(('127.0.0.1', port))
+                client.sendall(f"GET {path} HTTP/1.1\r\nHost: bench\r\nConnection: close\r\n\r\n".encode())
+                chunk = client.recv(RECEIVE_BUFFER)
+                if time.monotonic() >= deadline:
+                    # לא קיבל מענה בזמן הריצה - לקוח שהשרת לא הגיע אליו
+                    downloads.starved += 1
+                    return
+                if not chunk.startswith(b'HTTP/1.1 200'):
+                    raise OSError(chunk[:40])
+                downloads.started(time.monotonic() - requested)
+                receiving = True
+                window_started, window_bytes = time.monotonic(), 0
+                while chunk and time.monotonic() < deadline:
+                    window_bytes += len(chunk)
+                    # קצב קריאה קבוע לכל לקוח, כמו נגן שמוריד בקצב ההשמעה
+                    ahead = window_bytes / read_bytes_per_second - (time.monotonic() - window_started)
+                    if ahead > 0:
+                        time.sleep(ahead)
+                    chunk = client.recv(RECEIVE_BUFFER)
+            # הורדה שנקטעה בסוף הזמן לא נספרת כהושלמה
+            downloads.finished(not chunk)
+        except OSError:
+            if receiving:
+                downloads.finished(False)
+            with downloads.lock:
+                downloads.errors += 1
+            time.sleep(0.1)
+
+
+def probe(base_url, timings, errors, deadline, interval):
+    index = 0
+    while time.monotonic() < deadline:
+        path = PROBE_PATHS[index % len(PROBE_PATHS)]
+        index += 1
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(base_url + path, timeout=60) as response:
+                response.read()
+            timings.append((time.perf_counter() - started) * 1000)
+        except OSError:
+            errors.append(path)
+        time.sleep(interval)
+
+
+def worker_pids(master_pid):
+    pids = []
+    for stat_path in glob.glob('/proc/[0-9]*/stat'):
+        try:
+            with open(stat_path) as stat_file:
+                fields = stat_file.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == master_pid:
+            pids.append(int(stat_path.split('/')[2]))
+    return pids
+
+
+def rss_mib(pid):
+    try:
+        with open(f"/proc/{pid}/status") as status_file:
+            for line in status_file:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def prepare_media(work_dir, size):
+    # קובץ אחד גדול במקום המדיה הקטנה של ה-seed, כדי שהורדה תימשך מספיק זמן
+    from benchmarks.common import create_benchmark_app
+    from main_app.extensions import db, storage
+    from main_app.models.models import Lesson
+
+    app = create_benchmark_app(work_dir)
+    with app.app_context():
+        lesson = db.session.get(Lesson, 1)
+        storage.backend.put(lesson.s3_key, os.urandom(size), content_type='audio/mpeg')
+        lesson.file_size = size
+        db.session.commit()
+
+
+def run_class(args, work_dir, worker_class):
+    server_args = argparse.Namespace(server='gunicorn', worker_class=worker_class, workers=args.workers,
+                                     port=args.port, cache='none')
+    process, _ = start_server(server_args, work_dir)
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        wait_until_ready(base_url, process)
+        workers = worker_pids(process.pid)
+        baseline_rss = sum(rss_mib(pid) for pid in workers)
+
+        downloads = Downloads()
+        probe_timings, probe_errors = [], []
+        deadline = time.monotonic() + args.duration
+        threads = [threading.Thread(target=download, daemon=True,
+                                    args=(args.port, '/lessons/1/media', args.read_kbps * 1024, downloads, deadline))
+                   for _ in range(args.connections)]
+        threads.append(threading.Thread(target=probe, daemon=True,
+                                        args=(base_url, probe_timings, probe_errors, deadline, args.probe_interval)))
+        for thread in threads:
+            thread.start()
+
+        peak_rss = baseline_rss
+        while time.monotonic() < deadline:
+            peak_rss = max(peak_rss, sum(rss_mib(pid) for pid in worker_pids(process.pid)))
+            time.sleep(0.5)
+        for thread in threads:
+            thread.join(timeout=10)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    return {
+        'workers': len(workers),
+        'peak_in_flight': downloads.peak_in_flight,
+        'completed': downloads.completed,
+        'download_errors': downloads.errors,
+        'starved': downloads.starved,
+        'ttfb_p50': percentile(downloads.first_byte, 50) * 1000 if downloads.first_byte else None,
+        'ttfb_p95': percentile(downloads.first_byte, 95) * 1000 if downloads.first_byte else None,
+        'probe_count': len(probe_timings),
+        'probe_errors': len(probe_errors),
+        'probe_p50': percentile(probe_timings, 50) if probe_timings else None,
+        'probe_p95': percentile(probe_timings, 95) if probe_timings else None,
+        'baseline_rss': baseline_rss,
+        'peak_rss': peak_rss,
+    }
+
+
+def fmt(value):
+    return '-' if value is None else f"{value:.0f}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--classes', default='gthread,gevent')
+    parser.add_argument('--workers', type=int, default=1, help='Fixed per class, so memory stays comparable.')
+    parser.add_argument('--connections', type=int, default=200)
+    parser.add_argument('--file-mb', type=float, default=4)
+    parser.add_argument('--read-kbps', type=int, default=256, help='Read rate of each downloading client.')
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--probe-interval', type=float, default=0.1)
+    parser.add_argument('--scale', default='1k')
+    parser.add_argument('--port', type=int, default=8766)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='seminary-bench-concurrency-')
+    try:
+        prepare_work_dir(argparse.Namespace(work_dir=work_dir, scale=args.scale, media_files=2))
+        prepare_media(work_dir, int(args.file_mb * 1024 * 1024))
+        results = {}
+        for worker_class in args.classes.split(','):
+            print(f"=== {worker_class}: {args.connections} downloads at {args.read_kbps} KiB/s for {args.duration:.0f}s")
+            results[worker_class] = run_class(args, work_dir, worker_class)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"\n{'class':<9}{'workers':>8}{'served at once':>16}{'never served':>14}{'done':>6}{'errors':>8}{'ttfb p50':>10}"
+          f"{'ttfb p95':>10}{'lists':>7}{'list p50':>10}{'list p95':>10}{'list err':>10}{'RSS MiB':>14}")
+    for worker_class, result in results.items():
+        print(f"{worker_class:<9}{result['workers']:>8}{result['peak_in_flight']:>16}{result['starved']:>14}{result['completed']:>6}"
+              f"{result['download_errors']:>8}{fmt(result['ttfb_p50']):>10}{fmt(result['ttfb_p95']):>10}"
+              f"{result['probe_count']:>7}{fmt(result['probe_p50']):>10}{fmt(result['probe_p95']):>10}{result['probe_errors']:>10}"
+              f"{result['baseline_rss']:>7.0f}->{result['peak_rss']:<5.0f}")
+    print("\nttfb and list latency in ms; RSS is the sum over the workers, idle -> peak")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Deleting a large thread: statements, time and memory of ForumService.delete_post.
+
+Builds a post with --replies replies, every --attachment-every-th of them with a
+stored attachment, deletes it through the service and reports how many SQL
+statements ran, how long it took, the peak Python allocation during the delete
+and whether any replies, attachment rows or stored files were left behind.
+
+    cd back_end && python -m benchmarks.bench_delete
+    cd back_end && python -m benchmarks.bench_delete --replies 20000 --attachment-every 10
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from sqlalchemy import event, func, select
+from benchmarks.common import create_benchmark_app
+
+
+def seed(replies, attachment_every):
+    from main_app.extensions import db, storage
+    from main_app.models.models import User, ForumPost, ForumReply, Attachment
+
+    start = datetime(2024, 1, 1)
+    db.session.execute(db.insert(User), [{
+        'id': 1, 'firstname': 'Bench', 'lastname': 'User', 'email': 'bench@example.com', 'class_cycle': 1
+    }])
+    db.session.execute(db.insert(ForumPost), [{
+        'id': 1, 'title': 'Long thread', 'content': 'lorem ipsum', 'author_id': 1, 'reply_count': replies
+    }])
+    db.session.execute(db.insert(ForumReply), [{
+        'id': i + 1, 'content': 'reply ' * 20, 'created_at': start + timedelta(seconds=i), 'author_id': 1, 'post_id': 1
+    } for i in range(replies)])
+    attachments = [{
+        'filename': f"file{i}.txt", 's3_key': f"attachments/bench/{i}.txt", 'file_type': 'text/plain',
+        'file_size': 4, 'reply_id': i + 1
+    } for i in range(0, replies, attachment_every)]
+    attachments.append({'filename': 'post.txt', 's3_key': 'attachments/bench/post.txt', 'file_type': 'text/plain',
+                        'file_size': 4, 'post_id': 1})
+    db.session.execute(db.insert(Attachment), attachments)
+    db.session.commit()
+    for attachment in attachments:
+        storage.backend.put(attachment['s3_key'], b'data', content_type='text/plain')
+    return [attachment['s3_key'] for attachment in attachments]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--replies', type=int, default=5000)
+    parser.add_argument('--attachment-every', type=int, default=20, help='Every n-th reply has an attachment.')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='seminary-bench-delete-')
+    try:
+        app = create_benchmark_app(work_dir)
+        with app.app_context():
+            from main_app.extensions import db, storage
+            from main_app.models.models import ForumReply, Attachment
+            from main_app.services.forum_service import ForumService
+
+            keys = seed(args.replies, args.attachment_every)
+            recorded = []
+
+            def record(conn, cursor, statement, *rest):
+                recorded.append(statement)
+            event.listen(db.engine, 'before_cursor_execute', record)
+
+            tracemalloc.start()
+            started = time.perf_counter()
+            ForumService().delete_post(1)
+            elapsed = (time.perf_counter() - started) * 1000
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            statements = recorded[:]
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+            replies_left = db.session.execute(select(func.count()).select_from(ForumReply)).scalar()
+            attachments_left = db.session.execute(select(func.count()).select_from(Attachment)).scalar()
+            files_left = sum(1 for key in keys if os.path.exists(storage.backend.local_path(key)))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"delete_post with {args.replies} replies and {len(keys)} attachments")
+    print(f"  statements     {len(statements)}")
+    print(f"  time           {elapsed:.1f} ms")
+    print(f"  peak memory    {peak / 1024:.0f} KiB")
+    print(f"  left behind    {replies_left} replies, {attachments_left} attachment rows, {files_left} stored files")
+    for statement in statements:
+        print('   ', ' '.join(statement.split())[:110])
+
+
+if __name__ == '__main__':
+    main()
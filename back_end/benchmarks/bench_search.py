@@ -0,0 +1,135 @@
+"""Search benchmark: FTS5 index build time and query latency at a realistic corpus size.
+
+The seed data uses a tiny vocabulary, so every query would match every row. This
+script builds its own corpus instead: --questions questions (default 100k) with a
+Zipf-distributed vocabulary, most of them answered. It reports how long the
+triggers add to bulk inserts, how long a full 'flask search rebuild' takes, and
+the latency of free-text search and similar-question suggestions. Exits with
+status 1 when the p95 of similar-question suggestions is over --budget-ms.
+
+    cd back_end && python -m benchmarks.bench_search
+    cd back_end && python -m benchmarks.bench_search --questions 20000 --queries 500 --budget-ms 20
+"""
+import argparse
+import itertools
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from benchmarks.common import create_benchmark_app
+from benchmarks.run_benchmarks import percentile
+from benchmarks.seed_data import insert_batches
+
+SYLLABLES = ('ba', 'ke', 'di', 'lo', 'mu', 'sha', 'ra', 'te', 'vi', 'no', 'ga', 'zu', 'pe', 'chi', 'ma', 'el')
+
+
+class Corpus:
+    def __init__(self, vocabulary_size, seed_value):
+        self.rng = random.Random(seed_value)
+        words = set()
+        while len(words) < vocabulary_size:
+            words.add(''.join(self.rng.choice(SYLLABLES) for _ in range(self.rng.randint(2, 4))))
+        self.words = sorted(words)
+        self.rng.shuffle(self.words)
+        # התפלגות Zipf: מילים מעטות נפוצות מאוד, רוב אוצר המילים נדיר
+        self.cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, vocabulary_size + 1)))
+
+    def text(self, mean_words):
+        length = max(3, int(self.rng.lognormvariate(math.log(mean_words), 0.5)))
+        return ' '.join(self.rng.choices(self.words, cum_weights=self.cum_weights, k=length))
+
+    def questions(self, count):
+        started = datetime(2024, 1, 1)
+        for question_id in range(1, count + 1):
+            answered = self.rng.random() < 0.7
+            yield {'id': question_id, 'question': self.text(12), 'asked_at': started + timedelta(minutes=question_id),
+                   'updated_at': started, 'asker_id': 1, 'is_answered': answered,
+                   'answer_count': 1 if answered else 0}
+
+    def answers(self, questions):
+        for question in questions:
+            if question['is_answered']:
+                yield {'answer': self.text(40), 'answerer_id': 1, 'question_id': question['id'],
+                       'answered_at': question['asked_at'], 'updated_at': question['asked_at']}
+
+
+def measure(label, run, queries):
+    timings = []
+    matches = 0
+    for query in queries:
+        started = time.perf_counter()
+        matches += len(run(query))
+        timings.append((time.perf_counter() - started) * 1000)
+    p95 = percentile(timings, 95)
+    print(f"{label:<24} p50 {percentile(timings, 50):7.2f} ms   p95 {p95:7.2f} ms   p99 {percentile(timings, 99):7.2f} ms"
+          f"   avg results {matches / len(queries):5.1f}")
+    return p95
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--questions', type=int, default=100_000)
+    parser.add_argument('--vocabulary', type=int, default=30_000)
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--budget-ms', type=float, default=20.0, help='Budget for the similar-question p95.')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='seminary-bench-search-')
+    try:
+        app = create_benchmark_app(work_dir, SLOW_QUERY_THRESHOLD_MS=0)
+        with app.app_context():
+            from main_app.extensions import db
+            from main_app.models.models import User, Question, Answer
+            from main_app.services.search_service import QuestionSearchService
+
+            corpus = Corpus(args.vocabulary, args.seed)
+            db.session.execute(db.insert(User), [{'id': 1, 'firstname': 'Bench', 'lastname': 'Staff',
+                                                  'email': 'search@bench.local', 'is_staff_member': True}])
+            questions = list(corpus.questions(args.questions))
+
+            # insert דרך ה-triggers - העלות של עדכון האינדקס בזמן כתיבה
+            started = time.perf_counter()
+            insert_batches(Question, questions)
+            answer_count = insert_batches(Answer, corpus.answers(questions))
+            db.session.commit()
+            insert_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            QuestionSearchService.rebuild_index()
+            rebuild_seconds = time.perf_counter() - started
+            index_bytes = os.path.getsize(os.path.join(work_dir, 'benchmark.db'))
+
+            print(f"corpus: {args.questions} questions, {answer_count} answers, vocabulary {args.vocabulary}")
+            print(f"insert with live index {insert_seconds:6.2f} s   full rebuild {rebuild_seconds:6.2f} s   "
+                  f"database {index_bytes / 1024 / 1024:6.1f} MiB\n")
+
+            rng = random.Random(args.seed + 1)
+            search_queries = [' '.join(rng.choices(corpus.words[:5000], k=rng.randint(1, 2)))
+                              for _ in range(args.queries)]
+            # שאלה "חדשה" - ניסוח אחר של שאלה קיימת: חלק מהמילים שלה ועוד מילים אקראיות
+            similar_queries = []
+            for question in rng.sample(questions, args.queries):
+                words = question['question'].split()
+                similar_queries.append(' '.join(rng.sample(words, max(2, len(words) * 2 // 3)) + [corpus.text(4)]))
+
+            measure('search', lambda query: QuestionSearchService.search(query), search_queries)
+            measure('search answered only', lambda query: QuestionSearchService.search(query, answered=True),
+                    search_queries)
+            similar_p95 = measure('similar questions', lambda query: QuestionSearchService.find_similar(query),
+                                  similar_queries)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if similar_p95 > args.budget_ms:
+        print(f"\nFAIL: similar-question p95 {similar_p95:.2f} ms is over the {args.budget_ms:.0f} ms budget")
+        sys.exit(1)
+    print(f"\nOK: similar-question p95 within {args.budget_ms:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Serialization benchmark: ORM to_dict + stdlib json vs. orjson vs. Core row schemas.
+
+    cd back_end && python -m benchmarks.bench_serialization --rows 10000
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from benchmarks.common import create_benchmark_app
+
+
+def seed(rows):
+    from main_app.extensions import db
+    from main_app.models.models import User, ForumPost, Attachment
+
+    db.session.execute(db.insert(User), [{
+        'firstname': 'Bench', 'lastname': 'User', 'email': 'bench@example.com', 'class_cycle': 1
+    }])
+    start = datetime(2024, 1, 1)
+    db.session.execute(db.insert(ForumPost), [{
+        'id': i + 1, 'title': f"Post {i}", 'content': 'lorem ipsum dolor sit amet ' * random.randint(5, 40),
+        'created_at': start + timedelta(minutes=i), 'author_id': 1
+    } for i in range(rows)])
+    db.session.execute(db.insert(Attachment), [{
+        'filename': f"file{i}.pdf", 's3_key': f"attachments/{i}", 'file_type': 'application/pdf',
+        'file_size': 1000 + i, 'upload_date': start, 'post_id': random.randint(1, rows)
+    } for i in range(rows // 2)])
+    db.session.commit()
+
+
+def measure(label, fn, repeat):
+    timings = []
+    payload = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        payload = fn()
+        timings.append(time.perf_counter() - started)
+    best = min(timings) * 1000
+    print(f"{label:<42} best {best:8.1f} ms   payload {len(payload) / 1024:8.0f} KiB")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    random.seed(1)
+    app = create_benchmark_app()
+    with app.app_context():
+        from main_app.extensions import db
+        from main_app.models.models import ForumPost
+        from main_app.models.schemas import POST_SCHEMA
+        from main_app.serialization import FastJSONProvider, orjson
+
+        seed(args.rows)
+        provider = FastJSONProvider(app)
+
+        def orm_stdlib():
+            db.session.expunge_all()
+            posts = [post.to_dict() for post in ForumPost.query.all()]
+            return json.dumps(posts, sort_keys=True)
+
+        def orm_fast():
+            db.session.expunge_all()
+            return provider.dumps([post.to_dict() for post in ForumPost.query.all()])
+
+        def rows_fast():
+            return provider.dumps(POST_SCHEMA.dump())
+
+        print(f"{args.rows} posts, orjson {'available' if orjson else 'NOT installed (stdlib fallback)'}")
+        baseline = measure('ORM to_dict + stdlib json', orm_stdlib, args.repeat)
+        measure('ORM to_dict + FastJSONProvider', orm_fast, args.repeat)
+        fastest = measure('RowSchema (Core rows) + FastJSONProvider', rows_fast, args.repeat)
+        print(f"speedup: {baseline / fastest:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Startup benchmark: time, peak RSS and import profile of create_app().
+
+Every run is a fresh interpreter, so nothing is already imported. The app is
+built with the production storage backend (S3) to check that boto3 and the
+other heavy dependencies are only loaded on first use. Exits with status 1
+when a budget is exceeded or a lazy dependency was imported at startup.
+
+    cd back_end && python -m benchmarks.bench_startup
+    cd back_end && python -m benchmarks.bench_startup --max-seconds 0.8 --max-rss-mb 90 --top 20
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+LAZY_MODULES = ('boto3', 'botocore', 'numpy', 'alembic', 'flask_migrate')
+
+CHILD_SCRIPT = """
+import json, resource, sys, time
+started = time.perf_counter()
+from app import create_app
+from benchmarks.common import make_config
+create_app(make_config(sys.argv[1], STORAGE_BACKEND='s3', S3_BUCKET_NAME='benchmark-bucket', AWS_REGION='us-east-1'))
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    'seconds': elapsed,
+    'rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'loaded': [name for name in sys.argv[2].split(',') if name in sys.modules],
+}))
+"""
+
+
+def run_child(work_dir, importtime=False):
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', CHILD_SCRIPT, work_dir, ','.join(LAZY_MODULES)]
+    env = dict(os.environ, PYTHONPATH=os.getcwd())
+    result = subprocess.run(command, capture_output=True, text=True, env=env, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def import_profile(stderr):
+    # שורות -X importtime: "import time: self [us] | cumulative | name", הזחה לפי עומק הייבוא
+    per_package = defaultdict(int)
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        per_package[name.strip().split('.')[0]] += int(self_us)
+    return sorted(per_package.items(), key=lambda item: item[1], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=12)
+    parser.add_argument('--max-seconds', type=float, default=0.6, help='Budget for the median create_app() time.')
+    parser.add_argument('--max-rss-mb', type=float, default=75, help='Budget for peak RSS after create_app().')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='seminary-bench-startup-')
+    runs = [run_child(work_dir)[0] for _ in range(args.runs)]
+    seconds = statistics.median(run['seconds'] for run in runs)
+    rss_mb = max(run['rss_kb'] for run in runs) / 1024
+    loaded = sorted({name for run in runs for name in run['loaded']})
+
+    _, stderr = run_child(work_dir, importtime=True)
+    print(f"{'package':<28}{'import ms':>10}")
+    for package, self_us in import_profile(stderr)[:args.top]:
+        print(f"{package:<28}{self_us / 1000:>10.1f}")
+
+    print(f"\ncreate_app(): median {seconds * 1000:.0f} ms over {args.runs} runs (budget {args.max_seconds * 1000:.0f} ms), "
+          f"peak RSS {rss_mb:.1f} MiB (budget {args.max_rss_mb:.0f} MiB)")
+
+    failures = []
+    if seconds > args.max_seconds:
+        failures.append(f"startup took {seconds * 1000:.0f} ms")
+    if rss_mb > args.max_rss_mb:
+        failures.append(f"peak RSS was {rss_mb:.1f} MiB")
+    if loaded:
+        failures.append(f"imported at startup: {', '.join(loaded)}")
+
+    if failures:
+        print('FAIL: ' + '; '.join(failures))
+        sys.exit(1)
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
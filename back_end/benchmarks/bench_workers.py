@@ -0,0 +1,36 @@
+"""Gunicorn worker class comparison on the mixed load-test workload.
+
+Runs benchmarks.loadtest once per worker class (same data, same mix, same
+number of virtual users) and prints throughput, error rate and latency side
+by side. Extra arguments are passed through to 'loadtest run'.
+
+    cd back_end && python -m benchmarks.bench_workers --scale 10k --users 32 --duration 30
+    cd back_end && python -m benchmarks.bench_workers --classes sync,gthread --profile media
+"""
+import argparse
+from benchmarks.loadtest import build_parser, command_run
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--classes', default='sync,gthread,gevent')
+    args, passthrough = parser.parse_known_args()
+
+    loadtest_parser = build_parser()
+    results = {}
+    for worker_class in args.classes.split(','):
+        print(f"\n=== {worker_class} ===")
+        run_args = loadtest_parser.parse_args(['run', '--server', 'gunicorn', '--worker-class', worker_class]
+                                              + passthrough)
+        results[worker_class] = command_run(run_args)
+
+    print(f"\n{'worker class':<14}{'workers':>9}{'req/s':>10}{'errors':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for worker_class, report in results.items():
+        totals = report['totals']
+        print(f"{worker_class:<14}{str(report['meta']['workers'] or 'auto'):>9}{totals['rps']:>10.1f}"
+              f"{totals['error_rate'] * 100:>8.1f}%{totals['p50_ms']:>10.1f}{totals['p95_ms']:>10.1f}"
+              f"{totals['p99_ms']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
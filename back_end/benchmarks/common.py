@@ -0,0 +1,38 @@
+import os
+import tempfile
+from config import Config
+
+
+def make_config(work_dir=None, **overrides):
+    work_dir = work_dir or tempfile.mkdtemp(prefix='seminary-bench-')
+
+    class BenchmarkConfig(Config):
+        SECRET_KEY = 'benchmark-secret'
+        JWT_SECRET_KEY = 'benchmark-jwt-secret'
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(work_dir, 'benchmark.db')}"
+        STORAGE_BACKEND = 'local'
+        LOCAL_STORAGE_PATH = os.path.join(work_dir, 'storage')
+        RESPONSE_CACHE_BACKEND = 'none'
+        SLOW_QUERY_LOG_PATH = os.path.join(work_dir, 'slow_queries.jsonl')
+        # ה-identity ב-login הוא מספר, ו-PyJWT החדש דורש sub מסוג string
+        JWT_VERIFY_SUB = False
+
+    for key, value in overrides.items():
+        setattr(BenchmarkConfig, key, value)
+    return BenchmarkConfig
+
+
+def create_benchmark_app(work_dir=None, **overrides):
+    from app import create_app
+    from main_app.extensions import db
+
+    app = create_app(make_config(work_dir, **overrides))
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def create_server_app():
+    # נקודת הכניסה של השרת ש-loadtest מפעיל (gunicorn או werkzeug) מול תיקיית עבודה שכבר נזרעה
+    return create_benchmark_app(os.environ['BENCH_WORK_DIR'],
+                                RESPONSE_CACHE_BACKEND=os.getenv('BENCH_RESPONSE_CACHE', 'none'))
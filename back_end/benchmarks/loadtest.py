@@ -0,0 +1,423 @@
+"""HTTP load-test harness with scripted user journeys and configurable traffic mixes.
+
+Starts the app on a local port (gunicorn when installed, otherwise the threaded
+werkzeug server) against a seeded database and filesystem storage, drives it
+with N concurrent virtual users for a fixed duration, and writes a JSON report
+per run so results can be compared across commits.
+
+    cd back_end && python -m benchmarks.loadtest run --scale 10k --users 16 --duration 30 --profile default
+    cd back_end && python -m benchmarks.loadtest run --url http://127.0.0.1:8000 --mix browse_clusters=70,open_thread=30
+    cd back_end && python -m benchmarks.loadtest compare reports/abc123-default.json reports/def456-default.json
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+from benchmarks.run_benchmarks import percentile, git_commit
+from benchmarks.seed_data import SCALES, BENCHMARK_PASSWORD, table_sizes
+
+PROFILES = {
+    'default': {'login': 5, 'browse_clusters': 30, 'open_thread': 30, 'reply': 10, 'upload_attachment': 3,
+                'listen_lesson': 15, 'ask_question': 7},
+    'read-heavy': {'login': 2, 'browse_clusters': 40, 'open_thread': 40, 'listen_lesson': 18},
+    'write-heavy': {'login': 5, 'browse_clusters': 10, 'open_thread': 15, 'reply': 40, 'upload_attachment': 15,
+                    'ask_question': 15},
+    'media': {'listen_lesson': 80, 'browse_clusters': 20},
+}
+
+MEDIA_RANGE = 256 * 1024
+
+
+def encode_multipart(field, filename, content, content_type):
+    boundary = uuid.uuid4().hex
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: {content_type}\r\n\r\n").encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+class VirtualUser:
+    def __init__(self, index, url, sizes, media_files, seed):
+        parsed = urllib.parse.urlparse(url)
+        self.host, self.port = parsed.hostname, parsed.port or 80
+        self.index = index
+        self.sizes = sizes
+        self.media_files = media_files
+        self.rng = random.Random(seed + index)
+        self.user_id = 4 + index % max(1, sizes['users'] - 4)
+        self.token = None
+        self.connection = None
+        self.samples = []  # (journey, request name, status, seconds)
+        self.journeys = []  # (journey, ok, seconds, finished_at)
+
+    def connect(self):
+        self.connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+
+    def request(self, journey, name, method, path, json_body=None, body=None, headers=None):
+        headers = dict(headers or {})
+        if self.token:
+            headers['Authorization'] = f"Bearer {self.token}"
+        if json_body is not None:
+            body = json.dumps(json_body).encode()
+            headers['Content-Type'] = 'application/json'
+
+        started = time.perf_counter()
+        try:
+            if self.connection is None:
+                self.connect()
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            data = response.read()
+            status = response.status
+            is_json = (response.getheader('Content-Type') or '').startswith('application/json')
+        except (OSError, http.client.HTTPException):
+            # חיבור keep-alive שנסגר בצד השרת - נפתח חיבור חדש בבקשה הבאה
+            if self.connection is not None:
+                self.connection.close()
+            self.connection = None
+            data, status, is_json = b'', 599, False
+        self.samples.append((journey, name, status, time.perf_counter() - started))
+        if status >= 400:
+            raise JourneyFailed(name, status)
+        return json.loads(data) if is_json and data else None
+
+    def pick(self, table, skew=1.1):
+        # התפלגות עם זנב ארוך - מעט פוסטים/קטגוריות מקבלים את רוב התנועה
+        return min(self.sizes[table], int(self.rng.paretovariate(skew)))
+
+    def login(self, journey='login'):
+        self.token = None
+        data = self.request(journey, 'login', 'POST', '/login',
+                            json_body={'email': f"user{self.user_id}@bench.local", 'password': BENCHMARK_PASSWORD})
+        self.token = data['access_token']
+
+
+class JourneyFailed(Exception):
+    pass
+
+
+def journey_login(user):
+    user.login()
+
+
+def journey_browse_clusters(user):
+    user.request('browse_clusters', 'clusters_overview', 'GET', '/clusters/overview')
+
+
+def journey_open_thread(user):
+    user.request('open_thread', 'replies', 'GET', f"/posts/{user.pick('posts')}/replies")
+
+
+def journey_reply(user):
+    post_id = user.pick('posts')
+    user.request('reply', 'replies', 'GET', f"/posts/{post_id}/replies")
+    user.request('reply', 'create_reply', 'POST', f"/posts/{post_id}/replies",
+                 json_body={'content': 'load test reply ' * user.rng.randint(1, 20)})
+
+
+def journey_upload_attachment(user):
+    post = user.request('upload_attachment', 'create_post', 'POST', '/posts', json_body={
+        'title': f"Load {uuid.uuid4().hex[:12]}", 'content': 'load test post ' * 30})
+    body, content_type = encode_multipart('file', 'notes.pdf', user.rng.randbytes(64 * 1024), 'application/pdf')
+    user.request('upload_attachment', 'upload', 'POST', f"/posts/{post['id']}/attachments",
+                 body=body, headers={'Content-Type': content_type})
+
+
+def journey_listen_lesson(user):
+    user.request('listen_lesson', 'category', 'GET', f"/category/{user.pick('categories', 0.9)}")
+    lesson_id = user.rng.randint(1, user.media_files)
+    for start in (0, MEDIA_RANGE):
+        user.request('listen_lesson', 'media_range', 'GET', f"/lessons/{lesson_id}/media",
+                     headers={'Range': f"bytes={start}-{start + MEDIA_RANGE - 1}"})
+
+
+def journey_ask_question(user):
+    user.request('ask_question', 'unanswered', 'GET', '/questions/unanswered')
+    user.request('ask_question', 'create_question', 'POST', '/questions',
+                 json_body={'question': 'load test question ' * user.rng.randint(1, 10)})
+
+
+JOURNEYS = {
+    'login': journey_login,
+    'browse_clusters': journey_browse_clusters,
+    'open_thread': journey_open_thread,
+    'reply': journey_reply,
+    'upload_attachment': journey_upload_attachment,
+    'listen_lesson': journey_listen_lesson,
+    'ask_question': journey_ask_question,
+}
+
+
+def parse_mix(profile, mix):
+    weights = dict(PROFILES[profile])
+    if mix:
+        weights = {}
+        for item in mix.split(','):
+            name, _, weight = item.partition('=')
+            if name not in JOURNEYS:
+                raise SystemExit(f"Unknown journey: {name} (known: {', '.join(JOURNEYS)})")
+            weights[name] = float(weight or 1)
+    return weights
+
+
+def run_user(user, weights, deadline, think_time):
+    names, cum_weights = list(weights), []
+    total = 0
+    for name in names:
+        total += weights[name]
+        cum_weights.append(total)
+    try:
+        user.login('setup')
+    except JourneyFailed:
+        pass
+    while time.monotonic() < deadline:
+        name = user.rng.choices(names, cum_weights=cum_weights)[0]
+        started = time.perf_counter()
+        try:
+            JOURNEYS[name](user)
+            ok = True
+        except (JourneyFailed, KeyError, TypeError):
+            ok = False
+        user.journeys.append((name, ok, time.perf_counter() - started, time.monotonic()))
+        if think_time:
+            time.sleep(user.rng.expovariate(1 / think_time))
+    if user.connection is not None:
+        user.connection.close()
+
+
+def summarize(users, measured_from, measured_to):
+    # זמן החימום (ramp-up) לא נכנס לסטטיסטיקה
+    duration = measured_to - measured_from
+    journeys = {}
+    for user in users:
+        for name, ok, seconds, finished_at in user.journeys:
+            if finished_at < measured_from:
+                continue
+            journey = journeys.setdefault(name, {'timings': [], 'errors': 0, 'requests': {}})
+            journey['timings'].append(seconds * 1000)
+            journey['errors'] += not ok
+        for name, request_name, status, seconds in user.samples:
+            if name in journeys:
+                stats = journeys[name]['requests'].setdefault(request_name, {'timings': [], 'errors': 0})
+                stats['timings'].append(seconds * 1000)
+                stats['errors'] += status >= 400
+
+    def describe(timings, errors):
+        return {'count': len(timings), 'errors': errors, 'error_rate': round(errors / len(timings), 4),
+                'rps': round(len(timings) / duration, 2), 'p50_ms': round(percentile(timings, 50), 2),
+                'p95_ms': round(percentile(timings, 95), 2), 'p99_ms': round(percentile(timings, 99), 2)}
+
+    report = {}
+    all_timings, total_errors = [], 0
+    for name, journey in sorted(journeys.items()):
+        report[name] = describe(journey['timings'], journey['errors'])
+        report[name]['requests'] = {request_name: describe(stats['timings'], stats['errors'])
+                                    for request_name, stats in journey['requests'].items()}
+        for stats in journey['requests'].values():
+            all_timings.extend(stats['timings'])
+            total_errors += stats['errors']
+    totals = describe(all_timings, total_errors) if all_timings else {'count': 0, 'errors': 0, 'rps': 0.0,
+                                                                      'error_rate': 0.0}
+    totals['requests'] = totals.pop('count')
+    return totals, report
+
+
+def wait_until_ready(url, process, timeout=30):
+    parsed = urllib.parse.urlparse(url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise SystemExit(f"Server exited with status {process.returncode}")
+        try:
+            connection = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=2)
+            connection.request('GET', '/')
+            connection.getresponse().read()
+            connection.close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit(f"Server at {url} did not start within {timeout}s")
+
+
+def start_server(args, work_dir):
+    env = dict(os.environ, BENCH_WORK_DIR=work_dir, BENCH_RESPONSE_CACHE=args.cache)
+    server = args.server
+    if server == 'auto':
+        try:
+            import gunicorn  # noqa: F401
+            server = 'gunicorn'
+        except ImportError:
+            server = 'werkzeug'
+
+    if server == 'gunicorn':
+        # אותו gunicorn.conf.py של הפרודקשן; רק הכתובת, סוג ה-worker והלוגים מוחלפים
+        env.update(METRICS_MULTIPROC_DIR=os.path.join(work_dir, 'metrics'), GUNICORN_WORKER_CLASS=args.worker_class,
+                   GUNICORN_ACCESS_LOG='', GUNICORN_LOG_LEVEL='warning')
+        if args.workers:
+            env['GUNICORN_WORKERS'] = str(args.workers)
+        command = [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', '--bind', f"127.0.0.1:{args.port}",
+                   'benchmarks.common:create_server_app()']
+    else:
+        command = [sys.executable, '-m', 'benchmarks.loadtest', 'serve', '--port', str(args.port)]
+    process = subprocess.Popen(command, env=env, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return process, server
+
+
+def prepare_work_dir(args):
+    from benchmarks.common import create_benchmark_app
+    from benchmarks.seed_data import is_seeded, seed
+
+    work_dir = args.work_dir or os.path.join(tempfile.gettempdir(), f"seminary-bench-{args.scale}")
+    os.makedirs(work_dir, exist_ok=True)
+    app = create_benchmark_app(work_dir)
+    with app.app_context():
+        if not is_seeded():
+            print(f"seeding {args.scale} into {work_dir} ...")
+            seed(SCALES[args.scale], files=args.media_files)
+    return work_dir
+
+
+def command_run(args):
+    weights = parse_mix(args.profile, args.mix)
+    sizes = table_sizes(SCALES[args.scale])
+    process = None
+    server = 'external'
+    url = args.url
+    if url is None:
+        work_dir = prepare_work_dir(args)
+        url = f"http://127.0.0.1:{args.port}"
+        process, server = start_server(args, work_dir)
+
+    try:
+        wait_until_ready(url, process)
+        users = [VirtualUser(index, url, sizes, args.media_files, args.seed) for index in range(args.users)]
+        started = time.monotonic()
+        deadline = started + args.ramp_up + args.duration
+        threads = []
+        for user in users:
+            thread = threading.Thread(target=run_user, args=(user, weights, deadline, args.think_time), daemon=True)
+            thread.start()
+            threads.append(thread)
+            time.sleep(args.ramp_up / max(1, args.users))
+        for thread in threads:
+            thread.join()
+        totals, journeys = summarize(users, started + args.ramp_up, deadline)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    commit = git_commit() or 'unknown'
+    report = {
+        'meta': {'commit': commit, 'profile': args.profile if not args.mix else 'custom', 'mix': weights,
+                 'users': args.users, 'duration': args.duration, 'ramp_up': args.ramp_up, 'scale': args.scale,
+                 'server': server, 'workers': args.workers, 'worker_class': args.worker_class,
+                 'cache': args.cache, 'created': time.strftime('%Y-%m-%dT%H:%M:%S')},
+        'totals': totals,
+        'journeys': journeys
+    }
+    print_report(report)
+
+    os.makedirs(args.report_dir, exist_ok=True)
+    server_tag = f"gunicorn-{args.worker_class}" if server == 'gunicorn' else server
+    path = os.path.join(args.report_dir,
+                        f"{commit}-{report['meta']['profile']}-{args.scale}-u{args.users}-{server_tag}.json")
+    with open(path, 'w') as report_file:
+        json.dump(report, report_file, indent=2)
+    print(f"\nreport written to {path}")
+    return report
+
+
+def print_report(report):
+    meta, totals = report['meta'], report['totals']
+    print(f"commit {meta['commit']}  profile {meta['profile']}  users {meta['users']}  {meta['duration']}s  "
+          f"server {meta['server']} x{meta['workers']}")
+    print(f"total: {totals['requests']} requests  {totals['rps']} req/s  error rate {totals['error_rate'] * 100:.2f}%\n")
+    print(f"{'journey':<20}{'count':>8}{'per s':>9}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, journey in report['journeys'].items():
+        print(f"{name:<20}{journey['count']:>8}{journey['rps']:>9.1f}{journey['error_rate'] * 100:>7.1f}%"
+              f"{journey['p50_ms']:>10.1f}{journey['p95_ms']:>10.1f}{journey['p99_ms']:>10.1f}")
+
+
+def command_compare(args):
+    with open(args.before) as before_file, open(args.after) as after_file:
+        before, after = json.load(before_file), json.load(after_file)
+
+    def change(old, new):
+        return f"{(new / old - 1) * 100:+.0f}%" if old else 'n/a'
+
+    print(f"{before['meta']['commit']} -> {after['meta']['commit']}")
+    print(f"total req/s {before['totals']['rps']} -> {after['totals']['rps']} "
+          f"({change(before['totals']['rps'], after['totals']['rps'])}), error rate "
+          f"{before['totals']['error_rate'] * 100:.2f}% -> {after['totals']['error_rate'] * 100:.2f}%\n")
+    print(f"{'journey':<20}{'per s':>18}{'p50 ms':>22}{'p95 ms':>22}")
+    for name in sorted(set(before['journeys']) | set(after['journeys'])):
+        old, new = before['journeys'].get(name), after['journeys'].get(name)
+        if old is None or new is None:
+            print(f"{name:<20} only in {'after' if old is None else 'before'}")
+            continue
+        print(f"{name:<20}"
+              f"{old['rps']:>7.1f} -> {new['rps']:<7.1f}{change(old['rps'], new['rps']):>3}"
+              f"{old['p50_ms']:>8.1f} -> {new['p50_ms']:<7.1f}{change(old['p50_ms'], new['p50_ms']):>5}"
+              f"{old['p95_ms']:>8.1f} -> {new['p95_ms']:<7.1f}{change(old['p95_ms'], new['p95_ms']):>5}")
+
+
+def command_serve(args):
+    # שרת werkzeug מרובה threads, כשאין gunicorn בסביבה
+    import logging
+    from werkzeug.serving import run_simple
+    from benchmarks.common import create_server_app
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    logging.disable(logging.CRITICAL)
+    run_simple('127.0.0.1', args.port, create_server_app(), threaded=True)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='Run a load test and write a report.')
+    run.add_argument('--url', help='Target an already running server instead of starting one.')
+    run.add_argument('--scale', choices=SCALES, default='10k')
+    run.add_argument('--work-dir')
+    run.add_argument('--profile', choices=PROFILES, default='default')
+    run.add_argument('--mix', help='Custom journey weights, e.g. browse_clusters=60,reply=40.')
+    run.add_argument('--users', type=int, default=16)
+    run.add_argument('--duration', type=float, default=30)
+    run.add_argument('--ramp-up', type=float, default=3)
+    run.add_argument('--think-time', type=float, default=0, help='Mean seconds between journeys.')
+    run.add_argument('--seed', type=int, default=1)
+    run.add_argument('--media-files', type=int, default=20)
+    run.add_argument('--server', choices=['auto', 'gunicorn', 'werkzeug'], default='auto')
+    run.add_argument('--workers', type=int, help='Defaults to the CPU based count in gunicorn.conf.py.')
+    run.add_argument('--worker-class', choices=['sync', 'gthread', 'gevent'], default='gthread')
+    run.add_argument('--port', type=int, default=8765)
+    run.add_argument('--cache', choices=['none', 'memory'], default='none')
+    run.add_argument('--report-dir', default=os.path.join(tempfile.gettempdir(), 'seminary-loadtest-reports'))
+    run.set_defaults(handler=command_run)
+
+    compare = commands.add_parser('compare', help='Compare two reports.')
+    compare.add_argument('before')
+    compare.add_argument('after')
+    compare.set_defaults(handler=command_compare)
+
+    serve = commands.add_parser('serve', help=argparse.SUPPRESS)
+    serve.add_argument('--port', type=int, default=8765)
+    serve.set_defaults(handler=command_serve)
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,316 @@
+"""Endpoint benchmark suite: every GET and write endpoint through the Flask test client.
+
+Seeds (or reuses) a database at the chosen scale, runs each scenario, records
+latency percentiles and SQL query counts, and compares them with a JSON
+baseline. Exits with status 1 when a scenario regresses beyond the tolerance.
+
+    cd back_end && python -m benchmarks.run_benchmarks --scale 10k --update-baseline
+    cd back_end && python -m benchmarks.run_benchmarks --scale 10k
+"""
+import argparse
+import gc
+import io
+import json
+import logging
+import math
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+from benchmarks.common import create_benchmark_app
+from benchmarks.seed_data import SCALES, ADMIN_ID, STUDENT_ID, BENCHMARK_PASSWORD, is_seeded, seed
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), 'baselines')
+
+
+class Scenario:
+    def __init__(self, name, method, path, body=None, auth='access', store=None, headers=None, files=None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.body = body
+        self.auth = auth
+        self.store = store
+        self.headers = headers or {}
+        self.files = files
+
+    def request_kwargs(self, ctx, i, tokens):
+        headers = dict(self.headers)
+        if self.auth:
+            headers['Authorization'] = f"Bearer {tokens[self.auth]}"
+        kwargs = {'method': self.method, 'headers': headers,
+                  'path': self.path(ctx, i) if callable(self.path) else self.path}
+        if self.files is not None:
+            kwargs['data'] = self.files(i)
+            kwargs['content_type'] = 'multipart/form-data'
+        elif self.body is not None:
+            kwargs['json'] = self.body(ctx, i) if callable(self.body) else self.body
+        return kwargs
+
+
+def created(ctx, key, i):
+    # מזהה שנוצר בתרחיש קודם באותו סבב; 0 (לא קיים) אם היצירה נכשלה
+    ids = ctx.get(key, [])
+    return ids[i] if i < len(ids) else 0
+
+
+def build_scenarios(run_id):
+    upload = lambda name, extension, content_type: lambda i: {
+        'file': (io.BytesIO(os.urandom(32 * 1024)), f"{name}-{i}{extension}", content_type)}
+    return [
+        # קריאות
+        Scenario('index', 'GET', '/', auth=None),
+        Scenario('users_list', 'GET', '/users', auth=None),
+        Scenario('user_detail', 'GET', f"/users/{STUDENT_ID}", auth=None),
+        Scenario('posts_list', 'GET', '/posts', auth=None),
+        Scenario('posts_list_fields', 'GET', '/posts?fields=id,title,created_at', auth=None),
+        Scenario('post_replies', 'GET', '/posts/1/replies', auth=None),
+        Scenario('clusters_list', 'GET', '/clusters', auth=None),
+        Scenario('clusters_overview', 'GET', '/clusters/overview', auth=None),
+        Scenario('attachment_download', 'GET', '/attachments/1/download', auth=None),
+        Scenario('event_detail', 'GET', '/1', auth=None),
+        Scenario('event_images', 'GET', '/1/images', auth=None),
+        Scenario('category_lessons', 'GET', '/category/1', auth=None),
+        Scenario('lesson_media', 'GET', '/lessons/1/media', auth=None),
+        Scenario('lesson_media_range', 'GET', '/lessons/1/media', auth=None, headers={'Range': 'bytes=0-65535'}),
+        Scenario('question_detail', 'GET', '/questions/1', auth=None),
+        Scenario('question_thread', 'GET', '/questions/1/thread', auth=None),
+        Scenario('questions_with_answers', 'GET', '/questions?limit=50', auth=None),
+        Scenario('questions_with_answers_asker', 'GET', f"/questions?asker_id={STUDENT_ID}&answered=true", auth=None),
+        Scenario('questions_unanswered', 'GET', '/questions/unanswered', auth=None),
+        Scenario('question_queue', 'GET', '/questions/queue?limit=50'),
+        Scenario('question_queue_stats', 'GET', '/questions/queue/stats'),
+        Scenario('user_questions', 'GET', f"/users/{ADMIN_ID}/questions", auth=None),
+        Scenario('user_answers', 'GET', f"/users/{ADMIN_ID}/answers", auth=None),
+
+        # משתמשים
+        Scenario('create_user', 'POST', '/users', auth=None, body=lambda ctx, i: {
+            'firstname': 'Bench', 'lastname': 'User', 'email': f"bench-{run_id}-{i}@bench.local",
+            'password': BENCHMARK_PASSWORD, 'user_type': 'is_guest'}),
+        Scenario('login', 'POST', '/login', auth=None,
+                 body={'email': f"user{ADMIN_ID}@bench.local", 'password': BENCHMARK_PASSWORD}),
+        Scenario('refresh', 'POST', '/refresh', auth='refresh'),
+        Scenario('update_user', 'PUT', f"/users/{ADMIN_ID}", body={'firstname': 'Admin'}),
+        Scenario('update_user_role', 'PUT', f"/users/{STUDENT_ID}/role", body={'is_student': True}),
+
+        # פורום - כל שרשרת יוצרת, מעדכנת ומוחקת את מה שיצרה
+        Scenario('create_cluster', 'POST', '/clusters', store='clusters',
+                 body=lambda ctx, i: {'name': f"Bench cluster {run_id}-{i}"}),
+        Scenario('update_cluster', 'PUT', lambda ctx, i: f"/clusters/{created(ctx, 'clusters', i)}",
+                 body={'description': 'updated'}),
+        Scenario('create_post', 'POST', '/posts', store='posts',
+                 body=lambda ctx, i: {'title': f"Bench post {run_id}-{i}", 'content': 'benchmark ' * 50,
+                                      'cluster_id': created(ctx, 'clusters', i) or None}),
+        Scenario('update_post', 'PUT', lambda ctx, i: f"/posts/{created(ctx, 'posts', i)}",
+                 body={'content': 'updated ' * 50}),
+        Scenario('create_reply', 'POST', lambda ctx, i: f"/posts/{created(ctx, 'posts', i)}/replies",
+                 store='replies', body={'content': 'reply ' * 20}),
+        Scenario('update_reply', 'PUT', lambda ctx, i: f"/replies/{created(ctx, 'replies', i)}",
+                 body={'content': 'updated reply'}),
+        Scenario('delete_reply', 'DELETE', lambda ctx, i: f"/replies/{created(ctx, 'replies', i)}"),
+        Scenario('add_attachment', 'POST', lambda ctx, i: f"/posts/{created(ctx, 'posts', i)}/attachments",
+                 store='attachments', files=upload('attachment', '.pdf', 'application/pdf')),
+        Scenario('delete_attachment', 'DELETE', lambda ctx, i:
+                 f"/posts/{created(ctx, 'posts', i)}/attachments/{created(ctx, 'attachments', i)}"),
+        Scenario('delete_post', 'DELETE', lambda ctx, i: f"/posts/{created(ctx, 'posts', i)}"),
+        Scenario('delete_cluster', 'DELETE', lambda ctx, i: f"/clusters/{created(ctx, 'clusters', i)}"),
+
+        # אירועים. הנתיבים של כתיבת שיעורים (POST /, PUT/DELETE /<id>) זהים לאלה של האירועים
+        # ונתפסים על ידם, ולכן אין להם תרחיש נפרד
+        Scenario('create_event', 'POST', '/', store='events',
+                 body=lambda ctx, i: {'title': f"Bench event {run_id}-{i}", 'description': 'benchmark'}),
+        Scenario('update_event', 'PUT', lambda ctx, i: f"/{created(ctx, 'events', i)}", body={'title': 'updated'}),
+        Scenario('add_event_image', 'POST', lambda ctx, i: f"/{created(ctx, 'events', i)}/images",
+                 files=upload('image', '.jpg', 'image/jpeg')),
+        Scenario('delete_event', 'DELETE', lambda ctx, i: f"/{created(ctx, 'events', i)}"),
+        Scenario('create_category', 'POST', '/category', store='categories',
+                 body=lambda ctx, i: {'name': f"Bench {run_id[:6]}-{i}"}),
+        Scenario('delete_category', 'DELETE', lambda ctx, i: f"/category/{created(ctx, 'categories', i)}"),
+
+        # שאלות ותשובות
+        Scenario('create_question', 'POST', '/questions', store='questions',
+                 body={'question': 'How long is the benchmark?'}),
+        Scenario('update_question', 'PUT', lambda ctx, i: f"/questions/{created(ctx, 'questions', i)}",
+                 body={'question': 'How long is the benchmark, really?'}),
+        Scenario('create_answer', 'POST', lambda ctx, i: f"/questions/{created(ctx, 'questions', i)}/answers",
+                 store='answers', body={'answer': 'About a minute.'}),
+        Scenario('update_answer', 'PUT', lambda ctx, i: f"/answers/{created(ctx, 'answers', i)}",
+                 body={'answer': 'About two minutes.'}),
+        Scenario('delete_answer', 'DELETE', lambda ctx, i: f"/answers/{created(ctx, 'answers', i)}"),
+        Scenario('delete_question', 'DELETE', lambda ctx, i: f"/questions/{created(ctx, 'questions', i)}"),
+        Scenario('claim_next_question', 'POST', '/questions/queue/claim'),
+    ]
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def login(client):
+    response = client.post('/login', json={'email': f"user{ADMIN_ID}@bench.local", 'password': BENCHMARK_PASSWORD})
+    if response.status_code != 200:
+        raise SystemExit(f"Benchmark login failed: {response.status_code} {response.get_data(as_text=True)}")
+    data = response.get_json()
+    return {'access': data['access_token'], 'refresh': data['refresh_token']}
+
+
+def run_scenarios(app, scenarios, iterations, warmup, query_counter):
+    client = app.test_client()
+    tokens = login(client)
+    ctx = {}
+    results = {}
+    for scenario in scenarios:
+        timings, queries, statuses = [], [], Counter()
+        # GC באמצע מדידה הוא הגורם העיקרי לקפיצות ב-p95 בין ריצות
+        gc.collect()
+        gc.disable()
+        for i in range(warmup + iterations):
+            kwargs = scenario.request_kwargs(ctx, i, tokens)
+            query_counter[0] = 0
+            started = time.perf_counter()
+            response = client.open(**kwargs)
+            body = response.get_data()
+            elapsed = time.perf_counter() - started
+            if scenario.store:
+                data = response.get_json(silent=True) if response.status_code in (200, 201) else None
+                ctx.setdefault(scenario.store, []).append(data.get('id', 0) if isinstance(data, dict) else 0)
+            response.close()
+            if i < warmup:
+                continue
+            timings.append(elapsed * 1000)
+            queries.append(query_counter[0])
+            statuses[response.status_code] += 1
+        gc.enable()
+
+        status = statuses.most_common(1)[0][0]
+        results[scenario.name] = {
+            'method': scenario.method,
+            'status': status,
+            'ok': status < 400,
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'queries': percentile(queries, 50),
+            'bytes': len(body)
+        }
+    return results
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    regressions = []
+    for name, result in results.items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        if base['ok'] and not result['ok']:
+            regressions.append(f"{name}: status {base['status']} -> {result['status']}")
+        if result['queries'] > base['queries']:
+            regressions.append(f"{name}: queries {base['queries']} -> {result['queries']}")
+        # p95 רועש יותר (fsync של SQLite, GC) - מקבל כפול מהסבולת של החציון
+        for metric, allowed in (('p50_ms', tolerance), ('p95_ms', tolerance * 2)):
+            limit = base[metric] * (1 + allowed)
+            if result[metric] > limit and result[metric] - base[metric] > min_delta_ms:
+                regressions.append(f"{name}: {metric} {base[metric]:.2f} -> {result[metric]:.2f} "
+                                   f"(+{(result[metric] / base[metric] - 1) * 100:.0f}%)")
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline):
+    print(f"{'scenario':<24}{'status':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}{'base p95':>10}")
+    for name, result in results.items():
+        base = baseline['results'].get(name, {}) if baseline else {}
+        base_p95 = f"{base['p95_ms']:.2f}" if base else '-'
+        print(f"{name:<24}{result['status']:>7}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+              f"{result['p99_ms']:>10.2f}{result['queries']:>9}{base_p95:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scale', choices=SCALES, default='1k')
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--work-dir', help='Reuse a seeded database (seeded on first use).')
+    parser.add_argument('--only', help='Comma separated scenario names.')
+    parser.add_argument('--cache', choices=['none', 'memory'], default='none', help='Response cache backend.')
+    parser.add_argument('--baseline', help='Baseline JSON (default benchmarks/baselines/<scale>.json).')
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed relative p50 slowdown (p95 gets twice this).')
+    parser.add_argument('--min-delta-ms', type=float, default=2.0, help='Ignore slowdowns smaller than this.')
+    parser.add_argument('--output', help='Also write this run to a JSON file.')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    if not args.verbose:
+        # שגיאות 500 של נתיבים שבורים ואזהרות N+1 נכנסות לתוצאות, לא למסך
+        logging.disable(logging.CRITICAL)
+
+    work_dir = args.work_dir or os.path.join(tempfile.gettempdir(), f"seminary-bench-{args.scale}")
+    os.makedirs(work_dir, exist_ok=True)
+    app = create_benchmark_app(work_dir, RESPONSE_CACHE_BACKEND=args.cache)
+
+    from main_app.extensions import db
+    from sqlalchemy import event
+    query_counter = [0]
+    with app.app_context():
+        if not is_seeded():
+            print(f"seeding {args.scale} into {work_dir} ...")
+            seed(SCALES[args.scale])
+        event.listen(db.engine, 'after_cursor_execute',
+                     lambda *_: query_counter.__setitem__(0, query_counter[0] + 1))
+
+    scenarios = build_scenarios(uuid.uuid4().hex[:8])
+    if args.only:
+        wanted = set(args.only.split(','))
+        scenarios = [scenario for scenario in scenarios if scenario.name in wanted]
+    results = run_scenarios(app, scenarios, args.iterations, args.warmup, query_counter)
+
+    run = {
+        'meta': {'scale': args.scale, 'iterations': args.iterations, 'cache': args.cache, 'commit': git_commit(),
+                 'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+                 'machine': platform.machine(), 'created': time.strftime('%Y-%m-%dT%H:%M:%S')},
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(run, output_file, indent=2)
+
+    baseline_path = args.baseline or os.path.join(BASELINE_DIR, f"{args.scale}.json")
+    baseline = None
+    if os.path.exists(baseline_path) and not args.update_baseline:
+        with open(baseline_path) as baseline_file:
+            baseline = json.load(baseline_file)
+    print_results(results, baseline)
+
+    if baseline is None:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, 'w') as baseline_file:
+            json.dump(run, baseline_file, indent=2)
+        print(f"baseline written to {baseline_path}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) against {baseline_path} (commit {baseline['meta'].get('commit')}):")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print(f"\nno regressions against {baseline_path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,250 @@
+"""Synthetic data generator for benchmarks and load tests.
+
+Seeds every table at a configurable scale with skewed, realistic distributions:
+a few very active users write most of the content, a few posts get most of the
+replies, timestamps lean towards the recent past and text lengths are log-normal.
+
+    cd back_end && python -m benchmarks.seed_data --scale 100k --work-dir /tmp/bench-100k
+"""
+import argparse
+import itertools
+import random
+import time
+from datetime import datetime, timedelta
+from werkzeug.security import generate_password_hash
+
+SCALES = {'1k': 1_000, '10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+# חלק כל טבלה מסך השורות
+TABLE_SHARES = {
+    'users': 0.05, 'posts': 0.15, 'replies': 0.35, 'attachments': 0.05, 'events': 0.01,
+    'images': 0.03, 'lessons': 0.05, 'questions': 0.15
+}
+
+BENCHMARK_PASSWORD = 'benchmark-password'
+ADMIN_ID, STAFF_ID, STUDENT_ID = 1, 2, 3
+BATCH_SIZE = 10_000
+PERIOD = timedelta(days=730)
+END_TIME = datetime(2025, 1, 1)
+
+WORDS = ('שיעור', 'הלכה', 'גמרא', 'משנה', 'פרשה', 'שאלה', 'תשובה', 'מקור', 'סברא', 'דף', 'מסכת', 'רבי',
+         'the', 'lesson', 'question', 'answer', 'source', 'reason', 'page', 'tractate', 'week', 'study')
+
+
+def table_sizes(total_rows):
+    sizes = {table: max(5, int(total_rows * share)) for table, share in TABLE_SHARES.items()}
+    sizes['clusters'] = max(5, total_rows // 5_000)
+    sizes['categories'] = max(5, total_rows // 20_000)
+    return sizes
+
+
+class Generator:
+    def __init__(self, total_rows, seed=1):
+        self.rng = random.Random(seed)
+        self.sizes = table_sizes(total_rows)
+        self._zipf_weights = {}
+
+    def zipf_ids(self, n, k, s=1.1):
+        # מזהים 1..n בהתפלגות Zipf - מעט מזהים מקבלים את רוב ההפניות
+        cum_weights = self._zipf_weights.get((n, s))
+        if cum_weights is None:
+            cum_weights = list(itertools.accumulate(1 / rank ** s for rank in range(1, n + 1)))
+            self._zipf_weights[(n, s)] = cum_weights
+        return self.rng.choices(range(1, n + 1), cum_weights=cum_weights, k=k)
+
+    def timestamp(self, after=None):
+        # נוטה לעבר הקרוב: sqrt של התפלגות אחידה
+        if after is not None:
+            return min(END_TIME, after + timedelta(minutes=self.rng.expovariate(1 / 720)))
+        return END_TIME - PERIOD * (1 - self.rng.random() ** 0.5)
+
+    def text(self, mu=3.5, sigma=0.8, limit=2_000):
+        length = max(1, min(limit, int(self.rng.lognormvariate(mu, sigma))))
+        return ' '.join(self.rng.choices(WORDS, k=length))
+
+    def users(self):
+        password_hash = generate_password_hash(BENCHMARK_PASSWORD)
+        for user_id in range(1, self.sizes['users'] + 1):
+            is_student = user_id == STUDENT_ID or (user_id > STUDENT_ID and self.rng.random() < 0.7)
+            yield {
+                'id': user_id, 'firstname': f"User{user_id}", 'lastname': self.rng.choice(('Cohen', 'Levi', 'Mizrahi', 'Katz')),
+                'email': f"user{user_id}@bench.local", 'password_hash': password_hash,
+                'class_cycle': self.rng.randint(1, 10) if is_student else None,
+                'is_student': is_student, 'is_staff_member': user_id == STAFF_ID or (user_id > 3 and self.rng.random() < 0.02),
+                'is_admin': user_id == ADMIN_ID, 'is_guest': not is_student and user_id > STUDENT_ID
+            }
+
+    def clusters(self):
+        for cluster_id in range(1, self.sizes['clusters'] + 1):
+            created_at = self.timestamp()
+            yield {'id': cluster_id, 'name': f"Cluster {cluster_id}", 'description': self.text(2.5, 0.5),
+                   'created_at': created_at, 'updated_at': created_at, 'author_id': ADMIN_ID}
+
+    def posts(self):
+        count = self.sizes['posts']
+        authors = self.zipf_ids(self.sizes['users'], count)
+        clusters = self.zipf_ids(self.sizes['clusters'], count, s=0.8)
+        self.post_times = {}
+        for post_id in range(1, count + 1):
+            created_at = self.timestamp()
+            self.post_times[post_id] = created_at
+            yield {'id': post_id, 'title': f"Post {post_id}", 'content': self.text(),
+                   'created_at': created_at, 'updated_at': created_at, 'author_id': authors[post_id - 1],
+                   'cluster_id': clusters[post_id - 1] if self.rng.random() < 0.9 else None}
+
+    def replies(self):
+        count = self.sizes['replies']
+        authors = self.zipf_ids(self.sizes['users'], count)
+        posts = self.zipf_ids(self.sizes['posts'], count, s=1.05)
+        for reply_id in range(1, count + 1):
+            post_id = posts[reply_id - 1]
+            created_at = self.timestamp(after=self.post_times[post_id])
+            yield {'id': reply_id, 'content': self.text(3.0, 0.9), 'created_at': created_at, 'updated_at': created_at,
+                   'author_id': authors[reply_id - 1], 'post_id': post_id}
+
+    def attachments(self):
+        for attachment_id in range(1, self.sizes['attachments'] + 1):
+            on_post = self.rng.random() < 0.6
+            extension, file_type = self.rng.choice((('pdf', 'application/pdf'), ('jpg', 'image/jpeg'),
+                                                    ('docx', 'application/msword'), ('txt', 'text/plain')))
+            yield {'id': attachment_id, 'filename': f"file{attachment_id}.{extension}",
+                   's3_key': f"attachments/{attachment_id}/file{attachment_id}.{extension}", 'file_type': file_type,
+                   'file_size': int(self.rng.lognormvariate(11, 1.5)), 'upload_date': self.timestamp(),
+                   'post_id': self.rng.randint(1, self.sizes['posts']) if on_post else None,
+                   'reply_id': None if on_post else self.rng.randint(1, self.sizes['replies'])}
+
+    def events(self):
+        for event_id in range(1, self.sizes['events'] + 1):
+            created_at = self.timestamp()
+            yield {'id': event_id, 'title': f"Event {event_id}", 'description': self.text(3.0, 0.6),
+                   'created_at': created_at, 'updated_at': created_at}
+
+    def images(self):
+        events = self.zipf_ids(self.sizes['events'], self.sizes['images'], s=0.7)
+        for image_id in range(1, self.sizes['images'] + 1):
+            yield {'id': image_id, 's3_key': f"events/{events[image_id - 1]}/image{image_id}.jpg",
+                   'file_name': f"image{image_id}.jpg", 'file_size': int(self.rng.lognormvariate(12.5, 0.6)),
+                   'uploaded_at': self.timestamp(), 'event_id': events[image_id - 1]}
+
+    def categories(self):
+        for category_id in range(1, self.sizes['categories'] + 1):
+            yield {'id': category_id, 'name': f"Category {category_id}", 'updated_at': self.timestamp()}
+
+    def lessons(self):
+        categories = self.zipf_ids(self.sizes['categories'], self.sizes['lessons'], s=0.9)
+        for lesson_id in range(1, self.sizes['lessons'] + 1):
+            is_audio = self.rng.random() < 0.8
+            duration = self.rng.lognormvariate(7.8, 0.5)
+            uploaded_at = self.timestamp()
+            yield {'id': lesson_id, 'title': f"Lesson {lesson_id}", 'description': self.text(2.8, 0.6),
+                   'is_audio': is_audio, 's3_key': f"lessons/{lesson_id}.{'mp3' if is_audio else 'mp4'}",
+                   'file_size': int(duration * (16_000 if is_audio else 250_000)), 'duration': duration,
+                   'bitrate': 128_000 if is_audio else 2_000_000, 'codec': 'mp3' if is_audio else 'h264',
+                   'sample_rate': 44_100, 'uploaded_at': uploaded_at, 'updated_at': uploaded_at,
+                   'category_id': categories[lesson_id - 1]}
+
+    def questions_and_answers(self):
+        # כ-70% מהשאלות נענות, עם 1-3 תשובות מאנשי צוות
+        askers = self.zipf_ids(self.sizes['users'], self.sizes['questions'])
+        staff = [ADMIN_ID, STAFF_ID]
+        self.answers = []
+        for question_id in range(1, self.sizes['questions'] + 1):
+            asked_at = self.timestamp()
+            answered = self.rng.random() < 0.7
+            if answered:
+                answered_at = asked_at
+                for _ in range(min(3, int(self.rng.expovariate(1.5)) + 1)):
+                    answered_at = self.timestamp(after=answered_at)
+                    self.answers.append({'id': len(self.answers) + 1, 'answer': self.text(3.8, 0.7),
+                                         'answered_at': answered_at, 'updated_at': answered_at,
+                                         'answerer_id': self.rng.choice(staff), 'question_id': question_id})
+            yield {'id': question_id, 'question': self.text(2.8, 0.6), 'asked_at': asked_at, 'updated_at': asked_at,
+                   'asker_id': askers[question_id - 1], 'is_answered': answered}
+
+
+def insert_batches(model, rows):
+    from main_app.extensions import db
+    count = 0
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, BATCH_SIZE))
+        if not batch:
+            break
+        db.session.execute(db.insert(model), batch)
+        count += len(batch)
+    return count
+
+
+def seed_storage(rng, files):
+    # קבצים אמיתיים רק לראשונים בכל סוג - מספיק בשביל הורדות, מדיה ו-Range
+    from main_app.extensions import db, storage
+    from main_app.models.models import Attachment, EventImage, Lesson
+
+    objects = [
+        (Attachment, db.select(Attachment.s3_key, Attachment.file_type), 64 * 1024),
+        (EventImage, db.select(EventImage.s3_key, db.literal('image/jpeg')), 128 * 1024),
+        (Lesson, db.select(Lesson.s3_key, db.case((Lesson.is_audio, 'audio/mpeg'), else_='video/mp4')), 512 * 1024)
+    ]
+    for model, stmt, size in objects:
+        for s3_key, content_type in db.session.execute(stmt.order_by(model.id).limit(files)).all():
+            storage.backend.put(s3_key, rng.randbytes(size), content_type=content_type)
+            db.session.execute(db.update(model).where(model.s3_key == s3_key).values(file_size=size))
+    db.session.commit()
+
+
+def seed(total_rows, seed_value=1, files=20):
+    from main_app.extensions import db
+    from main_app.models.models import (User, ForumCluster, ForumPost, ForumReply, Attachment, Event, EventImage,
+                                        CategoryLessons, Lesson, Question, Answer)
+    from main_app import counters
+
+    generator = Generator(total_rows, seed_value)
+    counts = {
+        'users': insert_batches(User, generator.users()),
+        'clusters': insert_batches(ForumCluster, generator.clusters()),
+        'posts': insert_batches(ForumPost, generator.posts()),
+        'replies': insert_batches(ForumReply, generator.replies()),
+        'attachments': insert_batches(Attachment, generator.attachments()),
+        'events': insert_batches(Event, generator.events()),
+        'images': insert_batches(EventImage, generator.images()),
+        'categories': insert_batches(CategoryLessons, generator.categories()),
+        'lessons': insert_batches(Lesson, generator.lessons()),
+        'questions': insert_batches(Question, generator.questions_and_answers())
+    }
+    counts['answers'] = insert_batches(Answer, generator.answers)
+    db.session.commit()
+    # ה-services מתחזקים את המונים; insert ישיר עוקף אותם ולכן ממלאים אותם פעם אחת כאן
+    counters.repair()
+
+    seed_storage(random.Random(seed_value), files)
+    return counts
+
+
+def is_seeded():
+    from main_app.extensions import db
+    from main_app.models.models import User
+    return db.session.execute(db.select(db.func.count()).select_from(User)).scalar() > 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scale', choices=SCALES, default='1k')
+    parser.add_argument('--rows', type=int, help='Total rows (overrides --scale).')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--files', type=int, default=20, help='Storage objects to create per kind.')
+    parser.add_argument('--work-dir', help='Directory for benchmark.db and local storage.')
+    args = parser.parse_args()
+
+    from benchmarks.common import create_benchmark_app
+    app = create_benchmark_app(args.work_dir)
+    with app.app_context():
+        started = time.perf_counter()
+        counts = seed(args.rows or SCALES[args.scale], args.seed, args.files)
+        elapsed = time.perf_counter() - started
+    print(f"seeded {sum(counts.values())} rows in {elapsed:.1f}s into {app.config['SQLALCHEMY_DATABASE_URI']}")
+    for table, count in counts.items():
+        print(f"  {table:<12} {count}")
+
+
+if __name__ == '__main__':
+    main()
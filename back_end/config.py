@@ -18,4 +18,56 @@ class Config:
     AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID')
     AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
     AWS_REGION = os.getenv('AWS_REGION')
-    S3_BUCKET_NAME = os.getenv('S3_BUCKET_NAME')
\ No newline at end of file
+    S3_BUCKET_NAME = os.getenv('S3_BUCKET_NAME')
+    S3_MAX_POOL_CONNECTIONS = int(os.getenv('S3_MAX_POOL_CONNECTIONS', 10))
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 's3')  # 's3' או 'local'
+    LOCAL_STORAGE_PATH = os.getenv('LOCAL_STORAGE_PATH')
+    STORAGE_PRESIGN_EXPIRES = int(os.getenv('STORAGE_PRESIGN_EXPIRES', 3600))
+    LESSON_MEDIA_DELIVERY = os.getenv('LESSON_MEDIA_DELIVERY', 'proxy')  # 'proxy' או 'redirect'
+    MEDIA_PRESIGN_EXPIRES = int(os.getenv('MEDIA_PRESIGN_EXPIRES', 300))
+    MEDIA_CHUNK_SIZE = int(os.getenv('MEDIA_CHUNK_SIZE', 256 * 1024))
+    MEDIA_CACHE_MAX_AGE = int(os.getenv('MEDIA_CACHE_MAX_AGE', 86400))
+    # false מנתח את המדיה בתוך בקשת ההעלאה (CLI, בדיקות)
+    MEDIA_ANALYSIS_ASYNC = os.getenv('MEDIA_ANALYSIS_ASYNC', 'true').lower() == 'true'
+    RESPONSE_CACHE_BACKEND = os.getenv('RESPONSE_CACHE_BACKEND', 'memory')  # 'memory', 'redis' או 'none'
+    RESPONSE_CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+    RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 60))
+    RESPONSE_CACHE_REDIS_URL = os.getenv('RESPONSE_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    COMPRESS_ENABLED = os.getenv('COMPRESS_ENABLED', 'true').lower() == 'true'
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+    COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', 6))  # gzip: 1-9
+    COMPRESS_BR_LEVEL = int(os.getenv('COMPRESS_BR_LEVEL', 4))  # brotli: 0-11
+    # סוגי תוכן שכבר דחוסים - דחיסה נוספת רק שורפת CPU
+    COMPRESS_SKIP_MIMETYPES = ['audio/', 'video/', 'image/jpeg', 'image/png', 'image/gif', 'image/webp',
+                               'application/zip', 'application/gzip', 'application/pdf',
+                               'application/vnd.openxmlformats-officedocument',
+                               'text/event-stream']  # SSE: אירועים קטנים שצריכים לצאת מיד
+    PERF_INSTRUMENTATION = os.getenv('PERF_INSTRUMENTATION', 'true').lower() == 'true'
+    PERF_SERVER_TIMING = os.getenv('PERF_SERVER_TIMING', 'true').lower() == 'true'
+    PERF_N_PLUS_ONE_THRESHOLD = int(os.getenv('PERF_N_PLUS_ONE_THRESHOLD', 5))
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    # תיקייה משותפת ל-workers של gunicorn - כל תהליך כותב אליה את הערכים שלו ו-/metrics מסכם את כולם
+    METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR')
+    METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 1.0))
+    SLOW_QUERY_THRESHOLD_MS = int(os.getenv('SLOW_QUERY_THRESHOLD_MS', 200))  # 0 מבטל את הלוג
+    SLOW_QUERY_LOG_PATH = os.getenv('SLOW_QUERY_LOG_PATH')
+    SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', 'true').lower() == 'true'
+    # ב-Postgres ANALYZE מריץ שוב כל שאילתה איטית בתוך הבקשה - רק לדיבוג ממוקד
+    SLOW_QUERY_EXPLAIN_ANALYZE = os.getenv('SLOW_QUERY_EXPLAIN_ANALYZE', 'false').lower() == 'true'
+    SLOW_QUERY_LOG_MAX_BYTES = int(os.getenv('SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024))
+    SLOW_QUERY_LOG_BACKUPS = int(os.getenv('SLOW_QUERY_LOG_BACKUPS', 5))
+    QUESTION_CLAIM_LEASE_SECONDS = int(os.getenv('QUESTION_CLAIM_LEASE_SECONDS', 600))
+    QUESTION_SIMILAR_LIMIT = int(os.getenv('QUESTION_SIMILAR_LIMIT', 5))
+    CHANGE_FEED_POLL_INTERVAL = float(os.getenv('CHANGE_FEED_POLL_INTERVAL', 0.5))
+    CHANGE_FEED_RETENTION_SECONDS = int(os.getenv('CHANGE_FEED_RETENTION_SECONDS', 3600))
+    CHANGE_FEED_REPLAY_LIMIT = int(os.getenv('CHANGE_FEED_REPLAY_LIMIT', 1000))
+    CHANGE_FEED_HEARTBEAT_SECONDS = int(os.getenv('CHANGE_FEED_HEARTBEAT_SECONDS', 15))
+    CHANGE_FEED_QUEUE_SIZE = int(os.getenv('CHANGE_FEED_QUEUE_SIZE', 256))
+    CHANGE_FEED_REORDER_WINDOW = int(os.getenv('CHANGE_FEED_REORDER_WINDOW', 200))
+    BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS', 20))
+    BATCH_MAX_WORKERS = int(os.getenv('BATCH_MAX_WORKERS', 4))  # 1 מריץ את כל התת-בקשות ברצף
+    ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', 365))
+    ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', 100))
+    ARCHIVE_STORAGE_PREFIX = os.getenv('ARCHIVE_STORAGE_PREFIX', 'archive/')
+    # ב-S3 הקבצים מועתקים למחלקת אחסון זולה יותר; ריק משאיר את מחלקת ברירת המחדל של ה-bucket
+    ARCHIVE_STORAGE_CLASS = os.getenv('ARCHIVE_STORAGE_CLASS', 'STANDARD_IA')
\ No newline at end of file
@@ -0,0 +1,74 @@
+import glob
+import multiprocessing
+import os
+
+# gunicorn -c gunicorn.conf.py wsgi:app
+# סוג ה-worker נבחר לפי הסביבה:
+#   sync    - תהליך לכל בקשה בו-זמנית; הכי צפוי, מתאים כשרוב הזמן הוא CPU (סריאליזציה)
+#   gthread - כמה threads בכל תהליך; ברירת המחדל, טוב לתמהיל של DB ו-S3
+#   gevent  - greenlets; הכי טוב לנתיבים שרובם המתנה ל-S3 (הורדות, מדיה), דורש התקנת gevent
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+cpu_count = multiprocessing.cpu_count()
+
+if worker_class == 'gevent':
+    # ה-patch חייב לקרות ב-master לפני טעינת האפליקציה (preload), אחרת boto3/ssl נטענים לא מותאמים
+    from gevent import monkey
+    monkey.patch_all()
+    try:
+        # psycopg2 עושה I/O בתוך C; בלי ה-patch שאילתה ל-Postgres עוצרת את כל ה-greenlets של ה-worker
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+    except ImportError:
+        pass
+
+    workers = int(os.getenv('GUNICORN_WORKERS', cpu_count))
+    worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+    # הורדות ומדיה מ-S3 מחזיקות חיבור כל אחת - ה-pool של boto3 גדל לפי מספר החיבורים ל-worker
+    os.environ.setdefault('S3_MAX_POOL_CONNECTIONS', str(worker_connections))
+elif worker_class == 'gthread':
+    workers = int(os.getenv('GUNICORN_WORKERS', cpu_count + 1))
+    threads = int(os.getenv('GUNICORN_THREADS', 4))
+else:
+    workers = int(os.getenv('GUNICORN_WORKERS', cpu_count * 2 + 1))
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+
+# טעינה אחת ב-master ו-fork - הקוד והמודולים משותפים בזיכרון (copy-on-write) בין ה-workers
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# מאחורי load balancer: החיבור נשאר פתוח קצת יותר מה-idle timeout שלו
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# מחזור workers מונע זליגת זיכרון איטית; jitter כדי שלא כולם יתחלפו יחד
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+# טעינה מחדש ללא השבתה: kill -HUP <master pid>. בפיתוח אפשר GUNICORN_RELOAD=true
+reload = os.getenv('GUNICORN_RELOAD', 'false').lower() == 'true'
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-') or None
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def on_starting(server):
+    # snapshots של מדדים מהרצה קודמת יספרו פעמיים אם לא ימחקו
+    metrics_dir = os.getenv('METRICS_MULTIPROC_DIR')
+    if metrics_dir:
+        for path in glob.glob(os.path.join(metrics_dir, 'metrics_*.json')):
+            os.remove(path)
+
+
+def post_fork(server, worker):
+    # חיבורי DB שנפתחו ב-master בזמן preload לא יכולים להיות משותפים בין תהליכים
+    from main_app.extensions import db
+    app = server.app.wsgi()
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def worker_exit(server, worker):
+    from main_app.extensions import metrics
+    if getattr(metrics, 'multiproc_dir', None):
+        metrics.flush()
@@ -0,0 +1,186 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, func, insert, literal, or_, select
+from main_app.extensions import db, storage, response_cache
+from main_app.counters import increment
+from main_app.metrics import registry, Counter
+from main_app.models.models import (ForumPost, ForumReply, ForumCluster, Attachment, Event, EventImage,
+                                    ArchivedForumPost, ArchivedForumReply, ArchivedAttachment, ArchivedEvent,
+                                    ArchivedEventImage)
+from main_app.services.forum_service import delete_stored_files
+from main_app.storage.base import StorageError
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_ROWS_MOVED = Counter(registry, 'archive_rows_moved_total', 'Rows moved to the archive tables')
+ARCHIVE_BYTES_MOVED = Counter(registry, 'archive_bytes_moved_total', 'Stored file bytes moved under the archive prefix')
+
+TABLES = ['forum_post', 'forum_reply', 'attachment', 'event', 'event_image']
+
+
+def stale_posts(cutoff, limit, skipped, for_update=False):
+    # המזהים נשמרים בארכיון; הטבלאות הפעילות הן AUTOINCREMENT כדי ששורה חדשה לא תקבל מזהה שכבר שם
+    stmt = select(ForumPost.id).where(
+        func.coalesce(ForumPost.updated_at, ForumPost.created_at) < cutoff,
+        func.coalesce(ForumPost.last_reply_at, ForumPost.created_at) < cutoff,
+    )
+    if skipped:
+        stmt = stmt.where(ForumPost.id.notin_(list(skipped)))
+    if for_update:
+        # ב-Postgres תגובה או קובץ חדשים מחכים לנעילה עד ה-commit ואז נכשלים על המפתח הזר, במקום להימחק
+        # ב-cascade בלי שהועתקו. עדכון שנכנס לפני הנעילה מוציא את הפוסט מהתנאי. SQLite מתעלם - יש בו כותב אחד
+        stmt = stmt.with_for_update(of=ForumPost)
+    return db.session.execute(stmt.order_by(ForumPost.id).limit(limit)).scalars().all()
+
+
+def stale_events(cutoff, limit, skipped, for_update=False):
+    # הוספת תמונה לא מעדכנת את updated_at של האירוע, ולכן נבדקת בנפרד
+    recent_image = select(EventImage.id).where(EventImage.event_id == Event.id, EventImage.uploaded_at >= cutoff)
+    stmt = select(Event.id).where(
+        func.coalesce(Event.updated_at, Event.created_at) < cutoff,
+        ~recent_image.exists(),
+    )
+    if skipped:
+        stmt = stmt.where(Event.id.notin_(list(skipped)))
+    if for_update:
+        # ראו stale_posts
+        stmt = stmt.with_for_update(of=Event)
+    return db.session.execute(stmt.order_by(Event.id).limit(limit)).scalars().all()
+
+
+def copy_rows(source, target, criterion, archived_at, **overrides):
+    # INSERT ... SELECT: השורות עוברות בתוך ה-DB, בלי לטעון אותן לזיכרון
+    columns = [column.name for column in source.__table__.columns]
+    selected = [overrides.get(name, getattr(source, name)) for name in columns]
+    result = db.session.execute(
+        insert(target).from_select(columns + ['archived_at'], select(*selected, literal(archived_at)).where(criterion))
+    )
+    return result.rowcount
+
+
+def copy_files(files, prefix, storage_class):
+    # files: [(owner id, key, size)]. מעתיקים לפני ה-commit; את המקור מוחקים רק אחרי שה-DB מצביע על העותק.
+    # בעלים שאחד הקבצים שלו לא הועתק נשאר פעיל להרצה הבאה
+    failed = set()
+    for owner_id, key, _ in files:
+        if owner_id in failed:
+            continue
+        try:
+            storage.backend.copy(key, prefix + key, storage_class)
+        except StorageError as e:
+            logger.warning("Could not copy %s to the archive, keeping %s active: %s", key, owner_id, e)
+            failed.add(owner_id)
+    return failed
+
+
+def archive_posts(post_ids, prefix, storage_class):
+    # גם עריכה של תגובה לא תיכנס בין ההעתקה למחיקה
+    db.session.execute(select(ForumReply.id).where(ForumReply.post_id.in_(post_ids)).with_for_update())
+    reply_owner = select(ForumReply.post_id).where(ForumReply.id == Attachment.reply_id).scalar_subquery()
+    files = db.session.execute(
+        select(func.coalesce(Attachment.post_id, reply_owner), Attachment.s3_key, Attachment.file_size)
+        .where(or_(Attachment.post_id.in_(post_ids),
+                   Attachment.reply_id.in_(select(ForumReply.id).where(ForumReply.post_id.in_(post_ids)))))
+    ).all()
+    failed = copy_files(files, prefix, storage_class)
+    post_ids = [post_id for post_id in post_ids if post_id not in failed]
+    if not post_ids:
+        return {}, 0, failed
+
+    archived_at = datetime.utcnow()
+    replies = select(ForumReply.id).where(ForumReply.post_id.in_(post_ids))
+    in_threads = or_(Attachment.post_id.in_(post_ids), Attachment.reply_id.in_(replies))
+    rows = {
+        'forum_post': copy_rows(ForumPost, ArchivedForumPost, ForumPost.id.in_(post_ids), archived_at),
+        'forum_reply': copy_rows(ForumReply, ArchivedForumReply, ForumReply.post_id.in_(post_ids), archived_at),
+        'attachment': copy_rows(Attachment, ArchivedAttachment, in_threads, archived_at,
+                                s3_key=literal(prefix) + Attachment.s3_key),
+    }
+    # post_count סופר רק פוסטים פעילים, כמו ש-counters repair מחשב אותו
+    per_cluster = db.session.execute(
+        select(ForumPost.cluster_id, func.count()).where(ForumPost.id.in_(post_ids), ForumPost.cluster_id.isnot(None))
+        .group_by(ForumPost.cluster_id)
+    ).all()
+    for cluster_id, count in per_cluster:
+        increment(ForumCluster.post_count, cluster_id, -count)
+    # התגובות והקבצים נמחקים ב-cascade
+    db.session.execute(delete(ForumPost).where(ForumPost.id.in_(post_ids)))
+    db.session.commit()
+
+    moved = [(key, size) for owner_id, key, size in files if owner_id not in failed]
+    delete_stored_files(storage.backend, [key for key, _ in moved])
+    return rows, sum(size or 0 for _, size in moved), failed
+
+
+def archive_events(event_ids, prefix, storage_class):
+    files = db.session.execute(
+        select(EventImage.event_id, EventImage.s3_key, EventImage.file_size).where(EventImage.event_id.in_(event_ids))
+    ).all()
+    failed = copy_files(files, prefix, storage_class)
+    event_ids = [event_id for event_id in event_ids if event_id not in failed]
+    if not event_ids:
+        return {}, 0, failed
+
+    archived_at = datetime.utcnow()
+    rows = {
+        'event': copy_rows(Event, ArchivedEvent, Event.id.in_(event_ids), archived_at),
+        'event_image': copy_rows(EventImage, ArchivedEventImage, EventImage.event_id.in_(event_ids), archived_at,
+                                 s3_key=literal(prefix) + EventImage.s3_key),
+    }
+    db.session.execute(delete(EventImage).where(EventImage.event_id.in_(event_ids)))
+    db.session.execute(delete(Event).where(Event.id.in_(event_ids)))
+    db.session.commit()
+
+    moved = [(key, size) for event_id, key, size in files if event_id not in failed]
+    delete_stored_files(storage.backend, [key for key, _ in moved])
+    return rows, sum(size or 0 for _, size in moved), failed
+
+
+def pending(cutoff):
+    # מה הרצה תעביר, בלי להזיז דבר (--dry-run)
+    posts = stale_posts(cutoff, None, ())
+    events = stale_events(cutoff, None, ())
+    thread_bytes = db.session.execute(
+        select(func.coalesce(func.sum(Attachment.file_size), 0))
+        .where(or_(Attachment.post_id.in_(posts),
+                   Attachment.reply_id.in_(select(ForumReply.id).where(ForumReply.post_id.in_(posts)))))
+    ).scalar()
+    event_bytes = db.session.execute(
+        select(func.coalesce(func.sum(EventImage.file_size), 0)).where(EventImage.event_id.in_(events))
+    ).scalar()
+    return {'threads': len(posts), 'events': len(events), 'bytes': thread_bytes + event_bytes}
+
+
+def run(older_than_days=None, batch_size=None):
+    config = current_app.config
+    days = older_than_days if older_than_days is not None else config['ARCHIVE_AFTER_DAYS']
+    batch_size = batch_size or config['ARCHIVE_BATCH_SIZE']
+    prefix = config['ARCHIVE_STORAGE_PREFIX']
+    storage_class = config['ARCHIVE_STORAGE_CLASS'] or None
+    cutoff = datetime.utcnow() - timedelta(days=days)
+
+    totals = {'rows': dict.fromkeys(TABLES, 0), 'bytes': defaultdict(int), 'kept': defaultdict(int)}
+    # כל batch בטרנזקציה משלו - הרצה שנקטעה באמצע משאירה רק batches שלמים בארכיון
+    for kind, find, move in (('threads', stale_posts, archive_posts), ('events', stale_events, archive_events)):
+        skipped = set()
+        while True:
+            ids = find(cutoff, batch_size, skipped, for_update=True)
+            if not ids:
+                break
+            try:
+                rows, moved_bytes, failed = move(ids, prefix, storage_class)
+            except Exception as e:
+                db.session.rollback()
+                raise Exception(f"Error archiving {kind}: {str(e)}")
+            skipped.update(failed)
+            for table, count in rows.items():
+                totals['rows'][table] += count
+                ARCHIVE_ROWS_MOVED.inc(count, table=table)
+            totals['bytes'][kind] += moved_bytes
+            totals['kept'][kind] += len(failed)
+            ARCHIVE_BYTES_MOVED.inc(moved_bytes, kind=kind)
+
+    response_cache.invalidate('posts', 'clusters', 'events')
+    return totals
@@ -0,0 +1,146 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, g, has_request_context, request
+from werkzeug.exceptions import BadRequest
+from werkzeug.test import EnvironBuilder
+
+# מסמן ב-environ תת-בקשה של /batch: מדדים, instrumentation ודחיסה נרשמים פעם אחת, על בקשת ה-batch עצמה
+SUB_REQUEST = 'seminary.batch_sub_request'
+READ_METHODS = {'GET', 'HEAD'}
+SUB_REQUEST_HEADERS = {'if-none-match', 'if-modified-since', 'content-type'}
+RESPONSE_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Cache-Control', 'Location')
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def is_sub_request():
+    return has_request_context() and request.environ.get(SUB_REQUEST, False)
+
+
+def executor(max_workers):
+    # pool לכל תהליך - threads לא עוברים fork של gunicorn
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='batch')
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def parse_requests(specs, max_requests):
+    if not isinstance(specs, list) or not specs:
+        raise BadRequest("requests must be a non-empty list")
+    if len(specs) > max_requests:
+        raise BadRequest(f"At most {max_requests} requests per batch")
+
+    parsed = []
+    for index, spec in enumerate(specs):
+        if not isinstance(spec, dict) or not isinstance(spec.get('path'), str) or not spec['path'].startswith('/'):
+            raise BadRequest(f"requests[{index}] needs a path starting with /")
+        if spec['path'].split('?', 1)[0].rstrip('/') == request.path.rstrip('/'):
+            raise BadRequest("A batch cannot contain another batch")
+        headers = spec.get('headers') or {}
+        if not isinstance(headers, dict):
+            raise BadRequest(f"requests[{index}].headers must be an object")
+        parsed.append({
+            'id': spec.get('id', index),
+            'method': str(spec.get('method', 'GET')).upper(),
+            'path': spec['path'],
+            'headers': {name: str(value) for name, value in headers.items() if name.lower() in SUB_REQUEST_HEADERS},
+            'body': spec.get('body'),
+        })
+    return parsed
+
+
+def build_environ(spec):
+    headers = dict(spec['headers'])
+    # ה-token של בקשת ה-batch עובר לכל תת-בקשה, וכל route מאמת אותו שוב כרגיל; אי אפשר להחליף אותו מתוך ה-batch
+    if 'Authorization' in request.headers:
+        headers['Authorization'] = request.headers['Authorization']
+    builder = EnvironBuilder(
+        path=spec['path'], method=spec['method'], headers=headers, base_url=request.host_url,
+        json=spec['body'] if spec['body'] is not None else None,
+        environ_base={'REMOTE_ADDR': request.remote_addr, SUB_REQUEST: True}
+    )
+    try:
+        return builder.get_environ()
+    finally:
+        builder.close()
+
+
+def dispatch(app, environ):
+    with app.request_context(environ):
+        try:
+            response = app.full_dispatch_request()
+        except Exception as e:
+            try:
+                response = app.handle_exception(e)
+            except Exception:
+                # עם PROPAGATE_EXCEPTIONS (testing/debug) handle_exception זורק שוב - רק תת-הבקשה הזו נכשלת
+                app.log_exception((type(e), e, e.__traceback__))
+                return 500, {}, app.json.dumps({'error': "Internal Server Error"})
+            # דף השגיאה של werkzeug מגיע כ-WSGI iterator; הוא קטן ונקרא לזיכרון כדי שלא ייחשב stream
+            response.make_sequence()
+        try:
+            if response.is_streamed or response.direct_passthrough:
+                # הורדות ומדיה נשארות בקשות רגילות - אין טעם לקודד קובץ בתוך JSON
+                return 422, {}, app.json.dumps({'error': "Streaming responses are not supported in a batch"})
+            data = response.get_data(as_text=True)
+            headers = {name: response.headers[name] for name in RESPONSE_HEADERS if name in response.headers}
+            if not data:
+                body = 'null'
+            elif response.is_json:
+                # ה-JSON של תת-התגובה נכנס כמו שהוא, בלי לפענח ולקודד אותו שוב
+                body = data
+            else:
+                body = app.json.dumps(data)
+            return response.status_code, headers, body
+        finally:
+            response.close()
+
+
+def dispatch_isolated(app, environ):
+    # ב-thread אחר: app context ו-session משלו - Session של SQLAlchemy לא משותף בין threads.
+    # השאילתות נספרות בנפרד ומתווספות ל-Server-Timing של בקשת ה-batch כשהתוצאה חוזרת
+    from main_app.instrumentation import RequestStats
+    with app.app_context():
+        g.request_stats = RequestStats()
+        return dispatch(app, environ), g.request_stats
+
+
+def run_batch(specs):
+    from main_app.instrumentation import current_stats
+    app = current_app._get_current_object()
+    config = app.config
+    parsed = parse_requests(specs, config['BATCH_MAX_REQUESTS'])
+    environs = [build_environ(spec) for spec in parsed]
+
+    # קריאות רצופות רצות במקביל; כתיבה היא מחסום ורצה לבד, לפי הסדר, ב-session של בקשת ה-batch
+    results = [None] * len(parsed)
+    index = 0
+    while index < len(parsed):
+        group_end = index
+        while group_end < len(parsed) and parsed[group_end]['method'] in READ_METHODS:
+            group_end += 1
+        if group_end - index > 1 and config['BATCH_MAX_WORKERS'] > 1:
+            group = range(index, group_end)
+            futures = [executor(config['BATCH_MAX_WORKERS']).submit(dispatch_isolated, app, environs[position])
+                       for position in group]
+            stats = current_stats()
+            for position, future in zip(group, futures):
+                results[position], sub_stats = future.result()
+                if stats is not None:
+                    stats.merge(sub_stats)
+            index = group_end
+        else:
+            results[index] = dispatch(app, environs[index])
+            index += 1
+
+    parts = []
+    for spec, (status, headers, body) in zip(parsed, results):
+        meta = app.json.dumps({'id': spec['id'], 'status': status, 'headers': headers})
+        parts.append(meta[:-1] + ',"body":' + body + '}')
+    return '{"responses":[' + ','.join(parts) + ']}'
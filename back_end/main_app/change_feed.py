@@ -0,0 +1,220 @@
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, func, select
+from main_app.metrics import registry, Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+# post:<id> - תגובות לשרשור, cluster:<id> - פוסטים ופעילות באשכול, question:<id> - תשובות לשאלה,
+# questions - תור השאלות, queue - נעילות של אנשי צוות (רק עם token של צוות), events - אירועים
+TOPIC = re.compile(r'^(?:(?:post|cluster|question):\d+|questions|queue|events)$')
+STAFF_TOPICS = {'queue'}
+MAX_TOPICS = 20
+POLL_BATCH = 500
+PRUNE_EVERY_SECONDS = 60
+
+STREAM_CONNECTIONS = Gauge(registry, 'sse_connections', 'Open /stream connections')
+CHANGE_EVENTS_DELIVERED = Counter(registry, 'sse_events_delivered_total', 'Change events written to /stream clients')
+
+
+def publish(topics, kind, data):
+    # נוסף ל-session של הכתיבה עצמה: נשמר או מתבטל יחד איתה, ואין אירוע על שינוי שלא קרה
+    from main_app.extensions import db, change_feed
+    from main_app.models.models import ChangeEvent
+    payload = current_app.json.dumps(data)
+    for topic in topics:
+        if topic is not None:
+            db.session.add(ChangeEvent(topic=topic, kind=kind, data=payload))
+    change_feed.prune_if_due()
+
+
+def format_event(event_id, kind, topic, data):
+    # data כבר JSON; topic עובר בשדה נפרד של ה-payload כדי שהלקוח ינתב בלי לפענח את ה-id
+    return f'id: {event_id}\nevent: {kind}\ndata: {{"topic": "{topic}", "data": {data}}}\n\n'
+
+
+class Subscription:
+    def __init__(self, topics, max_queue):
+        self.topics = frozenset(topics)
+        self.events = queue.Queue(maxsize=max_queue)
+        self.overflowed = False
+
+    def offer(self, event):
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            # לקוח איטי לא מעכב את כולם: החיבור נסגר והוא מתחבר מחדש עם Last-Event-ID
+            self.overflowed = True
+
+
+class ChangeFeed:
+    # pub/sub בתוך התהליך. thread אחד לכל worker סורק את change_event ומחלק למנויים המקומיים,
+    # כך שאירוע שנכתב ב-worker אחד מגיע לכל המנויים בכל ה-workers של gunicorn
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+        self._poller_pid = None
+        self._last_prune = 0.0
+        self.last_id = 0
+        # מזהים מתוך חלון הסידור שכבר חולקו
+        self._delivered = set()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CHANGE_FEED_POLL_INTERVAL', 0.5)
+        app.config.setdefault('CHANGE_FEED_RETENTION_SECONDS', 3600)
+        app.config.setdefault('CHANGE_FEED_REPLAY_LIMIT', 1000)
+        app.config.setdefault('CHANGE_FEED_HEARTBEAT_SECONDS', 15)
+        app.config.setdefault('CHANGE_FEED_QUEUE_SIZE', 256)
+        app.config.setdefault('CHANGE_FEED_REORDER_WINDOW', 200)
+        self.app = app
+
+    def subscribe(self, topics):
+        self._ensure_poller()
+        subscription = Subscription(topics, self.app.config['CHANGE_FEED_QUEUE_SIZE'])
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def _ensure_poller(self):
+        # ה-thread נוצר בבקשת ה-stream הראשונה של כל תהליך - לא ב-master של gunicorn ולא בפקודות CLI
+        with self._lock:
+            if self._poller_pid == os.getpid():
+                return
+            self._poller_pid = os.getpid()
+            self._subscriptions = set()
+            self._delivered = set()
+            with self.app.app_context():
+                self.last_id = self._latest_id()
+            threading.Thread(target=self._poll_forever, name='change-feed-poller', daemon=True).start()
+
+    @staticmethod
+    def _latest_id():
+        from main_app.extensions import db
+        from main_app.models.models import ChangeEvent
+        return db.session.execute(select(func.max(ChangeEvent.id))).scalar() or 0
+
+    def _poll_forever(self):
+        while True:
+            with self.app.app_context():
+                try:
+                    self.poll()
+                except Exception as e:
+                    logger.warning("Change feed poll failed: %s", e)
+            time.sleep(self.app.config['CHANGE_FEED_POLL_INTERVAL'])
+
+    def reorder_window(self):
+        # ב-SQLite יש כותב אחד בכל רגע, ולכן מזהים עולים לפי סדר ה-commit וסריקה לפי id > last לא מפספסת אירוע.
+        # ב-Postgres ה-id נלקח מה-sequence בזמן ה-INSERT, וטרנזקציות מקבילות יכולות לבצע commit בסדר אחר:
+        # אירוע עם id נמוך יותר מופיע אחרי שהסמן כבר עבר אותו. לכן קוראים שוב חלון של מזהים מתחת לסמן.
+        # טרנזקציה שמתעכבת מעבר לחלון עדיין תפוספס
+        from main_app.extensions import db
+        if db.engine.dialect.name == 'sqlite':
+            return 0
+        return self.app.config['CHANGE_FEED_REORDER_WINDOW']
+
+    def poll(self):
+        from main_app.extensions import db
+        from main_app.models.models import ChangeEvent
+        window = self.reorder_window()
+        with self._lock:
+            if not self._subscriptions:
+                # אין מנויים: רק מקדמים את הסמן, בלי לקרוא את האירועים עצמם
+                latest = self._latest_id()
+                if window:
+                    self._delivered = set(db.session.execute(
+                        select(ChangeEvent.id).where(ChangeEvent.id > latest - window)).scalars())
+                self.last_id = max(self.last_id, latest)
+                return
+        while True:
+            stmt = (select(ChangeEvent.id, ChangeEvent.topic, ChangeEvent.kind, ChangeEvent.data)
+                    .where(ChangeEvent.id > self.last_id - window).order_by(ChangeEvent.id).limit(POLL_BATCH))
+            if self._delivered:
+                stmt = stmt.where(ChangeEvent.id.notin_(self._delivered))
+            rows = db.session.execute(stmt).all()
+            if not rows:
+                return
+            with self._lock:
+                subscriptions = list(self._subscriptions)
+            for row in rows:
+                for subscription in subscriptions:
+                    if row.topic in subscription.topics:
+                        subscription.offer(tuple(row))
+            self.last_id = max(self.last_id, rows[-1].id)
+            if window:
+                self._delivered.update(row.id for row in rows)
+                self._delivered = {event_id for event_id in self._delivered if event_id > self.last_id - window}
+            if len(rows) < POLL_BATCH:
+                return
+
+    def prune_if_due(self):
+        # הניקוי רץ בתוך טרנזקציית הכתיבה, פעם בדקה לכל תהליך - היומן לא גדל גם כשאף אחד לא מחובר ל-stream
+        from main_app.extensions import db
+        from main_app.models.models import ChangeEvent
+        if time.monotonic() - self._last_prune < PRUNE_EVERY_SECONDS:
+            return
+        self._last_prune = time.monotonic()
+        cutoff = datetime.utcnow() - timedelta(seconds=self.app.config['CHANGE_FEED_RETENTION_SECONDS'])
+        db.session.execute(delete(ChangeEvent).where(ChangeEvent.created_at < cutoff))
+
+    def replay(self, topics, last_event_id):
+        # אירועים שהלקוח פספס בזמן שהיה מנותק. None: הפער גדול מדי או שחלק ממנו כבר נמחק - הלקוח טוען מחדש.
+        # ב-Postgres אירוע שבוצע לו commit מחוץ לסדר, מתחת ל-Last-Event-ID, לא יוחזר כאן (ראו reorder_window)
+        from main_app.extensions import db
+        from main_app.models.models import ChangeEvent
+        oldest = db.session.execute(select(func.min(ChangeEvent.id))).scalar()
+        latest = self._latest_id()
+        if last_event_id >= latest:
+            return []
+        if oldest is None or oldest > last_event_id + 1:
+            return None
+        limit = self.app.config['CHANGE_FEED_REPLAY_LIMIT']
+        rows = db.session.execute(
+            select(ChangeEvent.id, ChangeEvent.topic, ChangeEvent.kind, ChangeEvent.data)
+            .where(ChangeEvent.id > last_event_id, ChangeEvent.topic.in_(topics))
+            .order_by(ChangeEvent.id).limit(limit + 1)
+        ).all()
+        if len(rows) > limit:
+            return None
+        return [tuple(row) for row in rows]
+
+    def stream(self, subscription, replayed):
+        heartbeat = self.app.config['CHANGE_FEED_HEARTBEAT_SECONDS']
+        replayed_ids = set()
+        STREAM_CONNECTIONS.inc()
+        try:
+            yield 'retry: 3000\n\n'
+            if replayed is None:
+                yield 'event: reset\ndata: {}\n\n'
+                replayed = []
+            for event_id, topic, kind, data in replayed:
+                yield format_event(event_id, kind, topic, data)
+                replayed_ids.add(event_id)
+            CHANGE_EVENTS_DELIVERED.inc(len(replayed))
+            while not subscription.overflowed:
+                try:
+                    event_id, topic, kind, data = subscription.events.get(timeout=heartbeat)
+                except queue.Empty:
+                    # שורת הערה שומרת את החיבור פתוח דרך proxies ומגלה לקוחות שהתנתקו
+                    yield ': keepalive\n\n'
+                    continue
+                # אירוע שהגיע גם ב-replay וגם מה-poller נשלח פעם אחת. לפי מזהה ולא לפי id <= האחרון:
+                # מה-poller יכול להגיע אירוע עם id נמוך יותר שבוצע לו commit מאוחר יותר
+                if event_id in replayed_ids:
+                    continue
+                yield format_event(event_id, kind, topic, data)
+                CHANGE_EVENTS_DELIVERED.inc()
+        finally:
+            self.unsubscribe(subscription)
+            STREAM_CONNECTIONS.dec()
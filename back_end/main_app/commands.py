@@ -0,0 +1,103 @@
+import click
+from flask import current_app
+from flask.cli import AppGroup, ScriptInfo
+from main_app.extensions import db
+from main_app import counters
+from main_app.slow_query import SlowQueryLog, load_report, log_files
+
+class LazyMigrateGroup(click.Group):
+    # Flask-Migrate מייבא את alembic (~300ms) - נטען רק כשמריצים את flask db ולא בכל עליית שרת
+    def _load(self, ctx):
+        from flask_migrate import Migrate
+        from flask_migrate.cli import db as db_cli_group
+        app = ctx.find_object(ScriptInfo).load_app()
+        if 'migrate' not in app.extensions:
+            Migrate(app, db, command=self.name)
+        return db_cli_group
+
+    def make_context(self, info_name, args, parent=None, **extra):
+        return self._load(parent).make_context(info_name, args, parent=parent, **extra)
+
+
+migrate_cli = LazyMigrateGroup('db', help='Perform database migrations.')
+slow_queries_cli = AppGroup('slow-queries', help='Inspect the slow query log.')
+
+
+@slow_queries_cli.command('report')
+@click.option('--top', default=10, show_default=True, help='Number of statements to show.')
+@click.option('--path', default=None, help='Log file (defaults to SLOW_QUERY_LOG_PATH).')
+@click.option('--plans/--no-plans', default=True, help='Show the captured query plan.')
+def slow_queries_report(top, path, plans):
+    path = path or SlowQueryLog.log_path(current_app)
+    if not log_files(path):
+        click.echo(f"No slow queries logged ({path} does not exist).")
+        return
+
+    for rank, group in enumerate(load_report(path, top), start=1):
+        click.echo(f"#{rank} [{group['fingerprint']}] {group['count']}x  total {group['total_ms']:.1f} ms  "
+                   f"avg {group['total_ms'] / group['count']:.1f} ms  max {group['max_ms']:.1f} ms")
+        click.echo(f"    from: {', '.join(sorted(group['origins'])) or 'unknown'}")
+        click.echo(f"    {group['normalized']}")
+        if plans and group['plan']:
+            for line in group['plan']:
+                click.echo(f"      plan: {line}")
+        click.echo('')
+
+
+counters_cli = AppGroup('counters', help='Maintain denormalized counters.')
+
+
+@counters_cli.command('repair')
+@click.option('--only', multiple=True, type=click.Choice(sorted(counters.COUNTERS) + ['queue_stat.unanswered_questions']),
+              help='Repair only these counters (repeatable).')
+def counters_repair(only):
+    for name, fixed in counters.repair(only).items():
+        click.echo(f"{name:<36}{fixed:>8} rows fixed")
+
+
+search_cli = AppGroup('search', help='Maintain the question search index.')
+
+
+@search_cli.command('rebuild')
+def search_rebuild():
+    from main_app.services.search_service import QuestionSearchService
+    if QuestionSearchService.rebuild_index():
+        click.echo("Question search index rebuilt.")
+    else:
+        click.echo("This database has no full-text index (SQLite only); search uses LIKE matching.")
+
+
+archive_cli = AppGroup('archive', help='Move inactive forum threads and events to the archive.')
+
+
+@archive_cli.command('run')
+@click.option('--older-than-days', type=int, default=None,
+              help='Archive what had no activity for this many days (defaults to ARCHIVE_AFTER_DAYS).')
+@click.option('--batch-size', type=int, default=None, help='Threads or events per transaction (defaults to ARCHIVE_BATCH_SIZE).')
+@click.option('--dry-run', is_flag=True, help='Only report what would be archived.')
+def archive_run(older_than_days, batch_size, dry_run):
+    from datetime import datetime, timedelta
+    from main_app import archive
+    days = older_than_days if older_than_days is not None else current_app.config['ARCHIVE_AFTER_DAYS']
+    if dry_run:
+        pending = archive.pending(datetime.utcnow() - timedelta(days=days))
+        click.echo(f"{pending['threads']} threads and {pending['events']} events with no activity for {days} days, "
+                   f"{pending['bytes'] / 1024 / 1024:.1f} MiB of files")
+        return
+
+    totals = archive.run(days, batch_size)
+    for table, count in totals['rows'].items():
+        click.echo(f"{table:<16}{count:>10} rows archived")
+    for kind, moved_bytes in totals['bytes'].items():
+        click.echo(f"{kind + ' files':<16}{moved_bytes / 1024 / 1024:>10.1f} MiB moved")
+    for kind, kept in totals['kept'].items():
+        if kept:
+            click.echo(f"{kind:<16}{kept:>10} kept active (file copy failed, see the log)")
+
+
+def register_commands(app):
+    app.cli.add_command(migrate_cli)
+    app.cli.add_command(counters_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(archive_cli)
+    app.cli.add_command(slow_queries_cli)
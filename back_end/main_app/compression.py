@@ -0,0 +1,107 @@
+import zlib
+from flask import request
+from main_app.batch import is_sub_request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class GzipCompressor:
+    encoding = 'gzip'
+
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, chunk):
+        # Z_SYNC_FLUSH אחרי כל chunk - הלקוח מקבל כל חלק מיד (חשוב לתגובות streaming)
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class BrotliCompressor:
+    encoding = 'br'
+
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, chunk):
+        return self._compressor.process(chunk) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+def compress_stream(chunks, compressor):
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+class Compression:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_ENABLED', True)
+        app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+        app.config.setdefault('COMPRESS_LEVEL', 6)
+        app.config.setdefault('COMPRESS_BR_LEVEL', 4)
+        app.config.setdefault('COMPRESS_SKIP_MIMETYPES', [])
+        self.app = app
+        app.after_request(self.after_request)
+
+    def is_compressible(self, response):
+        config = self.app.config
+        # תת-תגובה של /batch נכנסת לתגובה המשותפת, שנדחסת פעם אחת
+        if not config['COMPRESS_ENABLED'] or is_sub_request():
+            return False
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return False
+        # קבצים (send_file, מדיה של שיעורים) יוצאים כמו שהם - ללא דחיסה וללא העתקה
+        if response.direct_passthrough or 'Content-Encoding' in response.headers:
+            return False
+        mimetype = response.mimetype or ''
+        return not any(mimetype.startswith(prefix) for prefix in config['COMPRESS_SKIP_MIMETYPES'])
+
+    def choose_compressor(self):
+        config = self.app.config
+        accepted = request.accept_encodings
+        if brotli is not None and accepted['br']:
+            return BrotliCompressor(config['COMPRESS_BR_LEVEL'])
+        if accepted['gzip']:
+            return GzipCompressor(config['COMPRESS_LEVEL'])
+        return None
+
+    def after_request(self, response):
+        if not self.is_compressible(response):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        compressor = self.choose_compressor()
+        if compressor is None:
+            return response
+
+        if response.is_streamed:
+            response.response = compress_stream(response.response, compressor)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.app.config['COMPRESS_MIN_SIZE']:
+                return response
+            response.set_data(compressor.compress(data) + compressor.finish())
+
+        response.headers['Content-Encoding'] = compressor.encoding
+        return response
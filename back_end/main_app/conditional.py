@@ -0,0 +1,61 @@
+import hashlib
+from datetime import timezone
+from functools import wraps
+from flask import current_app, request
+from sqlalchemy import func, select
+from werkzeug.http import is_resource_modified
+from main_app.extensions import db
+
+
+def table_state(column, *criteria):
+    # מספר השורות וחותמת הזמן המאוחרת ביותר - שאילתה זולה אחת במקום הסריאליזציה המלאה
+    stmt = select(func.count(), func.max(column)).select_from(column.table)
+    if criteria:
+        stmt = stmt.where(*criteria)
+    return tuple(db.session.execute(stmt).one())
+
+
+def collection_validator(*states):
+    # בלי Last-Modified: max(updated_at) חוזר אחורה כשהשורה החדשה ביותר נמחקת, ו-If-Modified-Since היה מחזיר 304
+    # על רשימה שהשתנתה. ב-ETag המספר של השורות משתנה גם במחיקה
+    digest = hashlib.sha1(f"{request.full_path}|{states!r}".encode()).hexdigest()
+    return digest, None
+
+
+def row_validator(column, row_id, *states):
+    # None כשהשורה לא קיימת - הפונקציה עצמה תחזיר 404
+    row_state = table_state(column, column.table.c.id == row_id)
+    if row_state[0] == 0:
+        return None
+    digest, _ = collection_validator(row_state, *states)
+    if states or row_state[1] is None:
+        # גם כאן מחיקה של שורת בן לא מקדמת אף חותמת זמן
+        return digest, None
+    return digest, row_state[1].replace(tzinfo=timezone.utc)
+
+
+def conditional(get_validator):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            validator = get_validator(**kwargs)
+            if validator is None:
+                return view(*args, **kwargs)
+
+            etag, last_modified = validator
+            if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            # send_file כבר שם ETag ו-Last-Modified של הקובץ עצמו, ו-If-Range של בקשות Range נבדק מולם
+            if response.get_etag()[0] is None:
+                response.set_etag(etag, weak=True)
+                if last_modified is not None:
+                    response.last_modified = last_modified
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
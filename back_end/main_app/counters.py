@@ -0,0 +1,59 @@
+from sqlalchemy import func, select, update
+from main_app.extensions import db
+from main_app.models.models import (ForumPost, ForumReply, ForumCluster, Question, Answer, QueueStat,
+                                    CategoryLessons, Lesson)
+
+
+def increment(column, row_id, delta=1, **values):
+    # UPDATE יחסי (col = col + delta) ולא קריאה-חישוב-כתיבה: שתי כתיבות מקבילות לא דורסות זו את זו
+    if row_id is None:
+        return
+    model = column.class_
+    db.session.execute(
+        update(model).where(model.id == row_id).values({column.key: column + delta, **values})
+        .execution_options(synchronize_session=False)
+    )
+
+
+def adjust_stat(name, delta):
+    db.session.execute(update(QueueStat).where(QueueStat.name == name).values(value=QueueStat.value + delta))
+
+
+# עמודת מונה -> הערך הנכון כ-subquery מתואם, עבור repair
+COUNTERS = {
+    'question.answer_count': (Question.answer_count, lambda: select(func.count()).where(
+        Answer.question_id == Question.id).scalar_subquery()),
+    'forum_post.reply_count': (ForumPost.reply_count, lambda: select(func.count()).where(
+        ForumReply.post_id == ForumPost.id).scalar_subquery()),
+    'forum_post.last_reply_at': (ForumPost.last_reply_at, lambda: select(func.max(ForumReply.created_at)).where(
+        ForumReply.post_id == ForumPost.id).scalar_subquery()),
+    'forum_cluster.post_count': (ForumCluster.post_count, lambda: select(func.count()).where(
+        ForumPost.cluster_id == ForumCluster.id).scalar_subquery()),
+    'category_lessons.lesson_count': (CategoryLessons.lesson_count, lambda: select(func.count()).where(
+        Lesson.category_id == CategoryLessons.id).scalar_subquery()),
+}
+
+
+def repair(names=None):
+    # UPDATE אחד לכל מונה, רק לשורות שהערך שלהן סטה - מחזיר כמה שורות תוקנו
+    fixed = {}
+    for name, (column, expected) in COUNTERS.items():
+        if names and name not in names:
+            continue
+        model = column.class_
+        result = db.session.execute(
+            update(model).where(column.is_distinct_from(expected())).values({column.key: expected()})
+            .execution_options(synchronize_session=False)
+        )
+        fixed[name] = result.rowcount
+
+    name = f"queue_stat.{QueueStat.UNANSWERED_QUESTIONS}"
+    if not names or name in names:
+        unanswered = select(func.count()).select_from(Question).where(Question.is_answered == False).scalar_subquery()
+        result = db.session.execute(
+            update(QueueStat).where(QueueStat.name == QueueStat.UNANSWERED_QUESTIONS,
+                                    QueueStat.value != unanswered).values(value=unanswered)
+        )
+        fixed[name] = result.rowcount
+    db.session.commit()
+    return fixed
@@ -1,8 +1,22 @@
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.engine import Engine
 from sqlalchemy import event
+from main_app.storage.storage import Storage
+from main_app.response_cache import ResponseCache
+from main_app.compression import Compression
+from main_app.instrumentation import Instrumentation
+from main_app.metrics import Metrics
+from main_app.slow_query import SlowQueryLog
+from main_app.change_feed import ChangeFeed
 
 db = SQLAlchemy()
+storage = Storage()
+response_cache = ResponseCache()
+compression = Compression()
+instrumentation = Instrumentation()
+metrics = Metrics()
+slow_query_log = SlowQueryLog()
+change_feed = ChangeFeed()
 
 @event.listens_for(Engine, "connect")
 def set_sqlite_pragma(dbapi_connection, connection_record):
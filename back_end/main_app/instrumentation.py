@@ -0,0 +1,160 @@
+import json
+import logging
+import time
+from collections import Counter
+from flask import g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from main_app.metrics import STORAGE_LATENCY
+from main_app.batch import is_sub_request
+
+logger = logging.getLogger('main_app.performance')
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.db_time = 0.0
+        self.storage_calls = 0
+        self.storage_time = 0.0
+        self.serialization_time = 0.0
+        self.statements = Counter()
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def merge(self, other):
+        self.query_count += other.query_count
+        self.db_time += other.db_time
+        self.storage_calls += other.storage_calls
+        self.storage_time += other.storage_time
+        self.serialization_time += other.serialization_time
+        self.statements.update(other.statements)
+
+
+def current_stats():
+    if not has_app_context():
+        return None
+    return g.get('request_stats')
+
+
+def record_serialization(elapsed):
+    stats = current_stats()
+    if stats is not None:
+        stats.serialization_time += elapsed
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    stats = current_stats()
+    if stats is not None:
+        stats.query_count += 1
+        stats.db_time += elapsed
+        stats.statements[statement] += 1
+
+
+@event.listens_for(Engine, "handle_error")
+def handle_error(context):
+    # בשאילתה שנכשלה after_cursor_execute לא נקרא - בלי זה הזמן שלה היה נזקף לשאילתה הבאה
+    if context.connection is not None and context.connection.info.get('query_started'):
+        context.connection.info['query_started'].pop()
+
+
+class InstrumentedStorage:
+    # עוטף את ה-backend ומודד כל קריאה (לבקשה הנוכחית ול-/metrics). גוף של get_stream/get_range
+    # נקרא אחרי שהכותרות כבר נשלחו, ולכן נמדדת רק פתיחת הקריאה
+    def __init__(self, backend):
+        self.backend = backend
+
+    def __getattr__(self, name):
+        attribute = getattr(self.backend, name)
+        if not callable(attribute):
+            return attribute
+
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            status = 'error'
+            try:
+                result = attribute(*args, **kwargs)
+                status = 'ok'
+                return result
+            finally:
+                elapsed = time.perf_counter() - started
+                STORAGE_LATENCY.observe(elapsed, backend=self.backend.name, operation=name, status=status)
+                stats = current_stats()
+                if stats is not None:
+                    stats.storage_calls += 1
+                    stats.storage_time += elapsed
+        return timed
+
+
+class Instrumentation:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PERF_INSTRUMENTATION', True)
+        app.config.setdefault('PERF_SERVER_TIMING', True)
+        app.config.setdefault('PERF_N_PLUS_ONE_THRESHOLD', 5)
+        if 'storage' in app.extensions:
+            app.extensions['storage'] = InstrumentedStorage(app.extensions['storage'])
+        if not app.config['PERF_INSTRUMENTATION']:
+            return
+
+        self.app = app
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+
+    @staticmethod
+    def before_request():
+        # תת-בקשה של /batch סופרת את השאילתות שלה לתוך הסטטיסטיקה של בקשת ה-batch
+        if is_sub_request():
+            return
+        g.request_stats = RequestStats()
+
+    def find_repeated_statements(self, stats):
+        # אותה שאילתה בדיוק שרצה שוב ושוב עם פרמטרים שונים - הסימן של lazy load בתוך לולאה
+        threshold = self.app.config['PERF_N_PLUS_ONE_THRESHOLD']
+        return [(statement, count) for statement, count in stats.statements.most_common()
+                if count >= threshold]
+
+    def after_request(self, response):
+        stats = current_stats()
+        if stats is None or is_sub_request():
+            return response
+
+        total = stats.elapsed()
+        if self.app.config['PERF_SERVER_TIMING']:
+            response.headers.add('Server-Timing', ', '.join([
+                f'db;dur={stats.db_time * 1000:.1f};desc="{stats.query_count} queries"',
+                f'storage;dur={stats.storage_time * 1000:.1f};desc="{stats.storage_calls} calls"',
+                f'serialize;dur={stats.serialization_time * 1000:.1f}',
+                f'total;dur={total * 1000:.1f}'
+            ]))
+
+        repeated = self.find_repeated_statements(stats)
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'duration_ms': round(total * 1000, 2),
+            'queries': stats.query_count,
+            'db_ms': round(stats.db_time * 1000, 2),
+            'storage_calls': stats.storage_calls,
+            'storage_ms': round(stats.storage_time * 1000, 2),
+            'serialize_ms': round(stats.serialization_time * 1000, 2)
+        }
+        logger.info(json.dumps(record), extra={'request_stats': record})
+        for statement, count in repeated:
+            logger.warning(json.dumps({'n_plus_one': True, 'endpoint': request.endpoint,
+                                       'count': count, 'statement': statement}))
+        return response
@@ -0,0 +1,280 @@
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from flask import g, request
+from main_app.batch import is_sub_request
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, registry, name, documentation, buckets=None):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.samples = {}
+        registry.register(self)
+
+    @staticmethod
+    def label_key(labels):
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self.label_key(labels)
+        with self.registry.lock:
+            self.samples[key] = self.samples.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self.label_key(labels)
+        with self.registry.lock:
+            self.samples[key] = self.samples.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self.registry.lock:
+            self.samples[self.label_key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, documentation, buckets=list(buckets))
+
+    def observe(self, value, **labels):
+        key = self.label_key(labels)
+        with self.registry.lock:
+            # מונים מצטברים לכל גבול, ואחריהם sum ו-count
+            sample = self.samples.get(key)
+            if sample is None:
+                sample = self.samples[key] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    sample[index] += 1
+            sample[-2] += value
+            sample[-1] += 1
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+
+    def reset(self):
+        # אחרי fork (gunicorn --preload) כל worker מתחיל מאפס ולא סופר שוב את ערכי ה-master
+        with self.lock:
+            for metric in self.metrics:
+                metric.samples = {}
+
+    def snapshot(self):
+        for collect in self.collectors:
+            collect()
+        with self.lock:
+            return {metric.name: {
+                'type': metric.kind,
+                'help': metric.documentation,
+                'buckets': metric.buckets,
+                'samples': [[list(key), value] for key, value in metric.samples.items()]
+            } for metric in self.metrics}
+
+
+def merge_snapshots(snapshots):
+    # snapshots: [(snapshot, alive)]. מונים והיסטוגרמות מסוכמים גם מתהליכים שכבר מתו, gauges רק מתהליכים חיים
+    merged = {}
+    for snapshot, alive in snapshots:
+        for name, metric in snapshot.items():
+            if metric['type'] == 'gauge' and not alive:
+                continue
+            target = merged.setdefault(name, dict(metric, samples={}))
+            for labels, value in metric['samples']:
+                key = tuple(tuple(label) for label in labels)
+                if metric['type'] == 'histogram':
+                    existing = target['samples'].get(key)
+                    target['samples'][key] = value if existing is None else [a + b for a, b in zip(existing, value)]
+                else:
+                    target['samples'][key] = target['samples'].get(key, 0) + value
+    return merged
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = []
+    for key, value in labels:
+        value = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{key}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+def render(merged):
+    lines = []
+    for name in sorted(merged):
+        metric = merged[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        for labels, value in sorted(metric['samples'].items()):
+            if metric['type'] != 'histogram':
+                lines.append(f"{name}{format_labels(labels)} {value}")
+                continue
+            for bound, count in zip(metric['buckets'], value):
+                lines.append(f"{name}_bucket{format_labels(labels + (('le', repr(float(bound))),))} {count}")
+            lines.append(f"{name}_bucket{format_labels(labels + (('le', '+Inf'),))} {value[-1]}")
+            lines.append(f"{name}_sum{format_labels(labels)} {value[-2]}")
+            lines.append(f"{name}_count{format_labels(labels)} {value[-1]}")
+    return '\n'.join(lines) + '\n'
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+registry = MetricsRegistry()
+os.register_at_fork(after_in_child=registry.reset)
+
+REQUEST_LATENCY = Histogram(registry, 'http_request_duration_seconds', 'Request latency by blueprint and endpoint')
+REQUESTS_IN_FLIGHT = Gauge(registry, 'http_requests_in_flight', 'Requests currently being served')
+DB_POOL_CHECKOUT = Histogram(registry, 'db_pool_checkout_seconds', 'Time spent waiting for a pooled DB connection',
+                             buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0))
+DB_POOL_CHECKED_OUT = Gauge(registry, 'db_pool_checked_out', 'DB connections currently checked out of the pool')
+STORAGE_LATENCY = Histogram(registry, 'storage_operation_duration_seconds', 'Storage (S3/local) call latency')
+CACHE_LOOKUPS = Counter(registry, 'response_cache_lookups_total', 'Response cache lookups by result')
+
+
+class Metrics:
+    def __init__(self, app=None):
+        self.last_flush = 0.0
+        self.app = None
+        self.multiproc_dir = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('METRICS_MULTIPROC_DIR', None)
+        app.config.setdefault('METRICS_FLUSH_INTERVAL', 1.0)
+        if not app.config['METRICS_ENABLED']:
+            self.multiproc_dir = None
+            return
+
+        self.app = app
+        self.multiproc_dir = app.config['METRICS_MULTIPROC_DIR']
+        if self.multiproc_dir:
+            os.makedirs(self.multiproc_dir, exist_ok=True)
+            atexit.register(self.flush)
+
+        self.instrument_pool(app)
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        app.teardown_request(self.teardown_request)
+
+    @staticmethod
+    def instrument_pool(app):
+        # אין ב-SQLAlchemy אירוע "התחלת המתנה" ל-checkout, לכן עוטפים את raw_connection של ה-engine.
+        # העטיפה על ה-engine ולא על ה-pool כדי שתשרוד engine.dispose() אחרי fork
+        from main_app.extensions import db
+        with app.app_context():
+            engine = db.engine
+        raw_connection = engine.raw_connection
+
+        def timed_raw_connection(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return raw_connection(*args, **kwargs)
+            finally:
+                DB_POOL_CHECKOUT.observe(time.perf_counter() - started)
+        engine.raw_connection = timed_raw_connection
+
+        def collect_pool():
+            checked_out = getattr(engine.pool, 'checkedout', None)
+            if checked_out is not None:
+                DB_POOL_CHECKED_OUT.set(checked_out())
+        registry.collectors.append(collect_pool)
+
+    @staticmethod
+    def before_request():
+        # תת-בקשות של /batch נמדדות כחלק מבקשת ה-batch
+        if is_sub_request():
+            return
+        g.metrics_started = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc()
+
+    def after_request(self, response):
+        started = None if is_sub_request() else g.pop('metrics_started', None)
+        if started is not None:
+            # נתיבים שלא נמצאו נספרים יחד, כדי שסריקות של URL אקראיים לא ינפחו את מספר הסדרות
+            REQUEST_LATENCY.observe(time.perf_counter() - started,
+                                    blueprint=request.blueprint or '',
+                                    endpoint=request.endpoint or 'unmatched',
+                                    method=request.method,
+                                    status=response.status_code)
+        return response
+
+    def teardown_request(self, exception=None):
+        if is_sub_request():
+            return
+        REQUESTS_IN_FLIGHT.dec()
+        if self.multiproc_dir and time.monotonic() - self.last_flush >= self.app.config['METRICS_FLUSH_INTERVAL']:
+            self.flush()
+
+    def snapshot_path(self, pid):
+        return os.path.join(self.multiproc_dir, f"metrics_{pid}.json")
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        path = self.snapshot_path(os.getpid())
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as snapshot_file:
+            json.dump(registry.snapshot(), snapshot_file)
+        os.replace(tmp_path, path)
+
+    def collect(self):
+        own_pid = os.getpid()
+        snapshots = [(registry.snapshot(), True)]
+        if self.multiproc_dir:
+            for path in glob.glob(os.path.join(self.multiproc_dir, 'metrics_*.json')):
+                pid = int(os.path.basename(path)[len('metrics_'):-len('.json')])
+                if pid == own_pid:
+                    continue
+                try:
+                    with open(path) as snapshot_file:
+                        snapshots.append((json.load(snapshot_file), pid_alive(pid)))
+                except (OSError, ValueError):
+                    continue
+        return merge_snapshots(snapshots)
+
+    def render(self):
+        merged = self.collect()
+        lookups = merged.get(CACHE_LOOKUPS.name, {}).get('samples', {})
+        hits = sum(value for labels, value in lookups.items() if ('result', 'hit') in labels)
+        total = sum(lookups.values())
+        merged['response_cache_hit_ratio'] = {
+            'type': 'gauge', 'help': 'Response cache hits / lookups across all workers', 'buckets': None,
+            'samples': {(): hits / total if total else 0.0}
+        }
+        return render(merged)
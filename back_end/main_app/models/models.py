@@ -1,7 +1,23 @@
 from datetime import datetime
+from sqlalchemy import DDL, event
 from main_app.extensions import db
+from main_app.models.search_index import QUESTION_FTS_TABLES, QUESTION_TRIGGERS, ANSWER_TRIGGERS, DROP_QUESTION_FTS
 from werkzeug.security import generate_password_hash, check_password_hash
 
+def wants(fields, name):
+    # fields=None פירושו כל השדות; 'attachments.filename' מבקש גם את הקשר attachments
+    return fields is None or any(field.partition('.')[0] == name for field in fields)
+
+def nested_fields(fields, name):
+    if fields is None or name in fields:
+        return None
+    return [field.partition('.')[2] for field in fields if field.partition('.')[0] == name]
+
+def select_fields(data, fields):
+    if fields is None:
+        return data
+    return {key: value for key, value in data.items() if wants(fields, key)}
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     firstname = db.Column(db.String(100), nullable=False)
@@ -48,14 +64,17 @@ class User(db.Model):
         }
     
 class Attachment(db.Model):
+    __table_args__ = {'sqlite_autoincrement': True}  # ראו ForumPost
+
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255), nullable=False)
     s3_key = db.Column(db.String(255), nullable=False, unique=True)
     file_type = db.Column(db.String(50))
     file_size = db.Column(db.Integer)  
     upload_date = db.Column(db.DateTime, default=datetime.utcnow)
-    post_id = db.Column(db.Integer, db.ForeignKey('forum_post.id'), nullable=True)
-    reply_id = db.Column(db.Integer, db.ForeignKey('forum_reply.id'), nullable=True)
+    # הקבצים נמחקים יחד עם הפוסט או התגובה ב-DB עצמו; את הקבצים ב-storage מוחק ה-service
+    post_id = db.Column(db.Integer, db.ForeignKey('forum_post.id', ondelete='CASCADE'), nullable=True, index=True)
+    reply_id = db.Column(db.Integer, db.ForeignKey('forum_reply.id', ondelete='CASCADE'), nullable=True, index=True)
 
     def __init__(self, filename, s3_key, file_type, file_size, post_id=None, reply_id=None):
         self.filename = filename
@@ -78,14 +97,22 @@ class Attachment(db.Model):
         }
 
 class ForumPost(db.Model):
+    # AUTOINCREMENT - מזהה לא חוזר לשימוש, כי המזהים של שורות שהועברו לארכיון ממשיכים להתקיים ב-archived_*
+    __table_args__ = {'sqlite_autoincrement': True}
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), unique=True, nullable=False)
     content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     author_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     author = db.relationship('User', backref=db.backref('forum_posts', lazy=True))
-    attachments = db.relationship('Attachment', backref='post', lazy=True)
-    cluster_id = db.Column(db.Integer, db.ForeignKey('forum_cluster.id'), nullable=True)
+    attachments = db.relationship('Attachment', backref='post', lazy=True, passive_deletes=True)
+    # מחיקת אשכול משאירה את הפוסטים שלו, בלי אשכול
+    cluster_id = db.Column(db.Integer, db.ForeignKey('forum_cluster.id', ondelete='SET NULL'), nullable=True, index=True)
+    # מונים שנשמרים ב-services באותה טרנזקציה כמו התגובות עצמן (flask counters repair מחשב מחדש)
+    reply_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    last_reply_at = db.Column(db.DateTime)
 
     def __init__(self, title, content, author_id, cluster_id, created_at=None):
         self.title = title
@@ -95,27 +122,34 @@ class ForumPost(db.Model):
         if created_at:
             self.created_at = created_at
 
-    def to_dict(self):
-        return {
+    def to_dict(self, fields=None):
+        data = {
             'id': self.id,
             'title': self.title,
             'content': self.content,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'author_id': self.author_id,
             'cluster_id': self.cluster_id,
-            'attachments': [attachment.to_dict() for attachment in self.attachments]
+            'reply_count': self.reply_count,
+            'last_reply_at': self.last_reply_at.isoformat() if self.last_reply_at else None
         }
+        if wants(fields, 'attachments'):
+            data['attachments'] = [select_fields(attachment.to_dict(), nested_fields(fields, 'attachments')) for attachment in self.attachments]
+        return select_fields(data, fields)
 
 
 class ForumReply(db.Model):
+    __table_args__ = {'sqlite_autoincrement': True}  # ראו ForumPost
+
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     author_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    post_id = db.Column(db.Integer, db.ForeignKey('forum_post.id'), nullable=False)
+    post_id = db.Column(db.Integer, db.ForeignKey('forum_post.id', ondelete='CASCADE'), nullable=False, index=True)
     author = db.relationship('User', backref=db.backref('forum_replies', lazy=True))
-    post = db.relationship('ForumPost', backref=db.backref('replies', lazy=True))
-    attachments = db.relationship('Attachment', backref='reply', lazy=True)
+    post = db.relationship('ForumPost', backref=db.backref('replies', lazy=True, passive_deletes=True))
+    attachments = db.relationship('Attachment', backref='reply', lazy=True, passive_deletes=True)
 
     def __init__(self, content, author_id, post_id, created_at=None):
         self.content = content
@@ -124,22 +158,26 @@ class ForumReply(db.Model):
         if created_at:
             self.created_at = created_at
 
-    def to_dict(self):
-        return {
+    def to_dict(self, fields=None):
+        data = {
             'id': self.id,
             'content': self.content,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'author_id': self.author_id,
-            'post_id': self.post_id,
-            'attachments': [attachment.to_dict() for attachment in self.attachments]
+            'post_id': self.post_id
         }
+        if wants(fields, 'attachments'):
+            data['attachments'] = [select_fields(attachment.to_dict(), nested_fields(fields, 'attachments')) for attachment in self.attachments]
+        return select_fields(data, fields)
 
 class ForumCluster(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False)
     description = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    posts = db.relationship('ForumPost', backref='cluster', lazy=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    posts = db.relationship('ForumPost', backref='cluster', lazy=True, passive_deletes=True)
+    post_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     author_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     author = db.relationship('User', backref=db.backref('forum_clusters', lazy=True))
 
@@ -154,30 +192,38 @@ class ForumCluster(db.Model):
             'name': self.name,
             'description': self.description,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'author_id': self.author_id
+            'author_id': self.author_id,
+            'post_count': self.post_count
         }
 
 class Event(db.Model):
+    __table_args__ = {'sqlite_autoincrement': True}  # ראו ForumPost
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     images = db.relationship('EventImage', backref='event', lazy=True, cascade="all, delete-orphan")
 
     def __init__(self, title, description=None):
         self.title = title
         self.description = description
 
-    def to_dict(self):
-        return {
+    def to_dict(self, fields=None):
+        data = {
             'id': self.id,
             'title': self.title,
             'description': self.description,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'images': [image.to_dict() for image in self.images]
+            'created_at': self.created_at.isoformat() if self.created_at else None
         }
+        if wants(fields, 'images'):
+            data['images'] = [select_fields(image.to_dict(), nested_fields(fields, 'images')) for image in self.images]
+        return select_fields(data, fields)
 
 class EventImage(db.Model):
+    __table_args__ = {'sqlite_autoincrement': True}  # ראו ForumPost
+
     id = db.Column(db.Integer, primary_key=True)
     s3_key = db.Column(db.String(255), nullable=False, unique=True)
     file_name = db.Column(db.String(255), nullable=False)
@@ -205,9 +251,23 @@ class Question(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     question = db.Column(db.Text, nullable=False)
     asked_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     asker_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    asker = db.relationship('User', backref=db.backref('asked_questions', lazy=True))
+    asker = db.relationship('User', foreign_keys=[asker_id], backref=db.backref('asked_questions', lazy=True))
     is_answered = db.Column(db.Boolean, default=False)
+    answer_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # נעילה זמנית של איש צוות שעונה על השאלה; פגה אחרי claim_expires_at
+    claimed_by_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
+    claim_expires_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        # התור של אנשי הצוות: רק השאלות הפתוחות, מהישנה לחדשה
+        db.Index('ix_question_unanswered_queue', 'asked_at', 'id',
+                 sqlite_where=db.text('is_answered = 0'), postgresql_where=db.text('is_answered = false')),
+        # רשימת השאלות לפי asked_at (cursor), עם או בלי סינון לפי השואל
+        db.Index('ix_question_asked_at_id', 'asked_at', 'id'),
+        db.Index('ix_question_asker_id_asked_at', 'asker_id', 'asked_at', 'id'),
+    )
 
     def __init__(self, question, asker_id, asked_at=None, is_answered=False):
         self.question = question
@@ -222,17 +282,19 @@ class Question(db.Model):
             'question': self.question,
             'asked_at': self.asked_at.isoformat() if self.asked_at else None,
             'asker_id': self.asker_id,
-            'is_answered': self.is_answered
+            'is_answered': self.is_answered,
+            'answer_count': self.answer_count
         }
 
 class Answer(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     answer = db.Column(db.Text, nullable=False)
     answered_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     answerer_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    question_id = db.Column(db.Integer, db.ForeignKey('question.id'), nullable=False)
+    question_id = db.Column(db.Integer, db.ForeignKey('question.id', ondelete='CASCADE'), nullable=False, index=True)
     answerer = db.relationship('User', backref=db.backref('given_answers', lazy=True))
-    question = db.relationship('Question', backref=db.backref('answers', lazy=True))
+    question = db.relationship('Question', backref=db.backref('answers', lazy=True, passive_deletes=True))
 
     def __init__(self, answer, answerer_id, question_id, answered_at=None):
         self.answer = answer
@@ -250,20 +312,54 @@ class Answer(db.Model):
             'question_id': self.question_id
         }
 
+# האינדקס לחיפוש נוצר יחד עם הטבלאות (create_all); בפרודקשן ה-migration יוצרת אותו
+for statement in QUESTION_FTS_TABLES + QUESTION_TRIGGERS:
+    event.listen(Question.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+for statement in ANSWER_TRIGGERS:
+    event.listen(Answer.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+for statement in DROP_QUESTION_FTS:
+    event.listen(Question.__table__, 'after_drop', DDL(statement).execute_if(dialect='sqlite'))
+
+class QueueStat(db.Model):
+    # מונים שמתעדכנים באותה טרנזקציה כמו השינוי עצמו - במקום COUNT(*) על כל הטבלה
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+    UNANSWERED_QUESTIONS = 'unanswered_questions'
+
+event.listen(QueueStat.__table__, 'after_create',
+             DDL(f"INSERT INTO queue_stat (name, value) VALUES ('{QueueStat.UNANSWERED_QUESTIONS}', 0)"))
+
+class ChangeEvent(db.Model):
+    # יומן שינויים ל-/stream: נכתב באותה טרנזקציה כמו השינוי, וכל worker קורא ממנו לפי id.
+    # AUTOINCREMENT - מזהה לא חוזר לשימוש אחרי ניקוי, כדי ש-Last-Event-ID ישן לא יצביע על אירוע אחר
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    id = db.Column(db.Integer, primary_key=True)
+    topic = db.Column(db.String(64), nullable=False)
+    kind = db.Column(db.String(32), nullable=False)
+    data = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
 class CategoryLessons(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), nullable=False, unique=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     lessons = db.relationship('Lesson', back_populates='category')
+    lesson_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     def __init__(self, name):
         self.name = name
 
-    def to_dict(self):
-        return {
+    def to_dict(self, fields=None):
+        data = {
             'id': self.id,
             'name': self.name,
-            'lessons': [lesson.to_dict() for lesson in self.lessons]
+            'lesson_count': self.lesson_count
         }
+        if wants(fields, 'lessons'):
+            data['lessons'] = [select_fields(lesson.to_dict(), nested_fields(fields, 'lessons')) for lesson in self.lessons]
+        return select_fields(data, fields)
 
 
 class Lesson(db.Model):
@@ -273,8 +369,14 @@ class Lesson(db.Model):
     is_audio = db.Column(db.Boolean, nullable=False) 
     s3_key = db.Column(db.String(255), nullable=False, unique=True)
     file_size = db.Column(db.Integer) 
+    duration = db.Column(db.Float)
+    bitrate = db.Column(db.Integer)
+    codec = db.Column(db.String(50))
+    sample_rate = db.Column(db.Integer)
+    waveform = db.Column(db.LargeBinary)  # בייט אחד (0-255) לכל נקודה בגרף
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
-    category_id = db.Column(db.Integer, db.ForeignKey('category_lessons.id'), nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    category_id = db.Column(db.Integer, db.ForeignKey('category_lessons.id'), nullable=False, index=True)
     category = db.relationship('CategoryLessons', back_populates='lessons')
 
     def __init__(self, title, description, is_audio, s3_key, file_size, category_id):
@@ -293,6 +395,71 @@ class Lesson(db.Model):
             'is_audio': self.is_audio,
             's3_key': self.s3_key,
             'file_size': self.file_size,
+            'duration': self.duration,
+            'bitrate': self.bitrate,
+            'codec': self.codec,
+            'sample_rate': self.sample_rate,
+            'waveform': list(self.waveform) if self.waveform else None,
             'uploaded_at': self.uploaded_at.isoformat() if self.uploaded_at else None,
             'category_id': self.category_id
         }
+
+
+# ארכיון: שרשורים ואירועים ללא פעילות מועברים לכאן ע"י flask archive run, עם אותם מזהים.
+# אין מפתחות זרים - שורות בארכיון לא חוסמות מחיקה של משתמש או אשכול, ולא נמחקות איתם
+class ArchivedForumPost(db.Model):
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    title = db.Column(db.String(100), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    author_id = db.Column(db.Integer, nullable=False)
+    cluster_id = db.Column(db.Integer, index=True)
+    reply_count = db.Column(db.Integer, nullable=False, default=0)
+    last_reply_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+class ArchivedForumReply(db.Model):
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    content = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    author_id = db.Column(db.Integer, nullable=False)
+    post_id = db.Column(db.Integer, nullable=False, index=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+class ArchivedAttachment(db.Model):
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    filename = db.Column(db.String(255), nullable=False)
+    # המפתח החדש, תחת ARCHIVE_STORAGE_PREFIX
+    s3_key = db.Column(db.String(300), nullable=False, unique=True)
+    file_type = db.Column(db.String(50))
+    file_size = db.Column(db.Integer)
+    upload_date = db.Column(db.DateTime)
+    post_id = db.Column(db.Integer, index=True)
+    reply_id = db.Column(db.Integer, index=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+class ArchivedEvent(db.Model):
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    title = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.Text)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    images = db.relationship('ArchivedEventImage', lazy=True,
+                             primaryjoin='ArchivedEvent.id == foreign(ArchivedEventImage.event_id)')
+
+    # אותו פלט כמו של אירוע פעיל
+    to_dict = Event.to_dict
+
+class ArchivedEventImage(db.Model):
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    s3_key = db.Column(db.String(300), nullable=False, unique=True)
+    file_name = db.Column(db.String(255), nullable=False)
+    file_size = db.Column(db.Integer)
+    uploaded_at = db.Column(db.DateTime)
+    event_id = db.Column(db.Integer, nullable=False, index=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    to_dict = EventImage.to_dict
@@ -0,0 +1,59 @@
+from main_app.models.models import (User, Attachment, ForumPost, ForumReply, ForumCluster, Event, EventImage,
+                                    Question, Answer, CategoryLessons, Lesson, ArchivedForumPost, ArchivedForumReply,
+                                    ArchivedAttachment)
+from main_app.serialization import RowSchema
+
+
+def waveform_to_list(waveform):
+    return list(waveform) if waveform else None
+
+
+USER_SCHEMA = RowSchema(User, ['id', 'firstname', 'lastname', 'email', 'class_cycle',
+                               'is_student', 'is_staff_member', 'is_admin', 'is_guest'])
+
+ATTACHMENT_SCHEMA = RowSchema(Attachment, ['id', 'filename', 's3_key', 'file_type', 'file_size',
+                                           'upload_date', 'post_id', 'reply_id'])
+
+POST_SCHEMA = RowSchema(ForumPost, ['id', 'title', 'content', 'created_at', 'author_id', 'cluster_id',
+                                    'reply_count', 'last_reply_at'],
+                        nested={'attachments': (ATTACHMENT_SCHEMA, 'post_id')})
+
+REPLY_SCHEMA = RowSchema(ForumReply, ['id', 'content', 'created_at', 'author_id', 'post_id'],
+                         nested={'attachments': (ATTACHMENT_SCHEMA, 'reply_id')})
+
+# אותם שדות מטבלאות הארכיון, לשרשורים שהועברו ע"י flask archive run
+ARCHIVED_ATTACHMENT_SCHEMA = RowSchema(ArchivedAttachment, ATTACHMENT_SCHEMA.fields)
+
+ARCHIVED_POST_SCHEMA = RowSchema(ArchivedForumPost, POST_SCHEMA.fields,
+                                 nested={'attachments': (ARCHIVED_ATTACHMENT_SCHEMA, 'post_id')})
+
+ARCHIVED_REPLY_SCHEMA = RowSchema(ArchivedForumReply, REPLY_SCHEMA.fields,
+                                  nested={'attachments': (ARCHIVED_ATTACHMENT_SCHEMA, 'reply_id')})
+
+CLUSTER_SCHEMA = RowSchema(ForumCluster, ['id', 'name', 'description', 'created_at', 'author_id', 'post_count'])
+
+EVENT_IMAGE_SCHEMA = RowSchema(EventImage, ['id', 's3_key', 'file_name', 'file_size', 'uploaded_at', 'event_id'])
+
+EVENT_SCHEMA = RowSchema(Event, ['id', 'title', 'description', 'created_at'],
+                         nested={'images': (EVENT_IMAGE_SCHEMA, 'event_id')})
+
+QUESTION_SCHEMA = RowSchema(Question, ['id', 'question', 'asked_at', 'asker_id', 'is_answered', 'answer_count'])
+
+QUEUE_SCHEMA = RowSchema(Question, ['id', 'question', 'asked_at', 'asker_id', 'claimed_by_id', 'claim_expires_at'])
+
+ANSWER_SCHEMA = RowSchema(Answer, ['id', 'answer', 'answered_at', 'answerer_id', 'question_id'])
+
+ANSWER_WITH_ANSWERER_SCHEMA = RowSchema(
+    Answer, ['id', 'answer', 'answered_at', 'answerer_id', 'answerer_name', 'question_id'],
+    joined={'answerer_name': (User, Answer.answerer_id == User.id, User.firstname + ' ' + User.lastname)}
+)
+
+QUESTION_WITH_ANSWERS_SCHEMA = RowSchema(Question, ['id', 'question', 'asked_at', 'asker_id', 'is_answered', 'answer_count'],
+                                         nested={'answers': (ANSWER_WITH_ANSWERER_SCHEMA, 'question_id')})
+
+LESSON_SCHEMA = RowSchema(Lesson, ['id', 'title', 'description', 'is_audio', 's3_key', 'file_size', 'duration',
+                                   'bitrate', 'codec', 'sample_rate', 'waveform', 'uploaded_at', 'category_id'],
+                          converters={'waveform': waveform_to_list})
+
+CATEGORY_SCHEMA = RowSchema(CategoryLessons, ['id', 'name', 'lesson_count'],
+                            nested={'lessons': (LESSON_SCHEMA, 'category_id')})
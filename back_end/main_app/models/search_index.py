@@ -0,0 +1,53 @@
+# אינדקס FTS5 לשאלות ולתשובות (SQLite). triggers שומרים אותו מסונכרן באותה טרנזקציה של הכתיבה,
+# כך שאין תהליך רקע ואין חלון שבו שאלה חדשה לא נמצאת בחיפוש.
+# שורה אחת לכל שאלה (rowid = question.id); עמודת answers מחזיקה את כל התשובות שלה יחד.
+
+QUESTION_FTS_TABLES = [
+    "CREATE VIRTUAL TABLE question_fts USING fts5(question, answers, tokenize = 'unicode61 remove_diacritics 2')",
+    # שכיחות כל מונח במסמכים - לבחירת המונחים הנדירים (המבחינים) בהצעת שאלות דומות
+    "CREATE VIRTUAL TABLE question_fts_vocab USING fts5vocab(question_fts, 'row')",
+]
+
+ANSWERS_OF = "(SELECT group_concat(answer, ' ') FROM answer WHERE answer.question_id = {question_id})"
+
+QUESTION_TRIGGERS = [
+    """CREATE TRIGGER question_fts_insert AFTER INSERT ON question BEGIN
+        INSERT INTO question_fts (rowid, question, answers) VALUES (new.id, new.question, '');
+    END""",
+    """CREATE TRIGGER question_fts_update AFTER UPDATE OF question ON question BEGIN
+        UPDATE question_fts SET question = new.question WHERE rowid = new.id;
+    END""",
+    """CREATE TRIGGER question_fts_delete AFTER DELETE ON question BEGIN
+        DELETE FROM question_fts WHERE rowid = old.id;
+    END""",
+]
+
+ANSWER_TRIGGERS = [
+    f"""CREATE TRIGGER answer_fts_insert AFTER INSERT ON answer BEGIN
+        UPDATE question_fts SET answers = {ANSWERS_OF.format(question_id='new.question_id')}
+        WHERE rowid = new.question_id;
+    END""",
+    f"""CREATE TRIGGER answer_fts_update AFTER UPDATE OF answer, question_id ON answer BEGIN
+        UPDATE question_fts SET answers = {ANSWERS_OF.format(question_id='old.question_id')}
+        WHERE rowid = old.question_id;
+        UPDATE question_fts SET answers = {ANSWERS_OF.format(question_id='new.question_id')}
+        WHERE rowid = new.question_id;
+    END""",
+    f"""CREATE TRIGGER answer_fts_delete AFTER DELETE ON answer BEGIN
+        UPDATE question_fts SET answers = {ANSWERS_OF.format(question_id='old.question_id')}
+        WHERE rowid = old.question_id;
+    END""",
+]
+
+DROP_QUESTION_FTS = [
+    "DROP TABLE IF EXISTS question_fts_vocab",
+    "DROP TABLE IF EXISTS question_fts",
+]
+
+REBUILD_QUESTION_FTS = [
+    "DELETE FROM question_fts",
+    f"""INSERT INTO question_fts (rowid, question, answers)
+        SELECT question.id, question.question, COALESCE({ANSWERS_OF.format(question_id='question.id')}, '')
+        FROM question""",
+    "INSERT INTO question_fts (question_fts) VALUES ('optimize')",
+]
@@ -0,0 +1,67 @@
+import base64
+import json
+from datetime import datetime
+from flask import request
+from sqlalchemy import DateTime, and_, or_
+from werkzeug.exceptions import BadRequest
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def page_size(default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    try:
+        limit = int(request.args.get('limit', default))
+    except ValueError:
+        raise BadRequest("limit must be an integer")
+    if limit < 1:
+        raise BadRequest("limit must be positive")
+    return min(limit, maximum)
+
+
+def datetime_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise BadRequest(f"{name} must be an ISO 8601 date or datetime")
+
+
+def encode_cursor(row, columns):
+    values = [row[column.key] for column in columns]
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor, columns):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError(cursor)
+        return [datetime.fromisoformat(value) if isinstance(column.type, DateTime) else value
+                for column, value in zip(columns, values)]
+    except (ValueError, TypeError):
+        raise BadRequest("Invalid cursor")
+
+
+def after(columns, values, descending=False):
+    # (a, b) > (x, y) כ-OR מפורש: עובד בכל מסד ונשען על אינדקס על אותן עמודות
+    beyond = (lambda column, value: column < value) if descending else (lambda column, value: column > value)
+    return or_(*[
+        and_(*[column == value for column, value in zip(columns[:i], values[:i])], beyond(columns[i], values[i]))
+        for i in range(len(columns))
+    ])
+
+
+def keyset_page(schema, columns, *criteria, cursor=None, limit=DEFAULT_PAGE_SIZE, fields=None, descending=False):
+    # עמוד לפי מפתח במקום OFFSET: כל עמוד הוא סריקת טווח קצרה באינדקס, גם עמוק בתוך התור
+    if cursor:
+        criteria = criteria + (after(columns, decode_cursor(cursor, columns), descending),)
+    if fields is not None:
+        fields = fields + [column.key for column in columns if column.key not in fields]
+    order_by = [column.desc() for column in columns] if descending else columns
+    rows = schema.dump(*criteria, order_by=order_by, fields=fields, limit=limit + 1)
+    next_cursor = encode_cursor(rows[limit - 1], columns) if len(rows) > limit else None
+    return {'items': rows[:limit], 'next_cursor': next_cursor}
@@ -0,0 +1,214 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, request, Response
+from main_app.metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryCacheBackend:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (expires_at, tags, payload)
+        self._tag_keys = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def set(self, key, payload, tags, ttl):
+        if len(payload) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, tags, payload)
+            self.size += len(payload)
+            for tag in tags:
+                self._tag_keys.setdefault(tag, set()).add(key)
+            # פינוי לפי LRU עד שחוזרים למגבלת הגודל
+            while self.size > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def invalidate(self, tags):
+        with self._lock:
+            for tag in tags:
+                for key in self._tag_keys.pop(tag, set()):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tag_keys.clear()
+            self.size = 0
+
+    def _remove(self, key):
+        _, tags, payload = self._entries.pop(key)
+        self.size -= len(payload)
+        for tag in tags:
+            keys = self._tag_keys.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_keys[tag]
+
+    def info(self):
+        return {'backend': 'memory', 'entries': len(self._entries), 'bytes': self.size,
+                'max_bytes': self.max_bytes, 'evictions': self.evictions}
+
+
+class RedisCacheBackend:
+    KEY_PREFIX = 'response_cache:'
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        return self.client.get(self.KEY_PREFIX + key)
+
+    def set(self, key, payload, tags, ttl):
+        pipeline = self.client.pipeline()
+        pipeline.set(self.KEY_PREFIX + key, payload, ex=ttl)
+        for tag in tags:
+            tag_key = f"{self.KEY_PREFIX}tag:{tag}"
+            pipeline.sadd(tag_key, key)
+            pipeline.expire(tag_key, ttl)
+        pipeline.execute()
+
+    def invalidate(self, tags):
+        for tag in tags:
+            tag_key = f"{self.KEY_PREFIX}tag:{tag}"
+            keys = [self.KEY_PREFIX + key.decode() for key in self.client.smembers(tag_key)]
+            self.client.delete(tag_key, *keys)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.KEY_PREFIX + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+    def info(self):
+        # בשרת משותף הפינוי נעשה לפי maxmemory של השרת עצמו
+        stats = self.client.info('stats')
+        return {'backend': 'redis', 'evictions': stats.get('evicted_keys', 0)}
+
+
+class ResponseCache:
+    def __init__(self, app=None):
+        self.hits = 0
+        self.misses = 0
+        # += על מונה משותף אינו אטומי בין threads (gevent, BATCH_MAX_WORKERS)
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend_name = app.config.get('RESPONSE_CACHE_BACKEND', 'memory')
+        if backend_name == 'memory':
+            backend = MemoryCacheBackend(app.config.get('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+        elif backend_name == 'redis':
+            backend = RedisCacheBackend(app.config['RESPONSE_CACHE_REDIS_URL'])
+        elif backend_name == 'none':
+            backend = None
+        else:
+            raise ValueError(f"Unknown response cache backend: {backend_name}")
+        app.extensions['response_cache'] = backend
+
+    @property
+    def backend(self):
+        return current_app.extensions.get('response_cache')
+
+    @staticmethod
+    def make_key():
+        view_args = sorted((request.view_args or {}).items())
+        query_args = sorted(request.args.items(multi=True))
+        raw_key = f"{request.endpoint}|{view_args}|{query_args}"
+        return hashlib.sha1(raw_key.encode()).hexdigest()
+
+    def cached(self, tags, ttl=None):
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                backend = self.backend
+                if backend is None:
+                    return view(*args, **kwargs)
+
+                key = self.make_key()
+                try:
+                    payload = backend.get(key)
+                except Exception as e:
+                    logger.warning("Response cache lookup failed: %s", e)
+                    payload = None
+                if payload is not None:
+                    with self._lock:
+                        self.hits += 1
+                    CACHE_LOOKUPS.inc(result='hit', endpoint=request.endpoint)
+                    return self._load_response(payload)
+
+                with self._lock:
+                    self.misses += 1
+                CACHE_LOOKUPS.inc(result='miss', endpoint=request.endpoint)
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    try:
+                        backend.set(key, self._dump_response(response), tags,
+                                    ttl or current_app.config.get('RESPONSE_CACHE_TTL', 60))
+                    except Exception as e:
+                        logger.warning("Response cache store failed: %s", e)
+                return response
+            return wrapper
+        return decorator
+
+    def invalidate(self, *tags):
+        # נקרא אחרי commit - כשל במטמון לא יכול להכשיל כתיבה שכבר נשמרה
+        backend = self.backend
+        if backend is None:
+            return
+        try:
+            backend.invalidate(tags)
+        except Exception as e:
+            logger.warning("Response cache invalidation failed for %s: %s", tags, e)
+
+    def clear(self):
+        backend = self.backend
+        if backend is not None:
+            backend.clear()
+
+    @staticmethod
+    def _dump_response(response):
+        return f"{response.status_code}\n{response.mimetype}\n".encode() + response.get_data()
+
+    @staticmethod
+    def _load_response(payload):
+        status, mimetype, body = payload.split(b'\n', 2)
+        return Response(body, status=int(status), mimetype=mimetype.decode())
+
+    def stats(self):
+        backend = self.backend
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        stats = {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / lookups if lookups else None
+        }
+        if backend is not None:
+            stats.update(backend.info())
+        return stats
@@ -0,0 +1,22 @@
+from flask import Blueprint, Response, jsonify, request
+from flask_jwt_extended import jwt_required
+from main_app.batch import run_batch
+from werkzeug.exceptions import BadRequest
+
+batch_routes = Blueprint('batch', __name__)
+
+
+@batch_routes.route('/batch', methods=['POST'])
+@jwt_required(optional=True)
+def batch():
+    # ה-token נבדק כאן פעם אחת; תת-בקשות עם token לא תקין נכשלות כבר ברמת ה-batch
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            raise BadRequest("Expected a JSON object with a requests list")
+        body = run_batch(data.get('requests'))
+        return Response(body, mimetype='application/json')
+    except BadRequest as e:
+        return jsonify({"error": e.description}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
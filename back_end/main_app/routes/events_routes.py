@@ -1,32 +1,44 @@
 from flask import jsonify, request, Blueprint, current_app
 from main_app.services.events_service import EventService
 from main_app.services.user_service import UserService
+from main_app.extensions import response_cache
+from main_app.models.models import Event, EventImage
+from main_app.conditional import conditional, collection_validator, row_validator, table_state
+from main_app.serialization import requested_fields
+from main_app.models.schemas import EVENT_SCHEMA
 from werkzeug.exceptions import BadRequest, NotFound, Unauthorized
 
 events_routes = Blueprint('events', __name__)
 
 def get_event_service():
-    return EventService(current_app.config['S3_BUCKET_NAME'])
+    return EventService()
 
 @events_routes.route('/', methods=['GET'])
+@conditional(lambda: collection_validator(table_state(Event.updated_at), table_state(EventImage.uploaded_at)))
+@response_cache.cached(tags=['events'])
 def get_all_events():
     try:
         event_service = get_event_service()
-        events = event_service.get_all_events()
-        return jsonify([event.to_dict() for event in events]), 200
+        return jsonify(event_service.get_all_events_rows(fields=requested_fields(EVENT_SCHEMA))), 200
+    except BadRequest as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @events_routes.route('/<int:event_id>', methods=['GET'])
+@conditional(lambda event_id: row_validator(
+    Event.updated_at, event_id, table_state(EventImage.uploaded_at, EventImage.event_id == event_id)))
 def get_event(event_id):
     try:
         event_service = get_event_service()
         event = event_service.get_event(event_id)
         if not event:
             raise NotFound("Event not found")
-        return jsonify(event.to_dict()), 200
+        return jsonify(event.to_dict(fields=requested_fields(EVENT_SCHEMA))), 200
     except NotFound as e:
         return jsonify({"error": str(e)}), 404
+    except BadRequest as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -109,6 +121,8 @@ def add_image_to_event(event_id, user_id):
         return jsonify({"error": str(e)}), 500
 
 @events_routes.route('/<int:event_id>/images', methods=['GET'])
+@conditional(lambda event_id: row_validator(
+    Event.updated_at, event_id, table_state(EventImage.uploaded_at, EventImage.event_id == event_id)))
 def get_event_images(event_id):
     try:
         event_service = get_event_service()
@@ -1,23 +1,44 @@
-import io
-from flask import jsonify, request, Blueprint, current_app, send_file
+import unicodedata
+from urllib.parse import quote
+from flask import jsonify, request, Blueprint, current_app, send_file, Response
 from flask_jwt_extended import get_jwt_identity, jwt_required
-from main_app.models.models import User, ForumPost
+from main_app.models.models import User, ForumPost, ForumReply, ForumCluster, Attachment
 from main_app.services.forum_service import ForumService
 from main_app.services.user_service import UserService
+from main_app.extensions import db, response_cache
+from main_app.conditional import conditional, collection_validator, row_validator, table_state
+from main_app.serialization import requested_fields
+from main_app.models.schemas import POST_SCHEMA, REPLY_SCHEMA, CLUSTER_SCHEMA
 from werkzeug.exceptions import BadRequest, NotFound, Unauthorized, Forbidden
 
 
 forum_routes = Blueprint('forum', __name__)
 
+def download_names(filename):
+    # כמו ב-send_file: שם בעברית עובר ב-filename* (RFC 5987), ועותק ASCII ב-filename לדפדפנים ישנים
+    try:
+        filename.encode('ascii')
+        return {'filename': filename}
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+        return {'filename': simple, 'filename*': f"UTF-8''{quote(filename, safe='!#$&+-.^_`|~')}"}
+
 def get_forum_service():
-    return ForumService(current_app.config['S3_BUCKET_NAME'])
+    return ForumService()
 
 @forum_routes.route('/posts', methods=['GET'])
+@conditional(lambda: collection_validator(
+    table_state(ForumPost.updated_at),
+    table_state(Attachment.upload_date, Attachment.post_id.isnot(None))))
+@response_cache.cached(tags=['posts'])
 def get_all_posts():
     try:
         forum_service = get_forum_service()
-        posts = forum_service.get_all_posts()
-        return jsonify([post.to_dict() for post in posts]), 200
+        # ?archived=true מחזיר את השרשורים שהועברו לארכיון, באותו מבנה
+        archived = request.args.get('archived', 'false').lower() == 'true'
+        return jsonify(forum_service.get_all_posts_rows(fields=requested_fields(POST_SCHEMA), archived=archived)), 200
+    except BadRequest as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -100,17 +121,25 @@ def delete_post(post_id):
         return jsonify({"error": str(e)}), 500
 
 @forum_routes.route('/posts/<int:post_id>/replies', methods=['GET'])
+@conditional(lambda post_id: row_validator(
+    ForumPost.updated_at, post_id,
+    table_state(ForumReply.updated_at, ForumReply.post_id == post_id),
+    table_state(Attachment.upload_date, Attachment.reply_id.in_(
+        db.select(ForumReply.id).where(ForumReply.post_id == post_id)))))
 def get_replies_by_post(post_id):
     try:
         forum_service = get_forum_service()
         post = forum_service.get_post_by_id(post_id)
-        if not post:
+        archived = post is None and forum_service.get_archived_post(post_id) is not None
+        if not post and not archived:
             raise NotFound("Post not found")
-        replies = forum_service.get_replies_by_post(post_id)
+        replies = forum_service.get_replies_rows_by_post(post_id, fields=requested_fields(REPLY_SCHEMA), archived=archived)
 
-        return jsonify([reply.to_dict() for reply in replies]), 200
+        return jsonify(replies), 200
     except NotFound as e:
         return jsonify({"error": str(e)}), 404
+    except BadRequest as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -269,11 +298,26 @@ def delete_cluster(cluster_id):
         return jsonify({"error": str(e)}), 500
 
 @forum_routes.route('/clusters', methods=['GET'])
+@conditional(lambda: collection_validator(table_state(ForumCluster.updated_at)))
+@response_cache.cached(tags=['clusters'])
 def get_all_clusters():
     try:
         forum_service = get_forum_service()
-        clusters = forum_service.get_all_clusters()
-        return jsonify([cluster.to_dict() for cluster in clusters]), 200
+        return jsonify(forum_service.get_all_clusters_rows(fields=requested_fields(CLUSTER_SCHEMA))), 200
+    except BadRequest as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@forum_routes.route('/clusters/overview', methods=['GET'])
+@conditional(lambda: collection_validator(table_state(ForumCluster.updated_at), table_state(ForumPost.updated_at)))
+# תגובות מעדכנות את reply_count של הפוסט ומבטלות את התג 'posts', לכן שני התגים
+@response_cache.cached(tags=['clusters', 'posts'])
+def get_clusters_overview():
+    try:
+        forum_service = get_forum_service()
+        return jsonify(forum_service.get_clusters_overview()), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -339,24 +383,33 @@ def delete_attachment(post_id, attachment_id):
         return jsonify({"error": str(e)}), 500
     
 @forum_routes.route('/attachments/<int:attachment_id>/download', methods=['GET'])
+@conditional(lambda attachment_id: row_validator(Attachment.upload_date, attachment_id))
 def download_attachment(attachment_id):
     try:
         forum_service = get_forum_service()
 
         try:
-            attachment, file_data = forum_service.get_attachment(attachment_id)
+            attachment = forum_service.get_attachment(attachment_id)
         except Exception as e:
             raise NotFound(str(e))
 
-        return send_file(
-            io.BytesIO(file_data),
-            download_name=attachment.filename,
-            mimetype=attachment.file_type,
-            as_attachment=True
-        )
+        # backend מקומי: sendfile דרך wsgi.file_wrapper; S3: הזרמה בחלקים במקום לקרוא את כל הקובץ לזיכרון
+        local_path = forum_service.get_attachment_path(attachment)
+        if local_path:
+            return send_file(local_path, download_name=attachment.filename, mimetype=attachment.file_type,
+                             as_attachment=True, conditional=True)
+
+        body = forum_service.stream_attachment(attachment, current_app.config['MEDIA_CHUNK_SIZE'])
+        response = Response(body, mimetype=attachment.file_type, direct_passthrough=True)
+        response.headers.set('Content-Disposition', 'attachment', **download_names(attachment.filename))
+        if attachment.file_size is not None:
+            response.headers['Content-Length'] = str(attachment.file_size)
+        return response
 
     except NotFound as e:
         return jsonify({"error": str(e)}), 404
+    except FileNotFoundError:
+        return jsonify({"error": "File not found"}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
\ No newline at end of file
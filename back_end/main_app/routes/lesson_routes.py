@@ -1,33 +1,100 @@
-from flask import jsonify, request, Blueprint, current_app
+from flask import jsonify, request, Blueprint, current_app, Response, redirect, send_file
 from main_app.services.lesson_service import LessonService
 from main_app.services.user_service import UserService
-from werkzeug.exceptions import BadRequest, NotFound, Unauthorized
+from main_app.extensions import response_cache
+from main_app.models.models import Lesson, CategoryLessons
+from main_app.conditional import conditional, collection_validator, table_state
+from main_app.serialization import requested_fields
+from main_app.models.schemas import CATEGORY_SCHEMA, LESSON_SCHEMA
+from werkzeug.exceptions import BadRequest, NotFound, Unauthorized, RequestedRangeNotSatisfiable
 
 lessons_routes = Blueprint('lessons', __name__)
 
 def get_lesson_service():
-    return LessonService(current_app.config['S3_BUCKET_NAME'])
+    return LessonService()
 
 @lessons_routes.route('/', methods=['GET'])
+@conditional(lambda: collection_validator(table_state(CategoryLessons.updated_at), table_state(Lesson.updated_at)))
+@response_cache.cached(tags=['lessons'])
 def get_all_lessons():
     try:
         lesson_service = get_lesson_service()
-        categories = lesson_service.get_all_categories()
-        return jsonify([category.to_dict() for category in categories]), 200
+        return jsonify(lesson_service.get_all_categories_rows(fields=requested_fields(CATEGORY_SCHEMA))), 200
+    except BadRequest as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @lessons_routes.route('/category/<int:category_id>', methods=['GET'])
+@conditional(lambda category_id: collection_validator(
+    table_state(Lesson.updated_at, Lesson.category_id == category_id)))
 def get_lessons_by_category(category_id):
     try:
         lesson_service = get_lesson_service()
-        lessons = lesson_service.get_lessons_by_category(category_id)
-        return jsonify([lesson.to_dict() for lesson in lessons]), 200
+        lessons = lesson_service.get_lessons_rows_by_category(category_id, fields=requested_fields(LESSON_SCHEMA))
+        return jsonify(lessons), 200
+    except NotFound as e:
+        return jsonify({"error": str(e)}), 404
+    except BadRequest as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@lessons_routes.route('/lessons/<int:lesson_id>/media', methods=['GET'])
+def get_lesson_media(lesson_id):
+    try:
+        lesson_service = get_lesson_service()
+        lesson = lesson_service.get_lesson(lesson_id)
+        if not lesson:
+            raise NotFound("Lesson not found")
+
+        config = current_app.config
+        if config['LESSON_MEDIA_DELIVERY'] == 'redirect':
+            expires_in = config['MEDIA_PRESIGN_EXPIRES']
+            response = redirect(lesson_service.get_media_url(lesson, expires_in), 302)
+            # הכתובת החתומה פגה - אסור לשמור את ההפניה במטמון יותר מחצי מזמן התוקף
+            response.headers['Cache-Control'] = f"private, max-age={expires_in // 2}"
+            return response
+
+        mimetype = lesson_service.get_media_mimetype(lesson)
+        local_path = lesson_service.get_media_path(lesson)
+        if local_path:
+            return send_file(local_path, mimetype=mimetype, conditional=True,
+                             max_age=config['MEDIA_CACHE_MAX_AGE'])
+
+        return _ranged_media_response(lesson_service, lesson, mimetype)
     except NotFound as e:
         return jsonify({"error": str(e)}), 404
+    except RequestedRangeNotSatisfiable as e:
+        response = jsonify({"error": str(e)})
+        response.headers['Content-Range'] = f"bytes */{e.length}"
+        return response, 416
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _ranged_media_response(lesson_service, lesson, mimetype):
+    config = current_app.config
+    size = lesson_service.get_media_size(lesson)
+    start, end, status = 0, size - 1, 200
+
+    # בקשה עם כמה טווחים מטופלת כבקשה לקובץ המלא (מותר לפי RFC 9110)
+    if request.range and request.range.units == 'bytes' and len(request.range.ranges) == 1:
+        byte_range = request.range.range_for_length(size)
+        if byte_range is None:
+            raise RequestedRangeNotSatisfiable(length=size)
+        start, end, status = byte_range[0], byte_range[1] - 1, 206
+
+    body = lesson_service.stream_media(lesson, start, end, config['MEDIA_CHUNK_SIZE']) if size else []
+    response = Response(body, status=status, mimetype=mimetype, direct_passthrough=True)
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.headers['Content-Length'] = str(end - start + 1 if size else 0)
+    response.headers['Cache-Control'] = f"public, max-age={config['MEDIA_CACHE_MAX_AGE']}"
+    if status == 206:
+        response.headers['Content-Range'] = f"bytes {start}-{end}/{size}"
+    if lesson.uploaded_at:
+        response.last_modified = lesson.uploaded_at
+    return response
+
 @lessons_routes.route('/', methods=['POST'])
 def create_lesson(user_id):
     try:
@@ -1,9 +1,13 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, current_app, jsonify
+from main_app.extensions import response_cache, metrics
 from main_app.routes.user_routes import user_routes
 from main_app.routes.events_routes import events_routes
 from main_app.routes.forum_routes import forum_routes
 from main_app.routes.lesson_routes import lessons_routes
 from main_app.routes.questions_routes import questions_routes
+from main_app.routes.storage_routes import storage_routes
+from main_app.routes.stream_routes import stream_routes
+from main_app.routes.batch_routes import batch_routes
 
 main_routes = Blueprint('main', __name__)
 
@@ -11,6 +15,16 @@ main_routes = Blueprint('main', __name__)
 def index():
     return jsonify({"message": "Welcome to the Seminary System API"})
 
+@main_routes.route('/cache/stats')
+def cache_stats():
+    return jsonify(response_cache.stats())
+
+@main_routes.route('/metrics')
+def metrics_endpoint():
+    if not current_app.config['METRICS_ENABLED']:
+        return jsonify({"error": "Metrics are disabled"}), 404
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 def register_routes(app):
     app.register_blueprint(main_routes)
     app.register_blueprint(user_routes)
@@ -18,3 +32,6 @@ def register_routes(app):
     app.register_blueprint(forum_routes)
     app.register_blueprint(lessons_routes)
     app.register_blueprint(questions_routes)
+    app.register_blueprint(storage_routes)
+    app.register_blueprint(stream_routes)
+    app.register_blueprint(batch_routes)
@@ -1,10 +1,27 @@
 from flask import jsonify, request, Blueprint, current_app
-from main_app.services.questions_service import QuestionAnswerService
+from flask_jwt_extended import get_jwt, get_jwt_identity, jwt_required
+from main_app.services.questions_service import QuestionAnswerService, ClaimConflict
+from main_app.services.search_service import QuestionSearchService
 from main_app.services.user_service import UserService
-from werkzeug.exceptions import BadRequest, NotFound, Unauthorized
+from main_app.extensions import response_cache
+from main_app.models.models import Question, Answer
+from main_app.conditional import conditional, collection_validator, row_validator, table_state
+from main_app.serialization import requested_fields
+from main_app.pagination import page_size, datetime_arg
+from main_app.models.schemas import QUESTION_SCHEMA, QUEUE_SCHEMA, QUESTION_WITH_ANSWERS_SCHEMA
+from werkzeug.exceptions import BadRequest, NotFound, Unauthorized, Forbidden
 
 questions_routes = Blueprint('qa', __name__)
 
+QUEUE_SCOPES = ('available', 'mine', 'all')
+
+def get_staff_id():
+    # ההרשאות נלקחות מה-claims של ה-token - בלי שאילתה על users בכל polling של התור
+    claims = get_jwt()
+    if not claims.get('is_staff_member') and not claims.get('is_admin'):
+        raise Forbidden("Only staff members or admins can work the question queue")
+    return get_jwt_identity()
+
 @questions_routes.route('/questions', methods=['POST'])
 def create_question(user_id):
     try:
@@ -16,7 +33,16 @@ def create_question(user_id):
             raise BadRequest("Question text is required")
 
         question = QuestionAnswerService.create_question(data['question'], user_id)
-        return jsonify(question.to_dict()), 201
+        # שאלות דומות שכבר נענו - אולי התשובה כבר קיימת
+        result = question.to_dict()
+        # השאלה כבר נשמרה: כישלון בחיפוש לא מחזיר 500, אחרת לקוח שמנסה שוב יוצר כפילות
+        try:
+            result['similar'] = QuestionSearchService.find_similar(
+                question.question, limit=current_app.config['QUESTION_SIMILAR_LIMIT'], exclude_id=question.id)
+        except Exception as e:
+            current_app.logger.warning("Could not find similar questions for %s: %s", question.id, e)
+            result['similar'] = []
+        return jsonify(result), 201
     except BadRequest as e:
         return jsonify({"error": str(e)}), 400
     except Unauthorized as e:
@@ -25,6 +51,7 @@ def create_question(user_id):
         return jsonify({"error": str(e)}), 500
 
 @questions_routes.route('/questions/<int:question_id>', methods=['GET'])
+@conditional(lambda question_id: row_validator(Question.updated_at, question_id))
 def get_question(question_id):
     try:
         question = QuestionAnswerService.get_question(question_id)
@@ -36,6 +63,79 @@ def get_question(question_id):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@questions_routes.route('/questions', methods=['GET'])
+@response_cache.cached(tags=['questions'])
+def get_questions_with_answers():
+    try:
+        answered = request.args.get('answered')
+        if answered not in (None, 'true', 'false'):
+            raise BadRequest("answered must be true or false")
+
+        asker_id = request.args.get('asker_id', type=int)
+        page = QuestionAnswerService.get_questions_with_answers(
+            asker_id=asker_id,
+            answered=None if answered is None else answered == 'true',
+            since=datetime_arg('since'),
+            until=datetime_arg('until'),
+            cursor=request.args.get('cursor'),
+            limit=page_size(),
+            fields=requested_fields(QUESTION_WITH_ANSWERS_SCHEMA)
+        )
+        return jsonify(page), 200
+    except BadRequest as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@questions_routes.route('/questions/search', methods=['GET'])
+def search_questions():
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            raise BadRequest("q is required")
+        answered = request.args.get('answered')
+        if answered not in (None, 'true', 'false'):
+            raise BadRequest("answered must be true or false")
+
+        results = QuestionSearchService.search(query, answered=None if answered is None else answered == 'true',
+                                               limit=page_size(default=20, maximum=100))
+        return jsonify(results), 200
+    except BadRequest as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@questions_routes.route('/questions/similar', methods=['GET'])
+def similar_questions():
+    try:
+        # לשימוש בטופס שאלה חדשה, לפני השליחה
+        query = request.args.get('q', '').strip()
+        if not query:
+            raise BadRequest("q is required")
+        limit = page_size(default=current_app.config['QUESTION_SIMILAR_LIMIT'], maximum=20)
+        return jsonify(QuestionSearchService.find_similar(query, limit=limit)), 200
+    except BadRequest as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@questions_routes.route('/questions/<int:question_id>/thread', methods=['GET'])
+@conditional(lambda question_id: row_validator(
+    Question.updated_at, question_id, table_state(Answer.updated_at, Answer.question_id == question_id)))
+def get_question_with_answers(question_id):
+    try:
+        question = QuestionAnswerService.get_question_with_answers(
+            question_id, fields=requested_fields(QUESTION_WITH_ANSWERS_SCHEMA))
+        if not question:
+            raise NotFound("Question not found")
+        return jsonify(question), 200
+    except BadRequest as e:
+        return jsonify({"error": str(e)}), 400
+    except NotFound as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @questions_routes.route('/questions/<int:question_id>', methods=['PUT'])
 def update_question(question_id, user_id):
     try:
@@ -99,6 +199,8 @@ def create_answer(question_id, user_id):
         return jsonify({"error": str(e)}), 400
     except Unauthorized as e:
         return jsonify({"error": str(e)}), 401
+    except ClaimConflict as e:
+        return jsonify({"error": str(e)}), 409
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -139,14 +241,99 @@ def delete_answer(answer_id, user_id):
         return jsonify({"error": str(e)}), 500
 
 @questions_routes.route('/questions/unanswered', methods=['GET'])
+@conditional(lambda: collection_validator(table_state(Question.updated_at, Question.is_answered == False)))
+@response_cache.cached(tags=['questions'])
 def get_unanswered_questions():
     try:
-        questions = QuestionAnswerService.get_unanswered_questions()
-        return jsonify([q.to_dict() for q in questions]), 200
+        return jsonify(QuestionAnswerService.get_unanswered_questions_rows(fields=requested_fields(QUESTION_SCHEMA))), 200
+    except BadRequest as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@questions_routes.route('/questions/queue', methods=['GET'])
+@jwt_required()
+def get_question_queue():
+    try:
+        staff_id = get_staff_id()
+        scope = request.args.get('scope', 'available')
+        if scope not in QUEUE_SCOPES:
+            raise BadRequest(f"scope must be one of: {', '.join(QUEUE_SCOPES)}")
+
+        page = QuestionAnswerService.get_queue(staff_id, scope=scope, cursor=request.args.get('cursor'),
+                                               limit=page_size(), fields=requested_fields(QUEUE_SCHEMA))
+        return jsonify(page), 200
+    except BadRequest as e:
+        return jsonify({"error": str(e)}), 400
+    except Forbidden as e:
+        return jsonify({"error": str(e)}), 403
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@questions_routes.route('/questions/queue/stats', methods=['GET'])
+@jwt_required()
+def get_question_queue_stats():
+    try:
+        get_staff_id()
+        return jsonify(QuestionAnswerService.get_queue_stats()), 200
+    except Forbidden as e:
+        return jsonify({"error": str(e)}), 403
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@questions_routes.route('/questions/queue/claim', methods=['POST'])
+@jwt_required()
+def claim_next_question():
+    try:
+        staff_id = get_staff_id()
+        claim = QuestionAnswerService.claim_next_question(staff_id, current_app.config['QUESTION_CLAIM_LEASE_SECONDS'])
+        if not claim:
+            return '', 204
+        return jsonify(claim), 200
+    except Forbidden as e:
+        return jsonify({"error": str(e)}), 403
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@questions_routes.route('/questions/<int:question_id>/claim', methods=['POST'])
+@jwt_required()
+def claim_question(question_id):
+    try:
+        staff_id = get_staff_id()
+        # קריאה חוזרת של מי שמחזיק בנעילה מאריכה אותה
+        claim = QuestionAnswerService.claim_question(question_id, staff_id,
+                                                     current_app.config['QUESTION_CLAIM_LEASE_SECONDS'])
+        if not claim:
+            raise NotFound("Question not found")
+        return jsonify(claim), 200
+    except Forbidden as e:
+        return jsonify({"error": str(e)}), 403
+    except NotFound as e:
+        return jsonify({"error": str(e)}), 404
+    except ClaimConflict as e:
+        return jsonify({"error": str(e)}), 409
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@questions_routes.route('/questions/<int:question_id>/claim', methods=['DELETE'])
+@jwt_required()
+def release_question(question_id):
+    try:
+        staff_id = get_staff_id()
+        if not QuestionAnswerService.release_question(question_id, staff_id):
+            raise NotFound("Question not found")
+        return '', 204
+    except Forbidden as e:
+        return jsonify({"error": str(e)}), 403
+    except NotFound as e:
+        return jsonify({"error": str(e)}), 404
+    except ClaimConflict as e:
+        return jsonify({"error": str(e)}), 409
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @questions_routes.route('/users/<int:user_id>/questions', methods=['GET'])
+@conditional(lambda user_id: collection_validator(table_state(Question.updated_at, Question.asker_id == user_id)))
 def get_user_questions(user_id):
     try:
         questions = QuestionAnswerService.get_user_questions(user_id)
@@ -155,6 +342,7 @@ def get_user_questions(user_id):
         return jsonify({"error": str(e)}), 500
 
 @questions_routes.route('/users/<int:user_id>/answers', methods=['GET'])
+@conditional(lambda user_id: collection_validator(table_state(Answer.updated_at, Answer.answerer_id == user_id)))
 def get_user_answers(user_id):
     try:
         answers = QuestionAnswerService.get_user_answers(user_id)
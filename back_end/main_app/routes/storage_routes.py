@@ -0,0 +1,34 @@
+from flask import jsonify, Blueprint, send_file
+from main_app.extensions import storage
+from main_app.storage.base import StorageError
+from werkzeug.exceptions import NotFound, Forbidden
+
+storage_routes = Blueprint('storage', __name__)
+
+@storage_routes.route('/storage/<token>', methods=['GET'])
+def serve_file(token):
+    try:
+        backend = storage.backend
+        if not hasattr(backend, 'resolve_token'):
+            raise NotFound("Presigned URLs are served by the storage provider")
+
+        try:
+            key, filename = backend.resolve_token(token)
+        except StorageError as e:
+            raise Forbidden(str(e))
+
+        # send_file עם נתיב משתמש ב-wsgi.file_wrapper (sendfile ב-gunicorn) ותומך ב-Range
+        return send_file(
+            backend.local_path(key),
+            download_name=filename,
+            as_attachment=filename is not None,
+            conditional=True
+        )
+    except NotFound as e:
+        return jsonify({"error": str(e)}), 404
+    except Forbidden as e:
+        return jsonify({"error": str(e)}), 403
+    except FileNotFoundError:
+        return jsonify({"error": "File not found"}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
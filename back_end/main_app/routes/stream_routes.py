@@ -0,0 +1,59 @@
+from flask import Blueprint, Response, jsonify, request
+from flask_jwt_extended import get_jwt, jwt_required
+from main_app.extensions import change_feed
+from main_app.change_feed import TOPIC, STAFF_TOPICS, MAX_TOPICS
+from werkzeug.exceptions import BadRequest, Forbidden
+
+stream_routes = Blueprint('stream', __name__)
+
+
+def requested_topics():
+    topics = [topic.strip() for topic in request.args.get('topics', '').split(',') if topic.strip()]
+    if not topics:
+        raise BadRequest("topics is required, e.g. ?topics=post:12,questions")
+    if len(topics) > MAX_TOPICS:
+        raise BadRequest(f"At most {MAX_TOPICS} topics per stream")
+    invalid = [topic for topic in topics if not TOPIC.match(topic)]
+    if invalid:
+        raise BadRequest(f"Unknown topics: {', '.join(invalid)}")
+    if STAFF_TOPICS.intersection(topics):
+        claims = get_jwt()
+        if not claims.get('is_staff_member') and not claims.get('is_admin'):
+            raise Forbidden("Only staff members or admins can subscribe to the queue topic")
+    return topics
+
+
+def last_event_id():
+    # הדפדפן שולח Last-Event-ID בחיבור מחדש; last_event_id ב-query למי שממשיך ידנית (למשל אחרי טעינת דף)
+    value = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise BadRequest("Last-Event-ID must be an integer")
+
+
+@stream_routes.route('/stream', methods=['GET'])
+@jwt_required(optional=True)
+def stream():
+    try:
+        topics = requested_topics()
+        resume_from = last_event_id()
+        # קודם נרשמים ורק אחר כך קוראים את מה שהוחמץ - אירוע שנכתב בין השניים מגיע לפחות באחת מהדרכים
+        subscription = change_feed.subscribe(topics)
+        try:
+            replayed = [] if resume_from is None else change_feed.replay(topics, resume_from)
+        except Exception:
+            change_feed.unsubscribe(subscription)
+            raise
+    except (BadRequest, Forbidden) as e:
+        return jsonify({"error": e.description}), e.code
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    response = Response(change_feed.stream(subscription, replayed), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # nginx לא מאגד את התגובה - כל אירוע יוצא מיד
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
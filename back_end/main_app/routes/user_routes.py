@@ -76,13 +76,13 @@ def login():
 @user_routes.route('/users', methods=['GET'])
 def get_users():
     try:
-        users = UserService.get_all_users()
+        users = UserService.get_all_users_rows()
         return jsonify([{
-            'id': user.id,
-            'firstname': user.firstname,
-            'lastname': user.lastname,
-            'email': user.email,
-            'role': 'admin' if user.is_admin else 'staff' if user.is_staff_member else 'student' if user.is_student else 'guest'
+            'id': user['id'],
+            'firstname': user['firstname'],
+            'lastname': user['lastname'],
+            'email': user['email'],
+            'role': 'admin' if user['is_admin'] else 'staff' if user['is_staff_member'] else 'student' if user['is_student'] else 'guest'
         } for user in users]), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
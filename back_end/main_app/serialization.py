@@ -0,0 +1,165 @@
+import time
+from collections import defaultdict
+from datetime import date, datetime
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import select
+from werkzeug.exceptions import BadRequest
+from main_app.extensions import db
+from main_app.instrumentation import record_serialization
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    # orjson כשהוא מותקן, אחרת json של הספרייה הסטנדרטית. תאריכים יוצאים תמיד כ-ISO 8601
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, (datetime, date)):
+            return o.isoformat()
+        if isinstance(o, (bytes, memoryview)):
+            return list(bytes(o))
+        return DefaultJSONProvider.default(o)
+
+    def _orjson_option(self, indent=False):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            if orjson is None or kwargs:
+                kwargs.setdefault('default', self.default)
+                kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+                kwargs.setdefault('sort_keys', self.sort_keys)
+                return super().dumps(obj, **kwargs)
+            return orjson.dumps(obj, default=self.default, option=self._orjson_option()).decode()
+        finally:
+            record_serialization(time.perf_counter() - started)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+
+        started = time.perf_counter()
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = orjson.dumps(obj, default=self.default, option=self._orjson_option(indent)) + b'\n'
+        record_serialization(time.perf_counter() - started)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+class RowSchema:
+    # בונה את אותו פלט כמו to_dict ישירות משורות Core - בלי ליצור אובייקטי ORM
+
+    def __init__(self, model, fields, nested=None, converters=None, joined=None):
+        self.model = model
+        self.fields = fields
+        self.nested = nested or {}  # name -> (RowSchema, foreign key field)
+        self.converters = converters or {}
+        self.joined = joined or {}  # name -> (target model, onclause, expression) משדות של טבלה מקושרת
+
+    def parse_fields(self, fields):
+        # fields=id,title,attachments.filename -> עמודות של הטבלה + שדות מבוקשים לכל קשר מקונן
+        if fields is None:
+            return list(self.fields), {name: None for name in self.nested}
+
+        columns, nested = [], {}
+        for field in fields:
+            name, _, child_field = field.partition('.')
+            if name in self.nested:
+                if not child_field:
+                    nested[name] = None
+                elif name not in nested or nested[name] is not None:
+                    nested.setdefault(name, []).append(child_field)
+            elif name in self.fields and not child_field:
+                if name not in columns:
+                    columns.append(name)
+            else:
+                raise BadRequest(f"Unknown field: {field}")
+
+        for name, child_fields in nested.items():
+            if child_fields is not None:
+                self.nested[name][0].parse_fields(child_fields)
+        return columns, nested
+
+    def select(self, *criteria, order_by=None, fields=None, limit=None):
+        # רק העמודות המבוקשות נשלפות - עמודות Text שלא התבקשו לא נקראות מהדיסק
+        fields = fields or self.fields
+        stmt = select(*[self.column(field) for field in fields]).select_from(self.model)
+        joined_targets = []
+        for field in fields:
+            if field in self.joined and self.joined[field][0] not in joined_targets:
+                target, onclause, _ = self.joined[field]
+                stmt = stmt.outerjoin(target, onclause)
+                joined_targets.append(target)
+        if criteria:
+            stmt = stmt.where(*criteria)
+        if order_by is None:
+            order_by = [self.model.id]
+        elif not isinstance(order_by, (list, tuple)):
+            order_by = [order_by]
+        stmt = stmt.order_by(*order_by)
+        return stmt.limit(limit) if limit is not None else stmt
+
+    def column(self, field):
+        if field in self.joined:
+            return self.joined[field][2].label(field)
+        return getattr(self.model, field)
+
+    def dump(self, *criteria, order_by=None, fields=None, limit=None):
+        columns, nested = self.parse_fields(fields)
+        selected = columns if 'id' in columns or not nested else ['id'] + columns
+        stmt = self.select(*criteria, order_by=order_by, fields=selected, limit=limit)
+        rows = [dict(row) for row in db.session.execute(stmt).mappings()]
+        if not rows:
+            return rows
+
+        for field, convert in self.converters.items():
+            if field in selected:
+                for row in rows:
+                    row[field] = convert(row[field])
+
+        for name, child_fields in nested.items():
+            schema, foreign_key = self.nested[name]
+            if child_fields is not None and foreign_key not in child_fields:
+                child_fields = child_fields + [foreign_key]
+                drop_foreign_key = True
+            else:
+                drop_foreign_key = False
+
+            # שאילתה אחת לכל הילדים של כל השורות, לא שאילתה לכל שורה
+            if limit is not None:
+                parent_ids = [row['id'] for row in rows]
+            else:
+                parent_ids = select(self.model.id)
+                if criteria:
+                    parent_ids = parent_ids.where(*criteria)
+            children = defaultdict(list)
+            for child in schema.dump(getattr(schema.model, foreign_key).in_(parent_ids), fields=child_fields):
+                parent_id = child.pop(foreign_key) if drop_foreign_key else child[foreign_key]
+                children[parent_id].append(child)
+            for row in rows:
+                row[name] = children.get(row['id'], [])
+
+        if 'id' not in columns and 'id' in selected:
+            for row in rows:
+                del row['id']
+        return rows
+
+
+def requested_fields(schema):
+    raw_fields = request.args.get('fields')
+    if not raw_fields:
+        return None
+    fields = [field.strip() for field in raw_fields.split(',') if field.strip()]
+    schema.parse_fields(fields)
+    return fields
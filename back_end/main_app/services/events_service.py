@@ -1,22 +1,27 @@
-import boto3
-from botocore.exceptions import ClientError
 from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime
-from main_app.models.models import Event, EventImage
-from main_app.extensions import db
+from main_app.models.models import Event, EventImage, ArchivedEvent
+from main_app.extensions import db, storage, response_cache
+from main_app.storage.base import StorageError
+from main_app.change_feed import publish
+from main_app.models.schemas import EVENT_SCHEMA
 
+# השדות שנשלחים ב-/stream, בלי התמונות (שאילתה נוספת לכל אירוע)
+EVENT_FIELDS = ['id', 'title', 'description', 'created_at']
 
 
 class EventService:
-    def __init__(self, s3_bucket_name):
-        self.s3_client = boto3.client('s3')
-        self.s3_bucket_name = s3_bucket_name
+    def __init__(self, storage_backend=None):
+        self.storage = storage_backend or storage.backend
 
     def create_event(self, title, description=None):
         try:
             new_event = Event(title=title, description=description)
             db.session.add(new_event)
+            db.session.flush()
+            publish(['events'], 'event.created', new_event.to_dict(fields=EVENT_FIELDS))
             db.session.commit()
+            response_cache.invalidate('events')
             return new_event
         except SQLAlchemyError as e:
             db.session.rollback()
@@ -24,7 +29,8 @@ class EventService:
 
     def get_event(self, event_id):
         try:
-            return Event.query.get(event_id)
+            # אירוע שהועבר לארכיון נשאר זמין לקריאה באותו מזהה
+            return Event.query.get(event_id) or ArchivedEvent.query.get(event_id)
         except SQLAlchemyError as e:
             raise Exception(f"Error fetching event: {str(e)}")
 
@@ -39,7 +45,9 @@ class EventService:
             if description is not None:
                 event.description = description
             
+            publish(['events'], 'event.updated', event.to_dict(fields=EVENT_FIELDS))
             db.session.commit()
+            response_cache.invalidate('events')
             return event
         except SQLAlchemyError as e:
             db.session.rollback()
@@ -51,12 +59,13 @@ class EventService:
             if not event:
                 raise Exception("Event not found")
             
-            # מחיקת כל התמונות הקשורות לאירוע מ-S3
-            for image in event.images:
-                self.delete_image_from_s3(image.s3_key)
+            # מחיקת כל התמונות הקשורות לאירוע מ-storage
+            self.storage.delete_many([image.s3_key for image in event.images])
             
             db.session.delete(event)
+            publish(['events'], 'event.deleted', {'id': event_id})
             db.session.commit()
+            response_cache.invalidate('events')
         except SQLAlchemyError as e:
             db.session.rollback()
             raise Exception(f"Error deleting event: {str(e)}")
@@ -70,22 +79,22 @@ class EventService:
             # יצירת מפתח ייחודי עבור S3
             s3_key = f"events/{event_id}/{datetime.now().strftime('%Y%m%d%H%M%S')}_{file_name}"
 
-            # העלאת הקובץ ל-S3
-            try:
-                self.s3_client.put_object(Bucket=self.s3_bucket_name, Key=s3_key, Body=file_content)
-            except ClientError as e:
-                raise Exception(f"Error uploading file to S3: {str(e)}")
+            # העלאת הקובץ ל-storage
+            self.storage.put(s3_key, file_content)
 
             # יצירת רשומת EventImage בבסיס הנתונים
             file_size = len(file_content)
             new_image = EventImage(s3_key=s3_key, file_name=file_name, file_size=file_size, event_id=event_id)
             db.session.add(new_image)
+            db.session.flush()
+            publish(['events'], 'event.image_added', new_image.to_dict())
             db.session.commit()
+            response_cache.invalidate('events')
             return new_image
         except Exception as e:
             db.session.rollback()
-            # אם הייתה שגיאה, ננסה למחוק את הקובץ מ-S3 אם הוא הועלה
-            self.delete_image_from_s3(s3_key)
+            # אם הייתה שגיאה, ננסה למחוק את הקובץ מ-storage אם הוא הועלה
+            self.delete_image_from_storage(s3_key)
             raise Exception(f"Error adding image to event: {str(e)}")
 
     def delete_image(self, image_id):
@@ -94,25 +103,27 @@ class EventService:
             if not image:
                 raise Exception("Image not found")
             
-            # מחיקת הקובץ מ-S3
-            self.delete_image_from_s3(image.s3_key)
+            # מחיקת הקובץ מ-storage
+            self.delete_image_from_storage(image.s3_key)
 
             # מחיקת הרשומה מבסיס הנתונים
             db.session.delete(image)
+            publish(['events'], 'event.image_deleted', {'id': image_id, 'event_id': image.event_id})
             db.session.commit()
+            response_cache.invalidate('events')
         except SQLAlchemyError as e:
             db.session.rollback()
             raise Exception(f"Error deleting image: {str(e)}")
 
-    def delete_image_from_s3(self, s3_key):
+    def delete_image_from_storage(self, s3_key):
         try:
-            self.s3_client.delete_object(Bucket=self.s3_bucket_name, Key=s3_key)
-        except ClientError as e:
-            raise Exception(f"Error deleting file from S3: {str(e)}")
+            self.storage.delete(s3_key)
+        except StorageError as e:
+            raise Exception(f"Error deleting file from storage: {str(e)}")
 
     def get_event_images(self, event_id):
         try:
-            event = Event.query.get(event_id)
+            event = Event.query.get(event_id) or ArchivedEvent.query.get(event_id)
             if not event:
                 raise Exception("Event not found")
             return event.images
@@ -124,4 +135,10 @@ class EventService:
             return Event.query.all()
         except SQLAlchemyError as e:
             raise Exception(f"Error fetching all events: {str(e)}")
+
+    def get_all_events_rows(self, fields=None):
+        try:
+            return EVENT_SCHEMA.dump(fields=fields)
+        except SQLAlchemyError as e:
+            raise Exception(f"Error fetching all events: {str(e)}")
         
\ No newline at end of file
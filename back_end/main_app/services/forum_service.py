@@ -1,9 +1,42 @@
-import boto3
-from botocore.exceptions import ClientError
+import logging
+from sqlalchemy import case, delete, func, or_, select, update
 from sqlalchemy.exc import SQLAlchemyError
-from main_app.models.models import ForumPost, ForumReply, ForumCluster, Attachment
-from main_app.extensions import db
-from flask import current_app
+from sqlalchemy.orm import aliased
+from main_app.models.models import (ForumPost, ForumReply, ForumCluster, Attachment, ArchivedForumPost,
+                                    ArchivedAttachment)
+from main_app.extensions import db, storage, response_cache
+from main_app.counters import increment
+from main_app.change_feed import publish
+from main_app.storage.base import StorageError
+from main_app.models.schemas import (POST_SCHEMA, REPLY_SCHEMA, CLUSTER_SCHEMA, ARCHIVED_POST_SCHEMA,
+                                     ARCHIVED_REPLY_SCHEMA)
+
+# השדות שנשלחים ב-/stream - מספיק כדי להציג את השינוי בלי לטעון שוב את השרשור
+POST_EVENT_FIELDS = ['id', 'title', 'content', 'created_at', 'author_id', 'cluster_id']
+REPLY_EVENT_FIELDS = ['id', 'content', 'created_at', 'author_id', 'post_id']
+
+
+logger = logging.getLogger(__name__)
+
+
+def cluster_topic(cluster_id):
+    return f"cluster:{cluster_id}" if cluster_id is not None else None
+
+
+def attachment_keys(*criteria):
+    # מפתחות ה-storage של כל הקבצים שיימחקו ב-cascade, בשאילתה אחת ובלי לטעון אובייקטים
+    return db.session.execute(select(Attachment.s3_key).where(or_(*criteria))).scalars().all()
+
+
+def delete_stored_files(storage_backend, keys):
+    # אחרי ה-commit: אם ה-storage נכשל נשארים קבצים יתומים, ולא שורות שמצביעות על קבצים שכבר נמחקו
+    if not keys:
+        return
+    try:
+        storage_backend.delete_many(keys)
+    except StorageError as e:
+        logger.warning("Failed to delete %d stored files: %s", len(keys), e)
+
 
 class ForumService:
     
@@ -22,20 +55,19 @@ class ForumService:
         'text/markdown': '.md',
     }
 
-    def __init__(self, s3_bucket_name):
-        self.s3_client = boto3.client('s3',
-            region_name=current_app.config['AWS_REGION'],
-            aws_access_key_id=current_app.config['AWS_ACCESS_KEY_ID'],
-            aws_secret_access_key=current_app.config['AWS_SECRET_ACCESS_KEY']
-        )
-        self.s3_bucket_name = s3_bucket_name
+    def __init__(self, storage_backend=None):
+        self.storage = storage_backend or storage.backend
 
     @staticmethod
     def create_post(title, content, author_id, cluster_id=None):
         try:
             new_post = ForumPost(title=title, content=content, author_id=author_id, cluster_id=cluster_id)
             db.session.add(new_post)
+            increment(ForumCluster.post_count, cluster_id)
+            db.session.flush()
+            publish([cluster_topic(cluster_id)], 'post.created', new_post.to_dict(fields=POST_EVENT_FIELDS))
             db.session.commit()
+            response_cache.invalidate('posts', 'clusters')
             return new_post
         except SQLAlchemyError as e:
             db.session.rollback()
@@ -53,25 +85,30 @@ class ForumService:
                                         post_id=post_id)
             db.session.add(new_attachment)
             db.session.commit()
+            response_cache.invalidate('posts')
             return new_attachment
         except SQLAlchemyError as e:
             db.session.rollback()
             raise Exception(f"Error adding attachment: {str(e)}")
 
-    @staticmethod
-    def delete_post(post_id):
+    def delete_post(self, post_id):
         try:
             post = ForumPost.query.get(post_id)
             if not post:
                 raise Exception("Post not found")
-            
-            replies = ForumReply.query.filter_by(post_id = post_id).all()
-
-            for reply in replies:
-                db.session.delete(reply)
 
-            db.session.delete(post)
+            cluster_id = post.cluster_id
+            s3_keys = attachment_keys(
+                Attachment.post_id == post_id,
+                Attachment.reply_id.in_(select(ForumReply.id).where(ForumReply.post_id == post_id)))
+            # התגובות והקבצים שלהן נמחקים ב-DB עצמו (ON DELETE CASCADE) - בלי לטעון אותם ל-session
+            db.session.execute(delete(ForumPost).where(ForumPost.id == post_id))
+            increment(ForumCluster.post_count, cluster_id, -1)
+            publish([f"post:{post_id}", cluster_topic(cluster_id)], 'post.deleted',
+                    {'id': post_id, 'cluster_id': cluster_id})
             db.session.commit()
+            response_cache.invalidate('posts', 'clusters')
+            delete_stored_files(self.storage, s3_keys)
         except SQLAlchemyError as e:
             db.session.rollback()
             raise Exception(f"Error deleting post: {str(e)}")
@@ -81,21 +118,34 @@ class ForumService:
         try:
             new_reply = ForumReply(content=content, author_id=author_id, post_id=post_id)
             db.session.add(new_reply)
+            db.session.flush()
+            increment(ForumPost.reply_count, post_id, last_reply_at=new_reply.created_at)
+            cluster_id = db.session.execute(select(ForumPost.cluster_id).where(ForumPost.id == post_id)).scalar()
+            publish([f"post:{post_id}", cluster_topic(cluster_id)], 'reply.created',
+                    new_reply.to_dict(fields=REPLY_EVENT_FIELDS))
             db.session.commit()
+            response_cache.invalidate('posts')
             return new_reply
         except SQLAlchemyError as e:
             db.session.rollback()
             raise Exception(f"Error creating reply: {str(e)}")
 
-    @staticmethod
-    def delete_reply(reply_id):
+    def delete_reply(self, reply_id):
         try:
             reply = ForumReply.query.get(reply_id)
             if not reply:
                 raise Exception("Reply not found")
-            
-            db.session.delete(reply)
+
+            post_id = reply.post_id
+            s3_keys = attachment_keys(Attachment.reply_id == reply_id)
+            db.session.execute(delete(ForumReply).where(ForumReply.id == reply_id))
+            # התגובה האחרונה עשויה להיות זו שנמחקה - מחשבים מחדש מהתגובות שנשארו
+            latest = select(func.max(ForumReply.created_at)).where(ForumReply.post_id == post_id).scalar_subquery()
+            increment(ForumPost.reply_count, post_id, -1, last_reply_at=latest)
+            publish([f"post:{post_id}"], 'reply.deleted', {'id': reply_id, 'post_id': post_id})
             db.session.commit()
+            response_cache.invalidate('posts')
+            delete_stored_files(self.storage, s3_keys)
         except SQLAlchemyError as e:
             db.session.rollback()
             raise Exception(f"Error deleting reply: {str(e)}")
@@ -106,6 +156,7 @@ class ForumService:
             new_cluster = ForumCluster(name=name, description=description, author_id=user_id)
             db.session.add(new_cluster)
             db.session.commit()
+            response_cache.invalidate('clusters')
             return new_cluster
         except SQLAlchemyError as e:
             db.session.rollback()
@@ -117,9 +168,15 @@ class ForumService:
             cluster = ForumCluster.query.get(cluster_id)
             if not cluster:
                 raise Exception("Cluster not found")
-            
-            db.session.delete(cluster)
+
+            # הפוסטים נשארים, בלי אשכול. UPDATE אחד במקום לטעון את כולם, ו-updated_at מתעדכן בדרך
+            # כדי שה-ETag של /posts ישתנה (ה-SET NULL של המפתח הזר לא נוגע בו)
+            db.session.execute(update(ForumPost).where(ForumPost.cluster_id == cluster_id).values(cluster_id=None)
+                               .execution_options(synchronize_session=False))
+            db.session.execute(delete(ForumCluster).where(ForumCluster.id == cluster_id))
+            publish([cluster_topic(cluster_id)], 'cluster.deleted', {'id': cluster_id})
             db.session.commit()
+            response_cache.invalidate('clusters', 'posts')
         except SQLAlchemyError as e:
             db.session.rollback()
             raise Exception(f"Error deleting cluster: {str(e)}")
@@ -128,6 +185,11 @@ class ForumService:
     def get_all_posts():
         return  ForumPost.query.all()
     
+    @staticmethod
+    def get_all_posts_rows(fields=None, archived=False):
+        schema = ARCHIVED_POST_SCHEMA if archived else POST_SCHEMA
+        return schema.dump(fields=fields)
+
     @staticmethod
     def get_post_by_id(id):
         return  ForumPost.query.filter_by(id=id).first()
@@ -140,6 +202,15 @@ class ForumService:
     def get_replies_by_post(post_id):
         return ForumReply.query.filter_by(post_id=post_id).all()
 
+    @staticmethod
+    def get_archived_post(id):
+        return ArchivedForumPost.query.filter_by(id=id).first()
+
+    @staticmethod
+    def get_replies_rows_by_post(post_id, fields=None, archived=False):
+        schema = ARCHIVED_REPLY_SCHEMA if archived else REPLY_SCHEMA
+        return schema.dump(schema.model.post_id == post_id, fields=fields)
+
     @staticmethod
     def get_cluster_by_id(id):
         return  ForumCluster.query.filter_by(id=id).first()
@@ -147,6 +218,35 @@ class ForumService:
     @staticmethod
     def get_all_clusters():
         return ForumCluster.query.all()
+
+    @staticmethod
+    def get_all_clusters_rows(fields=None):
+        return CLUSTER_SCHEMA.dump(fields=fields)
+
+    @staticmethod
+    def get_clusters_overview():
+        # שאילתה אחת על המונים: מספר הפוסטים מ-post_count, התגובות מסכום reply_count של הפוסטים,
+        # והפוסט האחרון בחיפוש על האינדקס של cluster_id (המזהה עולה עם זמן היצירה)
+        activity = case((ForumPost.last_reply_at > ForumPost.created_at, ForumPost.last_reply_at),
+                        else_=ForumPost.created_at)
+        latest = aliased(ForumPost)
+
+        def latest_post(column):
+            return select(column).where(latest.cluster_id == ForumCluster.id) \
+                .order_by(latest.id.desc()).limit(1).scalar_subquery()
+
+        stmt = (
+            select(ForumCluster.id, ForumCluster.name, ForumCluster.description,
+                   ForumCluster.post_count,
+                   func.coalesce(func.sum(ForumPost.reply_count), 0).label('reply_count'),
+                   func.max(activity).label('last_activity_at'),
+                   latest_post(latest.id).label('latest_post_id'),
+                   latest_post(latest.title).label('latest_post_title'))
+            .outerjoin(ForumPost, ForumPost.cluster_id == ForumCluster.id)
+            .group_by(ForumCluster.id)
+            .order_by(ForumCluster.id)
+        )
+        return [dict(row) for row in db.session.execute(stmt).mappings()]
     
     @staticmethod
     def update_post(post_id, title=None, content=None):
@@ -160,7 +260,10 @@ class ForumService:
             if content is not None:
                 post.content = content
             
+            publish([f"post:{post_id}", cluster_topic(post.cluster_id)], 'post.updated',
+                    post.to_dict(fields=POST_EVENT_FIELDS))
             db.session.commit()
+            response_cache.invalidate('posts')
             return post
         except SQLAlchemyError as e:
             db.session.rollback()
@@ -174,6 +277,7 @@ class ForumService:
                 raise Exception("Reply not found")
             
             reply.content = content
+            publish([f"post:{reply.post_id}"], 'reply.updated', reply.to_dict(fields=REPLY_EVENT_FIELDS))
             db.session.commit()
             return reply
         except SQLAlchemyError as e:
@@ -192,7 +296,10 @@ class ForumService:
             if description is not None:
                 cluster.description = description
             
+            publish([cluster_topic(cluster_id)], 'cluster.updated',
+                    {'id': cluster_id, 'name': cluster.name, 'description': cluster.description})
             db.session.commit()
+            response_cache.invalidate('clusters')
             return cluster
         except SQLAlchemyError as e:
             db.session.rollback()
@@ -229,11 +336,8 @@ class ForumService:
             # יצירת מפתח ייחודי עבור S3
             s3_key = f"attachments/{post_id}/{filename}"
 
-            # העלאת הקובץ ל-S3
-            try:
-                self.s3_client.put_object(Bucket=self.s3_bucket_name, Key=s3_key, Body=file_content)
-            except ClientError as e:
-                raise Exception(f"Error uploading file to S3: {str(e)}")
+            # העלאת הקובץ ל-storage
+            self.storage.put(s3_key, file_content, content_type=file_type)
 
             # יצירת רשומת Attachment בבסיס הנתונים
             file_size = len(file_content)
@@ -242,12 +346,13 @@ class ForumService:
                                         post_id=post_id)
             db.session.add(new_attachment)
             db.session.commit()
+            response_cache.invalidate('posts')
             return new_attachment
         except Exception as e:
             db.session.rollback()
-            # אם הייתה שגיאה, ננסה למחוק את הקובץ מ-S3 אם הוא הועלה
+            # אם הייתה שגיאה, ננסה למחוק את הקובץ מ-storage אם הוא הועלה
             try:
-                self.s3_client.delete_object(Bucket=self.s3_bucket_name, Key=s3_key)
+                self.storage.delete(s3_key)
             except:
                 pass  # התעלם משגיאות בניקוי
             raise Exception(f"Error adding attachment: {str(e)}")
@@ -258,32 +363,34 @@ class ForumService:
             if not attachment:
                 raise Exception("Attachment not found")
             
-            # מחיקת הקובץ מ-S3
-            try:
-                self.s3_client.delete_object(Bucket=self.s3_bucket_name, Key=attachment.s3_key)
-            except ClientError as e:
-                raise Exception(f"Error deleting file from S3: {str(e)}")
+            # מחיקת הקובץ מ-storage
+            self.storage.delete(attachment.s3_key)
 
             # מחיקת הרשומה מבסיס הנתונים
             db.session.delete(attachment)
             db.session.commit()
+            response_cache.invalidate('posts')
         except Exception as e:
             db.session.rollback()
             raise Exception(f"Error deleting attachment: {str(e)}")
 
     def get_attachment(self, attachment_id):
         try:
-            attachment = Attachment.query.get(attachment_id)
+            # קובץ של שרשור שהועבר לארכיון נשאר זמין באותו מזהה, מהמפתח החדש שלו
+            attachment = Attachment.query.get(attachment_id) or ArchivedAttachment.query.get(attachment_id)
             if not attachment:
                 raise Exception("Attachment not found")
-                
-            # קבלת הקובץ מ-S3
-            response = self.s3_client.get_object(Bucket=self.s3_bucket_name, Key=attachment.s3_key)
-            file_data = response['Body'].read()
-            
-            return attachment, file_data
-        except ClientError as e:
-            raise Exception(f"Error retrieving file from S3: {str(e)}")
-        except Exception as e:
+            return attachment
+        except SQLAlchemyError as e:
             raise Exception(f"Error retrieving attachment: {str(e)}")
+
+    def get_attachment_path(self, attachment):
+        return self.storage.local_path(attachment.s3_key)
+
+    def stream_attachment(self, attachment, chunk_size):
+        # הקובץ לא נטען כולו לזיכרון - כל הורדה מחזיקה chunk אחד, גם כשמאות הורדות רצות במקביל
+        try:
+            return self.storage.get_stream(attachment.s3_key, chunk_size=chunk_size)
+        except StorageError as e:
+            raise Exception(f"Error retrieving file from storage: {str(e)}")
         
\ No newline at end of file
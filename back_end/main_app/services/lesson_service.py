@@ -1,44 +1,59 @@
+import logging
+import mimetypes
+import os
+import tempfile
 from datetime import datetime
-import boto3
-from botocore.exceptions import ClientError
+from flask import current_app
+from sqlalchemy import update
 from sqlalchemy.exc import SQLAlchemyError
 from main_app.models.models import Lesson, CategoryLessons
-from main_app.extensions import db
+from main_app.extensions import db, storage, response_cache
+from main_app.counters import increment
+from main_app.services.media_analysis import analyze_media, empty_metadata, executor as media_executor
+from main_app.models.schemas import CATEGORY_SCHEMA, LESSON_SCHEMA
+
+logger = logging.getLogger(__name__)
 
 
 class LessonService:
-    def __init__(self, s3_bucket_name):
-        self.s3_client = boto3.client('s3')
-        self.s3_bucket_name = s3_bucket_name
+    def __init__(self, storage_backend=None):
+        self.storage = storage_backend or storage.backend
 
     def create_lesson(self, title, description, is_audio, file_content, file_name, category_id):
+        media_path = None
         try:
             # יצירת מפתח ייחודי עבור S3
             s3_key = f"lessons/{datetime.now().strftime('%Y%m%d%H%M%S')}_{file_name}"
 
-            # העלאת הקובץ ל-S3
-            try:
-                self.s3_client.put_object(Bucket=self.s3_bucket_name, Key=s3_key, Body=file_content)
-            except ClientError as e:
-                raise Exception(f"Error uploading file to S3: {str(e)}")
+            # העלאת הקובץ ל-storage
+            self.storage.put(s3_key, file_content)
 
             # יצירת רשומת Lesson בבסיס הנתונים
             file_size = len(file_content)
             new_lesson = Lesson(title=title, description=description, is_audio=is_audio,
                                 s3_key=s3_key, file_size=file_size, category_id=category_id)
+            media_path = self.apply_media_metadata(new_lesson, file_content, file_name)
             db.session.add(new_lesson)
+            increment(CategoryLessons.lesson_count, category_id)
             db.session.commit()
-            return new_lesson
         except Exception as e:
             db.session.rollback()
-            # אם הייתה שגיאה, ננסה למחוק את הקובץ מ-S3 אם הוא הועלה
+            if media_path:
+                os.remove(media_path)
+            # אם הייתה שגיאה, ננסה למחוק את הקובץ מ-storage אם הוא הועלה
             try:
-                self.s3_client.delete_object(Bucket=self.s3_bucket_name, Key=s3_key)
+                self.storage.delete(s3_key)
             except:
                 pass  # התעלם משגיאות בניקוי
             raise Exception(f"Error creating lesson: {str(e)}")
 
+        # אחרי ה-commit השיעור קיים ומצביע על הקובץ - שום כשל מכאן לא מוחק אותו
+        response_cache.invalidate('lessons')
+        self.schedule_media_analysis(new_lesson, media_path, file_name)
+        return new_lesson
+
     def update_lesson(self, lesson_id, title=None, description=None, is_audio=None, file_content=None, file_name=None, category_id=None):
+        media_path = None
         try:
             lesson = Lesson.query.get(lesson_id)
             if not lesson:
@@ -50,57 +65,136 @@ class LessonService:
                 lesson.description = description
             if is_audio is not None:
                 lesson.is_audio = is_audio
-            if category_id:
+            # מהטופס category_id מגיע כמחרוזת, ו-"3" != 3 היה מזיז את המונים בכל עדכון
+            if category_id and int(category_id) != lesson.category_id:
+                category_id = int(category_id)
+                increment(CategoryLessons.lesson_count, lesson.category_id, -1)
+                increment(CategoryLessons.lesson_count, category_id)
                 lesson.category_id = category_id
 
             if file_content and file_name:
-                # מחיקת הקובץ הישן מ-S3
-                try:
-                    self.s3_client.delete_object(Bucket=self.s3_bucket_name, Key=lesson.s3_key)
-                except ClientError as e:
-                    raise Exception(f"Error deleting old file from S3: {str(e)}")
+                # מחיקת הקובץ הישן מ-storage
+                self.storage.delete(lesson.s3_key)
 
-                # העלאת הקובץ החדש ל-S3
+                # העלאת הקובץ החדש ל-storage
                 new_s3_key = f"lessons/{datetime.now().strftime('%Y%m%d%H%M%S')}_{file_name}"
-                try:
-                    self.s3_client.put_object(Bucket=self.s3_bucket_name, Key=new_s3_key, Body=file_content)
-                except ClientError as e:
-                    raise Exception(f"Error uploading new file to S3: {str(e)}")
+                self.storage.put(new_s3_key, file_content)
 
                 lesson.s3_key = new_s3_key
                 lesson.file_size = len(file_content)
+                media_path = self.apply_media_metadata(lesson, file_content, file_name)
 
             db.session.commit()
-            return lesson
         except Exception as e:
             db.session.rollback()
+            if media_path:
+                os.remove(media_path)
             raise Exception(f"Error updating lesson: {str(e)}")
 
+        response_cache.invalidate('lessons')
+        self.schedule_media_analysis(lesson, media_path, file_name)
+        return lesson
+
     def delete_lesson(self, lesson_id):
         try:
             lesson = Lesson.query.get(lesson_id)
             if not lesson:
                 raise Exception("Lesson not found")
 
-            # מחיקת הקובץ מ-S3
-            try:
-                self.s3_client.delete_object(Bucket=self.s3_bucket_name, Key=lesson.s3_key)
-            except ClientError as e:
-                raise Exception(f"Error deleting file from S3: {str(e)}")
+            # מחיקת הקובץ מ-storage
+            self.storage.delete(lesson.s3_key)
 
             # מחיקת הרשומה מבסיס הנתונים
             db.session.delete(lesson)
+            increment(CategoryLessons.lesson_count, lesson.category_id, -1)
             db.session.commit()
+            response_cache.invalidate('lessons')
         except Exception as e:
             db.session.rollback()
             raise Exception(f"Error deleting lesson: {str(e)}")
 
+    @staticmethod
+    def apply_media_metadata(lesson, file_content, file_name):
+        # משך, קצב סיביות, codec וגרף גלים נשמרים מראש - הקטלוג לא צריך להוריד את המדיה.
+        # הניתוח (ffprobe ופענוח מלא) לא רץ בתוך בקשת ההעלאה: מחזיר קובץ זמני לניתוח ברקע אחרי ה-commit
+        with tempfile.NamedTemporaryFile(suffix=os.path.splitext(file_name)[1], delete=False) as media_file:
+            media_file.write(file_content)
+        if current_app.config['MEDIA_ANALYSIS_ASYNC']:
+            metadata, media_path = empty_metadata(), media_file.name
+        else:
+            try:
+                metadata, media_path = analyze_media(media_file.name, file_name), None
+            finally:
+                os.remove(media_file.name)
+        for field, value in metadata.items():
+            setattr(lesson, field, value)
+        return media_path
+
+    @staticmethod
+    def schedule_media_analysis(lesson, media_path, file_name):
+        if not media_path:
+            return
+        try:
+            media_executor().submit(LessonService.analyze_in_background, current_app._get_current_object(),
+                                    lesson.id, lesson.s3_key, media_path, file_name)
+        except RuntimeError as e:
+            # ה-executor כבר נסגר (כיבוי השרת); השיעור נשמר בלי משך וגרף גלים
+            os.remove(media_path)
+            logger.warning("Could not schedule media analysis for lesson %s: %s", lesson.id, e)
+
+    @staticmethod
+    def analyze_in_background(app, lesson_id, s3_key, media_path, file_name):
+        try:
+            metadata = analyze_media(media_path, file_name)
+        finally:
+            os.remove(media_path)
+        with app.app_context():
+            try:
+                # s3_key: אם הקובץ הוחלף בינתיים, הניתוח של הקובץ הישן לא נשמר
+                db.session.execute(update(Lesson).where(Lesson.id == lesson_id, Lesson.s3_key == s3_key)
+                                   .values(**metadata))
+                db.session.commit()
+                response_cache.invalidate('lessons')
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                logger.warning("Could not save media analysis for lesson %s: %s", lesson_id, e)
+
+    @staticmethod
+    def get_lesson(lesson_id):
+        try:
+            return Lesson.query.get(lesson_id)
+        except SQLAlchemyError as e:
+            raise Exception(f"Error fetching lesson: {str(e)}")
+
+    @staticmethod
+    def get_media_mimetype(lesson):
+        mimetype = mimetypes.guess_type(lesson.s3_key)[0]
+        if mimetype:
+            return mimetype
+        return 'audio/mpeg' if lesson.is_audio else 'video/mp4'
+
+    def get_media_size(self, lesson):
+        if lesson.file_size is not None:
+            return lesson.file_size
+        return self.storage.head(lesson.s3_key)['size']
+
+    def get_media_url(self, lesson, expires_in):
+        return self.storage.presign(lesson.s3_key, expires_in=expires_in)
+
+    def get_media_path(self, lesson):
+        return self.storage.local_path(lesson.s3_key)
+
+    def stream_media(self, lesson, start, end, chunk_size):
+        # קריאה בחלקים בגודל קבוע - זמן עד הבייט הראשון לא תלוי באורך השיעור
+        return self.storage.get_range(lesson.s3_key, start, end, chunk_size=chunk_size)
+
     @staticmethod
     def create_category(name):
         try:
             new_category = CategoryLessons(name=name)
             db.session.add(new_category)
             db.session.commit()
+            response_cache.invalidate('lessons')
             return new_category
         except SQLAlchemyError as e:
             db.session.rollback()
@@ -112,6 +206,7 @@ class LessonService:
             category = CategoryLessons.query.filter_by(category_id=category_id).first()
             db.session.delete(category)
             db.session.commit()
+            response_cache.invalidate('lessons')
         except SQLAlchemyError as e:
             db.session.rollback()
             raise Exception(f"Error deleting category: {str(e)}")
@@ -125,10 +220,24 @@ class LessonService:
             db.session.rollback()
             raise Exception(f"Error geting categories: {str(e)}")
 
+    @staticmethod
+    def get_all_categories_rows(fields=None):
+        try:
+            return CATEGORY_SCHEMA.dump(fields=fields)
+        except SQLAlchemyError as e:
+            raise Exception(f"Error geting categories: {str(e)}")
+
     @staticmethod
     def get_lessons_by_category(category_id):
         try:
             return Lesson.query.filter_by(category_id=category_id).all()
         except SQLAlchemyError as e:
             raise Exception(f"Error fetching lessons by category: {str(e)}")
+
+    @staticmethod
+    def get_lessons_rows_by_category(category_id, fields=None):
+        try:
+            return LESSON_SCHEMA.dump(Lesson.category_id == category_id, fields=fields)
+        except SQLAlchemyError as e:
+            raise Exception(f"Error fetching lessons by category: {str(e)}")
         
\ No newline at end of file
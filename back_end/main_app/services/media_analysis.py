@@ -0,0 +1,181 @@
+import json
+import logging
+import os
+import shutil
+import subprocess
+import threading
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+WAVEFORM_POINTS = 200
+WAVEFORM_SAMPLE_RATE = 8000
+FFPROBE_TIMEOUT = 30
+DECODE_TIMEOUT = 600
+# 10ms ב-8kHz: גם קטע של שתי שניות נותן את כל נקודות הגרף
+PEAK_BLOCK = 80
+DECODE_CHUNK_FRAMES = PEAK_BLOCK * 1024
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def _numpy():
+    # numpy נטען רק בניתוח המדיה הראשון ולא בעליית האפליקציה
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def executor():
+    # thread אחד לכל תהליך: ffmpeg כבד ב-CPU, וניתוחים במקביל רק יאטו את הבקשות. threads לא עוברים fork של gunicorn
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='media-analysis')
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def empty_metadata():
+    return {'duration': None, 'bitrate': None, 'codec': None, 'sample_rate': None, 'waveform': None}
+
+
+def analyze_media(media_path, file_name):
+    metadata = empty_metadata()
+    peaks = None
+    try:
+        if shutil.which('ffprobe') and shutil.which('ffmpeg'):
+            metadata, peaks = _analyze_with_ffmpeg(media_path)
+        elif file_name.lower().endswith('.wav'):
+            metadata, peaks = _analyze_wav(media_path)
+        else:
+            logger.info("ffprobe is not installed; skipping media analysis for %s", file_name)
+    except Exception as e:
+        # ניתוח המדיה הוא תוספת - כשל בו לא מכשיל את העלאת השיעור
+        logger.warning("Media analysis failed for %s: %s", file_name, e)
+
+    if peaks is not None:
+        metadata['waveform'] = compute_waveform(peaks)
+    return metadata
+
+
+def block_peaks(np, samples):
+    # הפסגה של כל PEAK_BLOCK דגימות. הגרף נבנה מהפסגות (מקסימום של מקסימומים), כך שהדגימות עצמן
+    # לא נשמרות בזיכרון: שיעור של שלוש שעות הוא ~170MB של דגימות ו-~4MB של פסגות
+    samples = np.abs(samples.astype(np.float32))
+    usable = len(samples) - len(samples) % PEAK_BLOCK
+    peaks = [samples[:usable].reshape(-1, PEAK_BLOCK).max(axis=1)]
+    if usable < len(samples):
+        peaks.append(samples[usable:].max(keepdims=True))
+    return np.concatenate(peaks)
+
+
+def compute_waveform(peaks, points=WAVEFORM_POINTS):
+    # מערך פסגות מוקטן: בייט אחד (0-255) לכל נקודה בציר הזמן
+    np = _numpy()
+    if np is None or peaks is None or len(peaks) == 0:
+        return None
+    peaks = np.asarray(peaks, dtype=np.float32)
+    points = min(points, len(peaks))
+    # גבולות שווים בקירוב שמכסים את כל הבלוקים - גם את הזנב שלא מתחלק ב-points
+    edges = np.linspace(0, len(peaks), points + 1).astype(np.int64)[:-1]
+    buckets = np.maximum.reduceat(peaks, edges)
+    top = buckets.max()
+    if top > 0:
+        buckets = buckets / top
+    return (buckets * 255).round().astype(np.uint8).tobytes()
+
+
+def _analyze_with_ffmpeg(media_path):
+    probe = subprocess.run(
+        ['ffprobe', '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams', media_path],
+        capture_output=True, check=True, timeout=FFPROBE_TIMEOUT
+    )
+    metadata = _metadata_from_probe(json.loads(probe.stdout))
+
+    peaks = None
+    np = _numpy()
+    if np is not None and metadata['sample_rate']:
+        peaks = _decode_peaks(np, media_path)
+    return metadata, peaks
+
+
+def _decode_peaks(np, media_path):
+    # הפענוח נקרא מה-pipe בחלקים ולא נאסף כולו לזיכרון
+    process = subprocess.Popen(
+        ['ffmpeg', '-v', 'error', '-i', media_path, '-vn', '-ac', '1',
+         '-ar', str(WAVEFORM_SAMPLE_RATE), '-f', 's16le', '-'],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    timer = threading.Timer(DECODE_TIMEOUT, process.kill)
+    timer.start()
+    peaks = []
+    try:
+        while True:
+            chunk = process.stdout.read(DECODE_CHUNK_FRAMES * 2)
+            if not chunk:
+                break
+            peaks.append(block_peaks(np, np.frombuffer(chunk[:len(chunk) - len(chunk) % 2], dtype=np.int16)))
+        _, stderr = process.communicate()
+    finally:
+        timer.cancel()
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, 'ffmpeg', stderr=stderr)
+    return np.concatenate(peaks) if peaks else None
+
+
+def _metadata_from_probe(info):
+    metadata = empty_metadata()
+    media_format = info.get('format', {})
+    streams = info.get('streams', [])
+    audio = next((stream for stream in streams if stream.get('codec_type') == 'audio'), None)
+    video = next((stream for stream in streams if stream.get('codec_type') == 'video'), None)
+    main_stream = video or audio or {}
+
+    if media_format.get('duration'):
+        metadata['duration'] = float(media_format['duration'])
+    if media_format.get('bit_rate'):
+        metadata['bitrate'] = int(media_format['bit_rate'])
+    metadata['codec'] = main_stream.get('codec_name')
+    if audio and audio.get('sample_rate'):
+        metadata['sample_rate'] = int(audio['sample_rate'])
+    return metadata
+
+
+def _analyze_wav(media_path):
+    metadata = empty_metadata()
+    np = _numpy()
+    peaks = []
+    with wave.open(media_path) as wav_file:
+        channels = wav_file.getnchannels()
+        sample_width = wav_file.getsampwidth()
+        sample_rate = wav_file.getframerate()
+        frames = wav_file.getnframes()
+        if np is not None and sample_width in (1, 2, 4):
+            dtype = {1: np.uint8, 2: np.int16, 4: np.int32}[sample_width]
+            while True:
+                raw = wav_file.readframes(DECODE_CHUNK_FRAMES)
+                if not raw:
+                    break
+                samples = np.frombuffer(raw, dtype=dtype).astype(np.float32)
+                if sample_width == 1:
+                    samples -= 128
+                if channels > 1:
+                    samples = np.abs(samples[:len(samples) - len(samples) % channels].reshape(-1, channels)).max(axis=1)
+                peaks.append(block_peaks(np, samples))
+
+    metadata['duration'] = frames / sample_rate if sample_rate else None
+    metadata['bitrate'] = sample_rate * sample_width * 8 * channels
+    metadata['codec'] = f"pcm_s{sample_width * 8}le" if sample_width > 1 else 'pcm_u8'
+    metadata['sample_rate'] = sample_rate
+    return metadata, np.concatenate(peaks) if peaks else None
@@ -1,6 +1,32 @@
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, or_, select, update
 from sqlalchemy.exc import SQLAlchemyError
-from main_app.models.models import Question, Answer
-from main_app.extensions import db
+from main_app.models.models import Question, Answer, QueueStat
+from main_app.extensions import db, response_cache
+from main_app.counters import increment, adjust_stat
+from main_app.change_feed import publish
+from main_app.models.schemas import QUESTION_SCHEMA, QUEUE_SCHEMA, QUESTION_WITH_ANSWERS_SCHEMA
+from main_app.pagination import keyset_page, DEFAULT_PAGE_SIZE
+
+QUEUE_ORDER = [Question.asked_at, Question.id]
+LIST_ORDER = [Question.asked_at, Question.id]
+CLAIM_CANDIDATES = 10
+
+
+class ClaimConflict(Exception):
+    pass
+
+
+def claim_available(now, user_id=None):
+    # פנויה: אף אחד לא תפס אותה, הנעילה פגה, או שהיא כבר של אותו איש צוות
+    conditions = [Question.claimed_by_id.is_(None), Question.claim_expires_at <= now]
+    if user_id is not None:
+        conditions.append(Question.claimed_by_id == user_id)
+    return or_(*conditions)
+
+
+def adjust_unanswered(delta):
+    adjust_stat(QueueStat.UNANSWERED_QUESTIONS, delta)
 
 
 class QuestionAnswerService:
@@ -9,7 +35,11 @@ class QuestionAnswerService:
         try:
             new_question = Question(question=question_text, asker_id=asker_id)
             db.session.add(new_question)
+            adjust_unanswered(1)
+            db.session.flush()
+            publish(['questions'], 'question.created', new_question.to_dict())
             db.session.commit()
+            response_cache.invalidate('questions')
             return new_question
         except SQLAlchemyError as e:
             db.session.rollback()
@@ -32,7 +62,9 @@ class QuestionAnswerService:
             if new_question_text:
                 question.question = new_question_text
             
+            publish(['questions', f"question:{question_id}"], 'question.updated', question.to_dict())
             db.session.commit()
+            response_cache.invalidate('questions')
             return question
         except SQLAlchemyError as e:
             db.session.rollback()
@@ -45,8 +77,13 @@ class QuestionAnswerService:
             if not question:
                 raise Exception("Question not found")
             
-            db.session.delete(question)
+            if not question.is_answered:
+                adjust_unanswered(-1)
+            # התשובות נמחקות ב-DB עצמו (ON DELETE CASCADE), והטריגרים מעדכנים את אינדקס החיפוש
+            db.session.execute(delete(Question).where(Question.id == question_id))
+            publish(['questions', 'queue', f"question:{question_id}"], 'question.deleted', {'id': question_id})
             db.session.commit()
+            response_cache.invalidate('questions')
         except SQLAlchemyError as e:
             db.session.rollback()
             raise Exception(f"Error deleting question: {str(e)}")
@@ -55,15 +92,30 @@ class QuestionAnswerService:
     def create_answer(answer_text, answerer_id, question_id):
         try:
             question = Question.query.get(question_id)
-            if question:
-                new_answer = Answer(answer=answer_text, answerer_id=answerer_id, question_id=question_id)
-                db.session.add(new_answer)
-                question.is_answered = True
-
-            else:
+            if not question:
                 raise Exception("Question not found")
-            
+
+            if not question.is_answered:
+                # התשובה הראשונה סוגרת את השאלה ומשחררת את הנעילה - רק אם היא פנויה לאיש הצוות הזה
+                result = db.session.execute(
+                    update(Question)
+                    .where(Question.id == question_id, Question.is_answered == False,
+                           claim_available(datetime.utcnow(), answerer_id))
+                    .values(is_answered=True, claimed_by_id=None, claim_expires_at=None)
+                )
+                if result.rowcount == 0:
+                    db.session.rollback()
+                    raise ClaimConflict("Question is claimed by another staff member")
+                adjust_unanswered(-1)
+                publish(['questions', 'queue'], 'question.answered', {'id': question_id})
+
+            new_answer = Answer(answer=answer_text, answerer_id=answerer_id, question_id=question_id)
+            db.session.add(new_answer)
+            increment(Question.answer_count, question_id)
+            db.session.flush()
+            publish([f"question:{question_id}"], 'answer.created', new_answer.to_dict())
             db.session.commit()
+            response_cache.invalidate('questions')
             return new_answer
         except SQLAlchemyError as e:
             db.session.rollback()
@@ -84,7 +136,9 @@ class QuestionAnswerService:
                 raise Exception("Answer not found")
             
             answer.answer = new_answer_text
+            publish([f"question:{answer.question_id}"], 'answer.updated', answer.to_dict())
             db.session.commit()
+            response_cache.invalidate('questions')
             return answer
         except SQLAlchemyError as e:
             db.session.rollback()
@@ -98,13 +152,23 @@ class QuestionAnswerService:
                 raise Exception("Answer not found")
             
             db.session.delete(answer)
-            
-            # בדיקה אם יש תשובות נוספות לשאלה
-            question = Question.query.get(answer.question_id)
-            if question and len(question.answers) == 1:  # אם זו התשובה האחרונה
-                question.is_answered = False
+            increment(Question.answer_count, answer.question_id, -1)
+
+            # אם זו הייתה התשובה האחרונה השאלה חוזרת לתור - לפי המונה, בלי לטעון את כל התשובות
+            result = db.session.execute(
+                update(Question)
+                .where(Question.id == answer.question_id, Question.answer_count == 0, Question.is_answered == True)
+                .values(is_answered=False)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount:
+                adjust_unanswered(1)
+                publish(['questions', 'queue'], 'question.reopened', {'id': answer.question_id})
+            publish([f"question:{answer.question_id}"], 'answer.deleted',
+                    {'id': answer_id, 'question_id': answer.question_id})
             
             db.session.commit()
+            response_cache.invalidate('questions')
         except SQLAlchemyError as e:
             db.session.rollback()
             raise Exception(f"Error deleting answer: {str(e)}")
@@ -116,6 +180,147 @@ class QuestionAnswerService:
         except SQLAlchemyError as e:
             raise Exception(f"Error fetching unanswered questions: {str(e)}")
 
+    @staticmethod
+    def get_unanswered_questions_rows(fields=None):
+        try:
+            return QUESTION_SCHEMA.dump(Question.is_answered == False, fields=fields)
+        except SQLAlchemyError as e:
+            raise Exception(f"Error fetching unanswered questions: {str(e)}")
+
+    @staticmethod
+    def get_questions_with_answers(asker_id=None, answered=None, since=None, until=None, cursor=None,
+                                   limit=DEFAULT_PAGE_SIZE, fields=None):
+        criteria = []
+        if asker_id is not None:
+            criteria.append(Question.asker_id == asker_id)
+        if answered is not None:
+            criteria.append(Question.is_answered == answered)
+        if since is not None:
+            criteria.append(Question.asked_at >= since)
+        if until is not None:
+            criteria.append(Question.asked_at < until)
+        try:
+            # שאילתה אחת לעמוד השאלות ואחת לכל התשובות שלהן (עם שם העונה) - לא שאילתה לכל שאלה
+            return keyset_page(QUESTION_WITH_ANSWERS_SCHEMA, LIST_ORDER, *criteria, cursor=cursor, limit=limit,
+                               fields=fields, descending=True)
+        except SQLAlchemyError as e:
+            raise Exception(f"Error fetching questions: {str(e)}")
+
+    @staticmethod
+    def get_question_with_answers(question_id, fields=None):
+        try:
+            rows = QUESTION_WITH_ANSWERS_SCHEMA.dump(Question.id == question_id, fields=fields, limit=1)
+            return rows[0] if rows else None
+        except SQLAlchemyError as e:
+            raise Exception(f"Error fetching question: {str(e)}")
+
+    @staticmethod
+    def get_queue(user_id, scope='available', cursor=None, limit=DEFAULT_PAGE_SIZE, fields=None):
+        now = datetime.utcnow()
+        criteria = [Question.is_answered == False]
+        if scope == 'available':
+            criteria.append(claim_available(now, user_id))
+        elif scope == 'mine':
+            criteria += [Question.claimed_by_id == user_id, Question.claim_expires_at > now]
+        try:
+            return keyset_page(QUEUE_SCHEMA, QUEUE_ORDER, *criteria, cursor=cursor, limit=limit, fields=fields)
+        except SQLAlchemyError as e:
+            raise Exception(f"Error fetching question queue: {str(e)}")
+
+    @staticmethod
+    def get_queue_stats():
+        now = datetime.utcnow()
+        try:
+            depth = db.session.execute(
+                select(QueueStat.value).where(QueueStat.name == QueueStat.UNANSWERED_QUESTIONS)
+            ).scalar() or 0
+            # שתי השאילתות נשענות על אינדקסים: השאלות התפוסות הן מעטות, והישנה ביותר היא ראש האינדקס החלקי
+            claimed = db.session.execute(
+                select(func.count()).select_from(Question)
+                .where(Question.claimed_by_id.isnot(None), Question.claim_expires_at > now,
+                       Question.is_answered == False)
+            ).scalar()
+            oldest = db.session.execute(
+                select(Question.asked_at).where(Question.is_answered == False).order_by(*QUEUE_ORDER).limit(1)
+            ).scalar()
+        except SQLAlchemyError as e:
+            raise Exception(f"Error fetching queue stats: {str(e)}")
+        return {
+            'depth': depth,
+            'claimed': claimed,
+            'available': max(depth - claimed, 0),
+            'oldest_asked_at': oldest,
+            'oldest_wait_seconds': int((now - oldest).total_seconds()) if oldest else None
+        }
+
+    @staticmethod
+    def claim_question(question_id, user_id, lease_seconds):
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=lease_seconds)
+        try:
+            # UPDATE מותנה אחד: רק אחד מכמה אנשי צוות שמנסים במקביל יקבל rowcount=1.
+            # updated_at לא משתנה - נעילה אינה שינוי בתוכן השאלה
+            result = db.session.execute(
+                update(Question)
+                .where(Question.id == question_id, Question.is_answered == False, claim_available(now, user_id))
+                .values(claimed_by_id=user_id, claim_expires_at=expires_at, updated_at=Question.updated_at)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount:
+                publish(['queue'], 'question.claimed',
+                        {'id': question_id, 'claimed_by_id': user_id, 'claim_expires_at': expires_at})
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise Exception(f"Error claiming question: {str(e)}")
+
+        if result.rowcount == 0:
+            if not db.session.get(Question, question_id):
+                return None
+            raise ClaimConflict("Question is already answered or claimed by another staff member")
+        return {'question_id': question_id, 'claimed_by_id': user_id, 'claim_expires_at': expires_at}
+
+    @staticmethod
+    def claim_next_question(user_id, lease_seconds):
+        try:
+            candidates = db.session.execute(
+                select(Question.id)
+                .where(Question.is_answered == False, claim_available(datetime.utcnow()))
+                .order_by(*QUEUE_ORDER).limit(CLAIM_CANDIDATES)
+            ).scalars().all()
+        except SQLAlchemyError as e:
+            raise Exception(f"Error fetching question queue: {str(e)}")
+
+        # מי שהפסיד במרוץ על השאלה הראשונה ממשיך לבאה בתור
+        for question_id in candidates:
+            try:
+                return QuestionAnswerService.claim_question(question_id, user_id, lease_seconds)
+            except ClaimConflict:
+                continue
+        return None
+
+    @staticmethod
+    def release_question(question_id, user_id):
+        try:
+            result = db.session.execute(
+                update(Question)
+                .where(Question.id == question_id, Question.claimed_by_id == user_id)
+                .values(claimed_by_id=None, claim_expires_at=None, updated_at=Question.updated_at)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount:
+                publish(['queue'], 'question.released', {'id': question_id})
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise Exception(f"Error releasing question: {str(e)}")
+
+        if result.rowcount == 0:
+            if not db.session.get(Question, question_id):
+                return False
+            raise ClaimConflict("Question is not claimed by you")
+        return True
+
     @staticmethod
     def get_user_questions(user_id):
         try:
@@ -0,0 +1,148 @@
+import re
+from collections import OrderedDict
+from sqlalchemy import Boolean, DateTime, Float, Integer, Text, or_, select, text
+from sqlalchemy.exc import SQLAlchemyError
+from main_app.models.models import Question
+from main_app.models.search_index import REBUILD_QUESTION_FTS
+from main_app.extensions import db
+
+TOKEN = re.compile(r'\w+', re.UNICODE)
+MAX_QUERY_TERMS = 12
+SIMILAR_TERMS = 6
+# מונח שמופיע ביותר מאחוז מהשאלות לא מבחין בין שאלות, ורשימת ההופעות שלו ארוכה מדי לדירוג מהיר
+SIMILAR_MAX_DOC_FRACTION = 0.01
+# במאגר קטן אחוז אחד הוא שאלה או שתיים, וכמעט כל מונח היה נפסל; עד הרף הזה כל מונח נחשב נדיר מספיק
+SIMILAR_MIN_DOC_CUTOFF = 50
+# משקל bm25 לכל עמודה: התאמה בשאלה עצמה חשובה יותר מהתאמה באחת התשובות
+QUESTION_WEIGHT, ANSWERS_WEIGHT = 2.0, 1.0
+
+SEARCH_SQL = f"""
+    SELECT question.id, question.question, question.asked_at, question.asker_id, question.is_answered,
+           question.answer_count,
+           snippet(question_fts, -1, '[', ']', '…', 16) AS snippet,
+           bm25(question_fts, {QUESTION_WEIGHT}, {ANSWERS_WEIGHT}) AS score
+    FROM question_fts JOIN question ON question.id = question_fts.rowid
+    WHERE question_fts MATCH :match {{filters}}
+    ORDER BY score
+    LIMIT :limit
+"""
+
+
+def query_terms(query):
+    terms = []
+    for term in TOKEN.findall(query.lower()):
+        if term not in terms:
+            terms.append(term)
+    return terms[:MAX_QUERY_TERMS]
+
+
+def quote(term):
+    # כל מונח במרכאות - תווים כמו - או * או AND בקלט של המשתמש לא נקראים כתחביר FTS5
+    return '"' + term.replace('"', '""') + '"'
+
+
+def uses_fts():
+    return db.engine.dialect.name == 'sqlite'
+
+
+FREQUENCY_CACHE_SIZE = 50_000
+frequency_cache = OrderedDict()
+
+
+def document_frequency(database_url, term):
+    # שכיחות משתנה לאט, ו-fts5vocab סורק את כל ההופעות של המונח - ערך ישן מעט מספיק לבחירת מונחים נדירים
+    key = (database_url, term)
+    if key in frequency_cache:
+        return frequency_cache[key]
+    frequency = db.session.execute(
+        text("SELECT doc FROM question_fts_vocab WHERE term = :term"), {'term': term}
+    ).scalar() or 0
+    # 0 לא נשמר: מונח שעוד לא באינדקס יימצא ברגע שנשמרת השאלה הראשונה שמכילה אותו
+    if frequency:
+        if len(frequency_cache) >= FREQUENCY_CACHE_SIZE:
+            frequency_cache.popitem(last=False)
+        frequency_cache[key] = frequency
+    return frequency
+
+
+def distinctive_terms(terms):
+    database_url = str(db.engine.url)
+    documents = db.session.execute(text("SELECT max(rowid) FROM question_fts")).scalar() or 0
+    cutoff = max(SIMILAR_MIN_DOC_CUTOFF, int(documents * SIMILAR_MAX_DOC_FRACTION))
+    frequencies = {term: document_frequency(database_url, term) for term in terms}
+    # מונח שלא נמצא (0) לא יתאים לשום שאלה
+    ranked = sorted((frequency, term) for term, frequency in frequencies.items() if 0 < frequency <= cutoff)
+    return [term for _, term in ranked[:SIMILAR_TERMS]]
+
+
+class QuestionSearchService:
+    @staticmethod
+    def search(query, answered=None, limit=20):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        # כל המונחים חייבים להופיע; האחרון גם כתחילית מילה, בשביל חיפוש תוך כדי הקלדה
+        match = ' '.join(quote(term) for term in terms[:-1]) + ' ' + quote(terms[-1]) + '*'
+        try:
+            return QuestionSearchService._run(match.strip(), terms, answered, limit)
+        except SQLAlchemyError as e:
+            raise Exception(f"Error searching questions: {str(e)}")
+
+    @staticmethod
+    def find_similar(question_text, limit=5, exclude_id=None):
+        terms = query_terms(question_text)
+        if not terms:
+            return []
+        try:
+            if uses_fts():
+                # רק המונחים הנדירים בקורפוס: מילים נפוצות תואמות כמעט כל שאלה, מאטות את הדירוג ולא מבחינות
+                terms = distinctive_terms(terms)
+                if not terms:
+                    return []
+            match = ' OR '.join(quote(term) for term in terms)
+            results = QuestionSearchService._run(match, terms, True, limit + 1, any_term=True)
+        except SQLAlchemyError as e:
+            raise Exception(f"Error finding similar questions: {str(e)}")
+        return [row for row in results if row['id'] != exclude_id][:limit]
+
+    @staticmethod
+    def _run(match, terms, answered, limit, any_term=False):
+        if not uses_fts():
+            return QuestionSearchService._search_like(terms, answered, limit, any_term)
+
+        filters = ''
+        params = {'match': match, 'limit': limit}
+        if answered is not None:
+            filters = 'AND question.is_answered = :answered'
+            params['answered'] = answered
+        stmt = text(SEARCH_SQL.format(filters=filters)).columns(
+            id=Integer, question=Text, asked_at=DateTime, asker_id=Integer, is_answered=Boolean,
+            answer_count=Integer, snippet=Text, score=Float
+        )
+        rows = db.session.execute(stmt, params).mappings()
+        return [dict(row) for row in rows]
+
+    @staticmethod
+    def _search_like(terms, answered, limit, any_term):
+        # מסדי נתונים בלי FTS5: התאמה פשוטה בטקסט השאלה, בלי דירוג ובלי תשובות
+        stmt = select(Question.id, Question.question, Question.asked_at, Question.asker_id,
+                      Question.is_answered, Question.answer_count)
+        matches = [Question.question.ilike(f"%{term}%") for term in terms]
+        stmt = stmt.where(or_(*matches)) if any_term else stmt.where(*matches)
+        if answered is not None:
+            stmt = stmt.where(Question.is_answered == answered)
+        stmt = stmt.order_by(Question.asked_at.desc()).limit(limit)
+        return [dict(row, snippet=None, score=None) for row in db.session.execute(stmt).mappings()]
+
+    @staticmethod
+    def rebuild_index():
+        if not uses_fts():
+            return False
+        try:
+            for statement in REBUILD_QUESTION_FTS:
+                db.session.execute(text(statement))
+            db.session.commit()
+            return True
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise Exception(f"Error rebuilding search index: {str(e)}")
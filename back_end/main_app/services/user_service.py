@@ -2,6 +2,7 @@ from flask_jwt_extended import create_access_token, create_refresh_token
 from sqlalchemy.exc import IntegrityError
 from main_app.models.models import User
 from main_app.extensions import db
+from main_app.models.schemas import USER_SCHEMA
 
 class UserService:
     @staticmethod
@@ -35,6 +36,10 @@ class UserService:
     @staticmethod
     def get_all_users():
         return User.query.all()
+
+    @staticmethod
+    def get_all_users_rows():
+        return USER_SCHEMA.dump()
     
     @staticmethod
     def get_user_by_id(id):
@@ -0,0 +1,196 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from sqlalchemy import event
+
+logger = logging.getLogger('main_app.slow_query')
+
+MAIN_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICES_DIR = os.path.join(MAIN_APP_DIR, 'services')
+ROUTES_DIR = os.path.join(MAIN_APP_DIR, 'routes')
+
+
+def fingerprint(statement):
+    # שאילתות שנבדלות רק בערכים מקבלות אותה טביעה, כולל IN עם מספר פרמטרים שונה
+    normalized = re.sub(r"'(?:[^']|'')*'", '?', statement)
+    normalized = re.sub(r'\b\d+(?:\.\d+)?\b', '?', normalized)
+    normalized = re.sub(r'\(\s*\?(?:\s*,\s*\?)*\s*\)', '(?)', normalized)
+    normalized = re.sub(r'\s+', ' ', normalized).strip()
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12], normalized
+
+
+def redact(value):
+    # מזהים ומספרים נשארים (הם מה שמסביר שאילתה איטית), טקסט ובינארי לא נכתבים ללוג
+    if value is None or isinstance(value, (bool, int, float, datetime)):
+        return value if not isinstance(value, datetime) else value.isoformat()
+    if isinstance(value, str):
+        return f"<str len={len(value)}>"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"<bytes len={len(value)}>"
+    return f"<{type(value).__name__}>"
+
+
+def redact_parameters(parameters):
+    if isinstance(parameters, dict):
+        return {key: redact(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [redact(value) for value in parameters]
+    return redact(parameters)
+
+
+def capture_origin():
+    # הפונקציה בשכבת ה-services שהריצה את השאילתה (או ה-route, לשאילתות שרצות ישירות ממנו)
+    # ומחסנית הקריאות בתוך main_app
+    origin = route = None
+    stack = []
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(MAIN_APP_DIR) and filename != os.path.abspath(__file__):
+            stack.append(f"{os.path.relpath(filename, os.path.dirname(MAIN_APP_DIR))}:{frame.f_lineno} "
+                         f"in {frame.f_code.co_name}")
+            name = getattr(frame.f_code, 'co_qualname', frame.f_code.co_name)
+            if origin is None and filename.startswith(SERVICES_DIR):
+                origin = name
+            elif route is None and filename.startswith(ROUTES_DIR):
+                route = f"{os.path.splitext(os.path.basename(filename))[0]}.{name}"
+        frame = frame.f_back
+    return origin or route, stack
+
+
+def read_only(statement):
+    # WITH יכול לעטוף INSERT/UPDATE/DELETE, ו-EXPLAIN ANALYZE היה מבצע אותם שוב
+    upper = re.sub(r"'(?:[^']|'')*'", "''", statement).lstrip().upper()
+    if upper.startswith('SELECT'):
+        return True
+    return upper.startswith('WITH') and not re.search(r'\b(INSERT|UPDATE|DELETE|MERGE)\b', upper)
+
+
+def explain(conn, statement, parameters, analyze=False):
+    # cursor חדש ישירות מה-DBAPI - לא עובר שוב ב-events ולא דורס את התוצאות של השאילתה המקורית
+    if not read_only(statement):
+        return None
+    dialect = conn.dialect.name
+    if dialect == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    elif dialect == 'postgresql' and analyze:
+        prefix = 'EXPLAIN (ANALYZE, BUFFERS) '
+    else:
+        prefix = 'EXPLAIN '
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return [' | '.join(str(column) for column in row) for row in cursor.fetchall()]
+    except Exception as e:
+        return [f"EXPLAIN failed: {e}"]
+    finally:
+        cursor.close()
+
+
+class SlowQueryLog:
+    def __init__(self, app=None):
+        self.handler = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SLOW_QUERY_THRESHOLD_MS', 200)
+        app.config.setdefault('SLOW_QUERY_LOG_PATH', None)
+        app.config.setdefault('SLOW_QUERY_EXPLAIN', True)
+        app.config.setdefault('SLOW_QUERY_EXPLAIN_ANALYZE', False)
+        app.config.setdefault('SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024)
+        app.config.setdefault('SLOW_QUERY_LOG_BACKUPS', 5)
+        if not app.config['SLOW_QUERY_THRESHOLD_MS']:
+            return
+
+        self.threshold = app.config['SLOW_QUERY_THRESHOLD_MS'] / 1000
+        self.explain_enabled = app.config['SLOW_QUERY_EXPLAIN']
+        self.explain_analyze = app.config['SLOW_QUERY_EXPLAIN_ANALYZE']
+        self.path = self.log_path(app)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # רק ה-handler כותב לקובץ, בלי logger - רשומות JSON לא עוברות ל-handlers של האפליקציה.
+        # כמה workers שכותבים לאותו קובץ יכולים לאבד רשומות בודדות ברגע הסיבוב
+        if self.handler is not None:
+            self.handler.close()
+        self.handler = RotatingFileHandler(self.path, maxBytes=app.config['SLOW_QUERY_LOG_MAX_BYTES'],
+                                           backupCount=app.config['SLOW_QUERY_LOG_BACKUPS'], delay=True)
+
+        from main_app.extensions import db
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', self.before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self.after_cursor_execute)
+        event.listen(engine, 'handle_error', self.handle_error)
+
+    @staticmethod
+    def log_path(app):
+        return app.config.get('SLOW_QUERY_LOG_PATH') or os.path.join(app.instance_path, 'slow_queries.jsonl')
+
+    @staticmethod
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('slow_query_started', []).append(time.perf_counter())
+
+    @staticmethod
+    def handle_error(context):
+        # שאילתה שנכשלה לא מגיעה ל-after_cursor_execute - מוציאים את זמן ההתחלה שלה מהמחסנית
+        if context.connection is not None and context.connection.info.get('slow_query_started'):
+            context.connection.info['slow_query_started'].pop()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['slow_query_started'].pop()
+        if elapsed < self.threshold:
+            return
+
+        statement_fingerprint, normalized = fingerprint(statement)
+        origin, stack = capture_origin()
+        record = {
+            'time': datetime.utcnow().isoformat(),
+            'duration_ms': round(elapsed * 1000, 2),
+            'fingerprint': statement_fingerprint,
+            'normalized': normalized,
+            'statement': statement,
+            'parameters': None if executemany else redact_parameters(parameters),
+            'executemany': executemany,
+            'origin': origin,
+            'stack': stack,
+            'plan': (explain(conn, statement, parameters, self.explain_analyze)
+                     if self.explain_enabled and not executemany else None)
+        }
+        logger.warning("Slow query (%.1f ms) from %s: %s", elapsed * 1000, origin, normalized)
+        self.handler.handle(logging.makeLogRecord({'msg': json.dumps(record)}))
+
+
+def log_files(path):
+    # הגיבויים שה-RotatingFileHandler השאיר (path.1 הוא החדש מביניהם) ואחריהם הקובץ הפעיל
+    backups = [name for name in glob.glob(glob.escape(path) + '.*') if name.rsplit('.', 1)[1].isdigit()]
+    backups.sort(key=lambda name: int(name.rsplit('.', 1)[1]), reverse=True)
+    return [name for name in backups + [path] if os.path.exists(name)]
+
+
+def load_report(path, top):
+    groups = {}
+    for name in log_files(path):
+        with open(name) as log_file:
+            for line in log_file:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                group = groups.setdefault(record['fingerprint'], {
+                    'fingerprint': record['fingerprint'], 'normalized': record['normalized'],
+                    'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'origins': set(), 'plan': None
+                })
+                group['count'] += 1
+                group['total_ms'] += record['duration_ms']
+                group['max_ms'] = max(group['max_ms'], record['duration_ms'])
+                if record.get('origin'):
+                    group['origins'].add(record['origin'])
+                if record.get('plan'):
+                    group['plan'] = record['plan']
+    return sorted(groups.values(), key=lambda group: group['total_ms'], reverse=True)[:top]
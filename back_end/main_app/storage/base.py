@@ -0,0 +1,81 @@
+DEFAULT_CHUNK_SIZE = 256 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+
+
+class StorageError(Exception):
+    pass
+
+
+class StorageBackend:
+    name = None
+
+    def put(self, key, data, content_type=None):
+        raise NotImplementedError
+
+    def get(self, key):
+        return b''.join(self.get_stream(key))
+
+    def get_stream(self, key, chunk_size=DEFAULT_CHUNK_SIZE):
+        raise NotImplementedError
+
+    def get_range(self, key, start, end, chunk_size=DEFAULT_CHUNK_SIZE):
+        # end כולל, כמו בכותרת Range של HTTP
+        raise NotImplementedError
+
+    def head(self, key):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def delete_many(self, keys):
+        for key in keys:
+            self.delete(key)
+
+    def copy(self, source_key, target_key, storage_class=None):
+        # storage_class: מחלקת אחסון זולה יותר (S3); backends אחרים מתעלמים ממנה
+        self.put(target_key, self.get(source_key))
+
+    def presign(self, key, expires_in=3600, filename=None):
+        raise NotImplementedError
+
+    def local_path(self, key):
+        # רק backend מקומי יכול להחזיר נתיב לקובץ (לצורך sendfile)
+        return None
+
+    def create_multipart_upload(self, key, content_type=None):
+        raise NotImplementedError
+
+    def upload_part(self, key, upload_id, part_number, data):
+        raise NotImplementedError
+
+    def complete_multipart_upload(self, key, upload_id, parts):
+        raise NotImplementedError
+
+    def abort_multipart_upload(self, key, upload_id):
+        raise NotImplementedError
+
+    def put_stream(self, key, fileobj, content_type=None, part_size=DEFAULT_PART_SIZE):
+        first_part = fileobj.read(part_size)
+        next_part = fileobj.read(part_size)
+        if not next_part:
+            self.put(key, first_part, content_type=content_type)
+            return len(first_part)
+
+        upload_id = self.create_multipart_upload(key, content_type=content_type)
+        try:
+            parts = []
+            total_size = 0
+            part_number = 1
+            data = first_part
+            while data:
+                etag = self.upload_part(key, upload_id, part_number, data)
+                parts.append({'PartNumber': part_number, 'ETag': etag})
+                total_size += len(data)
+                part_number += 1
+                data, next_part = next_part, fileobj.read(part_size) if next_part else b''
+            self.complete_multipart_upload(key, upload_id, parts)
+            return total_size
+        except Exception:
+            self.abort_multipart_upload(key, upload_id)
+            raise
@@ -0,0 +1,176 @@
+import mmap
+import mimetypes
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from flask import url_for
+from itsdangerous import URLSafeSerializer, BadSignature
+from main_app.storage.base import StorageBackend, StorageError, DEFAULT_CHUNK_SIZE
+
+
+class LocalStorage(StorageBackend):
+    name = 'local'
+    MULTIPART_DIR = '.multipart'
+    SIGNATURE_SALT = 'local-storage'
+
+    def __init__(self, root_path, secret_key=None):
+        self.root_path = os.path.abspath(root_path)
+        self.secret_key = secret_key
+        os.makedirs(self.root_path, exist_ok=True)
+
+    def _path(self, key):
+        path = os.path.abspath(os.path.join(self.root_path, key))
+        if not path.startswith(self.root_path + os.sep):
+            raise StorageError(f"Invalid storage key: {key}")
+        return path
+
+    def _write_atomic(self, path, chunks):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                for chunk in chunks:
+                    tmp_file.write(chunk)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def put(self, key, data, content_type=None):
+        try:
+            self._write_atomic(self._path(key), [data])
+        except OSError as e:
+            raise StorageError(f"Error writing file to local storage: {str(e)}")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as file:
+                return file.read()
+        except OSError as e:
+            raise StorageError(f"Error reading file from local storage: {str(e)}")
+
+    def get_stream(self, key, chunk_size=DEFAULT_CHUNK_SIZE):
+        size = self.head(key)['size']
+        if size == 0:
+            return iter(())
+        return self.get_range(key, 0, size - 1, chunk_size)
+
+    def get_range(self, key, start, end, chunk_size=DEFAULT_CHUNK_SIZE):
+        path = self._path(key)
+        try:
+            file = open(path, 'rb')
+        except OSError as e:
+            raise StorageError(f"Error reading file from local storage: {str(e)}")
+        return self._iter_mmap(file, start, end, chunk_size)
+
+    @staticmethod
+    def _iter_mmap(file, start, end, chunk_size):
+        # קריאה דרך mmap - בלי read() לכל chunk ובלי לטעון את כל הקובץ לזיכרון
+        with file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                end = min(end, len(mapped) - 1)
+                position = start
+                while position <= end:
+                    next_position = min(position + chunk_size, end + 1)
+                    yield mapped[position:next_position]
+                    position = next_position
+
+    def head(self, key):
+        try:
+            stat = os.stat(self._path(key))
+        except OSError as e:
+            raise StorageError(f"Error retrieving file metadata from local storage: {str(e)}")
+        return {
+            'size': stat.st_size,
+            'content_type': mimetypes.guess_type(key)[0],
+            'last_modified': datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)
+        }
+
+    def local_path(self, key):
+        return self._path(key)
+
+    def copy(self, source_key, target_key, storage_class=None):
+        source, target = self._path(source_key), self._path(target_key)
+        try:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            if os.path.exists(target):
+                os.unlink(target)
+            try:
+                # hard link: בלי להעתיק את התוכן; המקור נמחק בנפרד אחרי שה-DB מצביע על היעד
+                os.link(source, target)
+            except OSError:
+                shutil.copyfile(source, target)
+        except OSError as e:
+            raise StorageError(f"Error copying file in local storage: {str(e)}")
+
+    def delete(self, key):
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass  # כמו ב-S3, מחיקה של קובץ שלא קיים אינה שגיאה
+        except OSError as e:
+            raise StorageError(f"Error deleting file from local storage: {str(e)}")
+
+    def _serializer(self):
+        if not self.secret_key:
+            raise StorageError("SECRET_KEY is required to create presigned local storage URLs")
+        return URLSafeSerializer(self.secret_key, salt=self.SIGNATURE_SALT)
+
+    def presign(self, key, expires_in=3600, filename=None):
+        token = self._serializer().dumps({'key': key, 'exp': int(time.time()) + expires_in, 'filename': filename})
+        return url_for('storage.serve_file', token=token, _external=True)
+
+    def resolve_token(self, token):
+        try:
+            payload = self._serializer().loads(token)
+        except BadSignature:
+            raise StorageError("Invalid presigned URL")
+        if payload['exp'] < time.time():
+            raise StorageError("Presigned URL has expired")
+        return payload['key'], payload.get('filename')
+
+    def _multipart_path(self, upload_id, part_number=None):
+        if not upload_id or os.sep in upload_id or upload_id.startswith('.'):
+            raise StorageError(f"Invalid upload id: {upload_id}")
+        path = os.path.join(self.root_path, self.MULTIPART_DIR, upload_id)
+        if part_number is not None:
+            path = os.path.join(path, f"{int(part_number):05d}")
+        return path
+
+    def create_multipart_upload(self, key, content_type=None):
+        self._path(key)
+        upload_id = uuid.uuid4().hex
+        os.makedirs(self._multipart_path(upload_id))
+        return upload_id
+
+    def upload_part(self, key, upload_id, part_number, data):
+        try:
+            with open(self._multipart_path(upload_id, part_number), 'wb') as part_file:
+                part_file.write(data)
+        except OSError as e:
+            raise StorageError(f"Error uploading part {part_number}: {str(e)}")
+        return str(part_number)
+
+    def complete_multipart_upload(self, key, upload_id, parts):
+        def iter_parts():
+            for part in sorted(parts, key=lambda p: p['PartNumber']):
+                with open(self._multipart_path(upload_id, part['PartNumber']), 'rb') as part_file:
+                    while True:
+                        chunk = part_file.read(DEFAULT_CHUNK_SIZE * 4)
+                        if not chunk:
+                            break
+                        yield chunk
+
+        try:
+            self._write_atomic(self._path(key), iter_parts())
+        except OSError as e:
+            raise StorageError(f"Error completing multipart upload: {str(e)}")
+        shutil.rmtree(self._multipart_path(upload_id), ignore_errors=True)
+
+    def abort_multipart_upload(self, key, upload_id):
+        shutil.rmtree(self._multipart_path(upload_id), ignore_errors=True)
@@ -0,0 +1,140 @@
+import threading
+from main_app.storage.base import StorageBackend, StorageError, DEFAULT_CHUNK_SIZE
+
+
+class S3Storage(StorageBackend):
+    name = 's3'
+    MAX_DELETE_BATCH = 1000
+
+    def __init__(self, bucket_name, region_name=None, aws_access_key_id=None, aws_secret_access_key=None,
+                 max_pool_connections=10):
+        self.bucket_name = bucket_name
+        self.client_options = {
+            'region_name': region_name,
+            'aws_access_key_id': aws_access_key_id,
+            'aws_secret_access_key': aws_secret_access_key
+        }
+        self.max_pool_connections = max_pool_connections
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        # boto3/botocore כבדים לטעינה (~200ms) - נטענים ונוצר client רק בפנייה הראשונה ל-S3
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import boto3
+                    from botocore.config import Config
+                    # ב-worker של gevent כל הורדה פתוחה מחזיקה חיבור מה-pool; 10 (ברירת המחדל) היה תקרת המקביליות
+                    config = Config(max_pool_connections=self.max_pool_connections)
+                    self._client = boto3.client('s3', config=config, **self.client_options)
+        return self._client
+
+    def put(self, key, data, content_type=None):
+        extra = {'ContentType': content_type} if content_type else {}
+        try:
+            self.client.put_object(Bucket=self.bucket_name, Key=key, Body=data, **extra)
+        except self.client.exceptions.ClientError as e:
+            raise StorageError(f"Error uploading file to S3: {str(e)}")
+
+    def get(self, key):
+        try:
+            response = self.client.get_object(Bucket=self.bucket_name, Key=key)
+            return response['Body'].read()
+        except self.client.exceptions.ClientError as e:
+            raise StorageError(f"Error retrieving file from S3: {str(e)}")
+
+    def get_stream(self, key, chunk_size=DEFAULT_CHUNK_SIZE):
+        try:
+            response = self.client.get_object(Bucket=self.bucket_name, Key=key)
+        except self.client.exceptions.ClientError as e:
+            raise StorageError(f"Error retrieving file from S3: {str(e)}")
+        return response['Body'].iter_chunks(chunk_size)
+
+    def get_range(self, key, start, end, chunk_size=DEFAULT_CHUNK_SIZE):
+        try:
+            response = self.client.get_object(Bucket=self.bucket_name, Key=key, Range=f"bytes={start}-{end}")
+        except self.client.exceptions.ClientError as e:
+            raise StorageError(f"Error retrieving file range from S3: {str(e)}")
+        return response['Body'].iter_chunks(chunk_size)
+
+    def head(self, key):
+        try:
+            response = self.client.head_object(Bucket=self.bucket_name, Key=key)
+        except self.client.exceptions.ClientError as e:
+            raise StorageError(f"Error retrieving file metadata from S3: {str(e)}")
+        return {
+            'size': response['ContentLength'],
+            'content_type': response.get('ContentType'),
+            'last_modified': response.get('LastModified')
+        }
+
+    def copy(self, source_key, target_key, storage_class=None):
+        # העתקה בצד השרת של S3 - התוכן לא עובר דרך האפליקציה
+        extra = {'StorageClass': storage_class} if storage_class else {}
+        try:
+            self.client.copy_object(Bucket=self.bucket_name, Key=target_key,
+                                    CopySource={'Bucket': self.bucket_name, 'Key': source_key},
+                                    MetadataDirective='COPY', **extra)
+        except self.client.exceptions.ClientError as e:
+            raise StorageError(f"Error copying file in S3: {str(e)}")
+
+    def delete(self, key):
+        try:
+            self.client.delete_object(Bucket=self.bucket_name, Key=key)
+        except self.client.exceptions.ClientError as e:
+            raise StorageError(f"Error deleting file from S3: {str(e)}")
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        for i in range(0, len(keys), self.MAX_DELETE_BATCH):
+            batch = keys[i:i + self.MAX_DELETE_BATCH]
+            try:
+                response = self.client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+                )
+            except self.client.exceptions.ClientError as e:
+                raise StorageError(f"Error deleting files from S3: {str(e)}")
+            if response.get('Errors'):
+                failed = ', '.join(error['Key'] for error in response['Errors'])
+                raise StorageError(f"Error deleting files from S3: {failed}")
+
+    def presign(self, key, expires_in=3600, filename=None):
+        params = {'Bucket': self.bucket_name, 'Key': key}
+        if filename:
+            params['ResponseContentDisposition'] = f'attachment; filename="{filename}"'
+        try:
+            return self.client.generate_presigned_url('get_object', Params=params, ExpiresIn=expires_in)
+        except self.client.exceptions.ClientError as e:
+            raise StorageError(f"Error creating presigned URL: {str(e)}")
+
+    def create_multipart_upload(self, key, content_type=None):
+        extra = {'ContentType': content_type} if content_type else {}
+        try:
+            response = self.client.create_multipart_upload(Bucket=self.bucket_name, Key=key, **extra)
+            return response['UploadId']
+        except self.client.exceptions.ClientError as e:
+            raise StorageError(f"Error starting multipart upload: {str(e)}")
+
+    def upload_part(self, key, upload_id, part_number, data):
+        try:
+            response = self.client.upload_part(Bucket=self.bucket_name, Key=key, UploadId=upload_id,
+                                               PartNumber=part_number, Body=data)
+            return response['ETag']
+        except self.client.exceptions.ClientError as e:
+            raise StorageError(f"Error uploading part {part_number}: {str(e)}")
+
+    def complete_multipart_upload(self, key, upload_id, parts):
+        try:
+            self.client.complete_multipart_upload(Bucket=self.bucket_name, Key=key, UploadId=upload_id,
+                                                  MultipartUpload={'Parts': parts})
+        except self.client.exceptions.ClientError as e:
+            raise StorageError(f"Error completing multipart upload: {str(e)}")
+
+    def abort_multipart_upload(self, key, upload_id):
+        try:
+            self.client.abort_multipart_upload(Bucket=self.bucket_name, Key=key, UploadId=upload_id)
+        except self.client.exceptions.ClientError as e:
+            raise StorageError(f"Error aborting multipart upload: {str(e)}")
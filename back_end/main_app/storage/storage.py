@@ -0,0 +1,37 @@
+import os
+from flask import current_app
+from main_app.storage.base import StorageError
+
+
+def create_backend(app):
+    backend_name = app.config.get('STORAGE_BACKEND', 's3')
+
+    if backend_name == 's3':
+        from main_app.storage.s3_storage import S3Storage
+        return S3Storage(
+            app.config['S3_BUCKET_NAME'],
+            region_name=app.config.get('AWS_REGION'),
+            aws_access_key_id=app.config.get('AWS_ACCESS_KEY_ID'),
+            aws_secret_access_key=app.config.get('AWS_SECRET_ACCESS_KEY'),
+            max_pool_connections=app.config.get('S3_MAX_POOL_CONNECTIONS', 10)
+        )
+
+    if backend_name == 'local':
+        from main_app.storage.local_storage import LocalStorage
+        root_path = app.config.get('LOCAL_STORAGE_PATH') or os.path.join(app.instance_path, 'storage')
+        return LocalStorage(root_path, secret_key=app.config.get('SECRET_KEY'))
+
+    raise StorageError(f"Unknown storage backend: {backend_name}")
+
+
+class Storage:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['storage'] = create_backend(app)
+
+    @property
+    def backend(self):
+        return current_app.extensions['storage']
@@ -0,0 +1,47 @@
+"""add updated_at columns
+
+Revision ID: 7e2a41c9d058
+Revises: 4c1d9e7a2b3f
+Create Date: 2026-10-19 11:03:27.540918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e2a41c9d058'
+down_revision = '4c1d9e7a2b3f'
+branch_labels = None
+depends_on = None
+
+# טבלה -> העמודה שממנה ממלאים את updated_at בשורות קיימות
+TABLES = {
+    'forum_post': 'created_at',
+    'forum_reply': 'created_at',
+    'forum_cluster': 'created_at',
+    'event': 'created_at',
+    'question': 'asked_at',
+    'answer': 'answered_at',
+    'category_lessons': None,
+    'lesson': 'uploaded_at',
+}
+
+
+def upgrade():
+    for table, source_column in TABLES.items():
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+            batch_op.create_index(batch_op.f(f'ix_{table}_updated_at'), ['updated_at'], unique=False)
+
+        if source_column:
+            op.execute(f"UPDATE {table} SET updated_at = COALESCE({source_column}, CURRENT_TIMESTAMP)")
+        else:
+            op.execute(f"UPDATE {table} SET updated_at = CURRENT_TIMESTAMP")
+
+
+def downgrade():
+    for table in reversed(list(TABLES)):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(batch_op.f(f'ix_{table}_updated_at'))
+            batch_op.drop_column('updated_at')
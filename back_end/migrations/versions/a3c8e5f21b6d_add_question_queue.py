@@ -0,0 +1,47 @@
+"""add question queue claims, partial index and queue counters
+
+Revision ID: a3c8e5f21b6d
+Revises: 7e2a41c9d058
+Create Date: 2026-10-19 15:42:10.218734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c8e5f21b6d'
+down_revision = '7e2a41c9d058'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('question', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('claimed_by_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('claim_expires_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_question_claimed_by_id'), ['claimed_by_id'], unique=False)
+        batch_op.create_foreign_key('fk_question_claimed_by_id_user', 'user', ['claimed_by_id'], ['id'])
+
+    op.create_index('ix_question_unanswered_queue', 'question', ['asked_at', 'id'], unique=False,
+                    sqlite_where=sa.text('is_answered = 0'), postgresql_where=sa.text('is_answered = false'))
+
+    op.create_table('queue_stat',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('value', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+    # המונה מתחיל מהמצב הקיים; מכאן והלאה הוא מתעדכן יחד עם כל שאלה/תשובה
+    op.execute("INSERT INTO queue_stat (name, value) "
+               "SELECT 'unanswered_questions', COUNT(*) FROM question WHERE is_answered = false")
+
+
+def downgrade():
+    op.drop_table('queue_stat')
+    op.drop_index('ix_question_unanswered_queue', table_name='question')
+
+    with op.batch_alter_table('question', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_question_claimed_by_id_user', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_question_claimed_by_id'))
+        batch_op.drop_column('claim_expires_at')
+        batch_op.drop_column('claimed_by_id')
@@ -0,0 +1,136 @@
+"""add archive tables for inactive forum threads and events, AUTOINCREMENT ids on the tables they come from
+
+Revision ID: a9c4e6b27f58
+Revises: d4a7c2e91b30
+Create Date: 2026-10-19 22:41:09.317254
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9c4e6b27f58'
+down_revision = 'd4a7c2e91b30'
+branch_labels = None
+depends_on = None
+
+# בלי AUTOINCREMENT ב-SQLite שורה חדשה מקבלת max(id)+1, ואחרי מחיקה של השורה האחרונה המזהה חוזר לשימוש -
+# גם כשהוא כבר קיים בטבלת הארכיון. ב-Postgres ה-sequence לא חוזר אחורה ואין מה לשנות
+ACTIVE_TABLES = ['forum_post', 'forum_reply', 'attachment', 'event', 'event_image']
+
+
+def rebuild_active_tables(autoincrement):
+    # batch בונה כל טבלה מחדש, ו-DROP TABLE של טבלת הורה שיש לה שורות בן נכשל כשהאכיפה פעילה.
+    # בתוך טרנזקציה ה-PRAGMA לא עושה כלום, ולכן הוא רץ ב-autocommit
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    with op.get_context().autocommit_block():
+        op.execute("PRAGMA foreign_keys = OFF")
+    try:
+        for table in ACTIVE_TABLES:
+            with op.batch_alter_table(table, schema=None, recreate='always',
+                                      table_kwargs={'sqlite_autoincrement': autoincrement}):
+                pass
+    finally:
+        with op.get_context().autocommit_block():
+            op.execute("PRAGMA foreign_keys = ON")
+
+
+def upgrade():
+    # המזהים נשמרים מהטבלאות הפעילות, ולכן בלי autoincrement ובלי מפתחות זרים
+    op.create_table('archived_forum_post',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('title', sa.String(length=100), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('author_id', sa.Integer(), nullable=False),
+        sa.Column('cluster_id', sa.Integer(), nullable=True),
+        sa.Column('reply_count', sa.Integer(), nullable=False),
+        sa.Column('last_reply_at', sa.DateTime(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('archived_forum_post', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_archived_forum_post_cluster_id'), ['cluster_id'], unique=False)
+
+    op.create_table('archived_forum_reply',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('author_id', sa.Integer(), nullable=False),
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('archived_forum_reply', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_archived_forum_reply_post_id'), ['post_id'], unique=False)
+
+    op.create_table('archived_attachment',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=False),
+        sa.Column('s3_key', sa.String(length=300), nullable=False),
+        sa.Column('file_type', sa.String(length=50), nullable=True),
+        sa.Column('file_size', sa.Integer(), nullable=True),
+        sa.Column('upload_date', sa.DateTime(), nullable=True),
+        sa.Column('post_id', sa.Integer(), nullable=True),
+        sa.Column('reply_id', sa.Integer(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('s3_key')
+    )
+    with op.batch_alter_table('archived_attachment', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_archived_attachment_post_id'), ['post_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_archived_attachment_reply_id'), ['reply_id'], unique=False)
+
+    op.create_table('archived_event',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('title', sa.String(length=100), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    op.create_table('archived_event_image',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('s3_key', sa.String(length=300), nullable=False),
+        sa.Column('file_name', sa.String(length=255), nullable=False),
+        sa.Column('file_size', sa.Integer(), nullable=True),
+        sa.Column('uploaded_at', sa.DateTime(), nullable=True),
+        sa.Column('event_id', sa.Integer(), nullable=False),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('s3_key')
+    )
+    with op.batch_alter_table('archived_event_image', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_archived_event_image_event_id'), ['event_id'], unique=False)
+
+    # הארכיון עוד ריק; ההעתקה ב-batch מעדכנת את sqlite_sequence למזהה הגבוה שכבר בטבלה
+    rebuild_active_tables(autoincrement=True)
+
+
+def downgrade():
+    rebuild_active_tables(autoincrement=False)
+
+    with op.batch_alter_table('archived_event_image', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_archived_event_image_event_id'))
+
+    op.drop_table('archived_event_image')
+    op.drop_table('archived_event')
+    with op.batch_alter_table('archived_attachment', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_archived_attachment_reply_id'))
+        batch_op.drop_index(batch_op.f('ix_archived_attachment_post_id'))
+
+    op.drop_table('archived_attachment')
+    with op.batch_alter_table('archived_forum_reply', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_archived_forum_reply_post_id'))
+
+    op.drop_table('archived_forum_reply')
+    with op.batch_alter_table('archived_forum_post', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_archived_forum_post_cluster_id'))
+
+    op.drop_table('archived_forum_post')
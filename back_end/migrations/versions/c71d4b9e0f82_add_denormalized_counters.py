@@ -0,0 +1,88 @@
+"""add denormalized counters and foreign key indexes
+
+Revision ID: c71d4b9e0f82
+Revises: a3c8e5f21b6d
+Create Date: 2026-10-19 17:05:48.663102
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c71d4b9e0f82'
+down_revision = 'a3c8e5f21b6d'
+branch_labels = None
+depends_on = None
+
+# טבלה -> עמודות המונה
+COUNTERS = {
+    'question': [sa.Column('answer_count', sa.Integer(), nullable=False, server_default='0')],
+    'forum_post': [sa.Column('reply_count', sa.Integer(), nullable=False, server_default='0'),
+                   sa.Column('last_reply_at', sa.DateTime(), nullable=True)],
+    'forum_cluster': [sa.Column('post_count', sa.Integer(), nullable=False, server_default='0')],
+    'category_lessons': [sa.Column('lesson_count', sa.Integer(), nullable=False, server_default='0')],
+}
+
+# טבלת ילדים -> עמודת המפתח הזר; בלי האינדקס כל עדכון/מילוי של מונה סורק את כל הטבלה
+FOREIGN_KEY_INDEXES = {
+    'answer': 'question_id',
+    'forum_reply': 'post_id',
+    'forum_post': 'cluster_id',
+    'lesson': 'category_id',
+}
+
+BACKFILL = [
+    "UPDATE question SET answer_count = (SELECT COUNT(*) FROM answer WHERE answer.question_id = question.id)",
+    "UPDATE forum_post SET reply_count = (SELECT COUNT(*) FROM forum_reply WHERE forum_reply.post_id = forum_post.id), "
+    "last_reply_at = (SELECT MAX(created_at) FROM forum_reply WHERE forum_reply.post_id = forum_post.id)",
+    "UPDATE forum_cluster SET post_count = (SELECT COUNT(*) FROM forum_post WHERE forum_post.cluster_id = forum_cluster.id)",
+    "UPDATE category_lessons SET lesson_count = "
+    "(SELECT COUNT(*) FROM lesson WHERE lesson.category_id = category_lessons.id)",
+]
+
+
+def without_foreign_key_checks(migrate):
+    # batch בונה כל טבלה מחדש, ו-DROP TABLE של טבלת הורה שיש לה שורות בן נכשל כשהאכיפה פעילה.
+    # בתוך טרנזקציה ה-PRAGMA לא עושה כלום, ולכן הוא רץ ב-autocommit
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+    if sqlite:
+        with op.get_context().autocommit_block():
+            op.execute("PRAGMA foreign_keys = OFF")
+    try:
+        migrate()
+    finally:
+        if sqlite:
+            with op.get_context().autocommit_block():
+                op.execute("PRAGMA foreign_keys = ON")
+
+
+def add_counters():
+    for table, columns in COUNTERS.items():
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            for column in columns:
+                batch_op.add_column(column)
+
+
+def drop_counters():
+    for table, columns in reversed(list(COUNTERS.items())):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            for column in reversed(columns):
+                batch_op.drop_column(column.name)
+
+
+def upgrade():
+    for table, column in FOREIGN_KEY_INDEXES.items():
+        op.create_index(op.f(f'ix_{table}_{column}'), table, [column], unique=False)
+
+    without_foreign_key_checks(add_counters)
+
+    for statement in BACKFILL:
+        op.execute(statement)
+
+
+def downgrade():
+    without_foreign_key_checks(drop_counters)
+
+    for table, column in FOREIGN_KEY_INDEXES.items():
+        op.drop_index(op.f(f'ix_{table}_{column}'), table_name=table)
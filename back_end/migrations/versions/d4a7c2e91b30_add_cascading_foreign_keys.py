@@ -0,0 +1,112 @@
+"""add ON DELETE actions to forum and answer foreign keys, index attachment parents
+
+Revision ID: d4a7c2e91b30
+Revises: b8d3e1f07a26
+Create Date: 2026-10-19 21:05:44.183620
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4a7c2e91b30'
+down_revision = 'b8d3e1f07a26'
+branch_labels = None
+depends_on = None
+
+# ב-SQLite למפתחות הזרים אין שם - batch מחזיר אותם לפי המוסכמה הזו כדי שאפשר יהיה להחליף אותם
+NAMING_CONVENTION = {'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'}
+
+# (טבלה, עמודה, טבלת יעד, פעולה במחיקה)
+FOREIGN_KEYS = [
+    ('forum_post', 'cluster_id', 'forum_cluster', 'SET NULL'),
+    ('forum_reply', 'post_id', 'forum_post', 'CASCADE'),
+    ('attachment', 'post_id', 'forum_post', 'CASCADE'),
+    ('attachment', 'reply_id', 'forum_reply', 'CASCADE'),
+    ('answer', 'question_id', 'question', 'CASCADE'),
+]
+
+ANSWERS_OF = "(SELECT group_concat(answer, ' ') FROM answer WHERE answer.question_id = {question_id})"
+
+# ב-SQLite batch בונה את answer מחדש ו-DROP TABLE מוחק גם את הטריגרים של אינדקס החיפוש
+ANSWER_FTS_TRIGGERS = [
+    f"""CREATE TRIGGER answer_fts_insert AFTER INSERT ON answer BEGIN
+        UPDATE question_fts SET answers = {ANSWERS_OF.format(question_id='new.question_id')}
+        WHERE rowid = new.question_id;
+    END""",
+    f"""CREATE TRIGGER answer_fts_update AFTER UPDATE OF answer, question_id ON answer BEGIN
+        UPDATE question_fts SET answers = {ANSWERS_OF.format(question_id='old.question_id')}
+        WHERE rowid = old.question_id;
+        UPDATE question_fts SET answers = {ANSWERS_OF.format(question_id='new.question_id')}
+        WHERE rowid = new.question_id;
+    END""",
+    f"""CREATE TRIGGER answer_fts_delete AFTER DELETE ON answer BEGIN
+        UPDATE question_fts SET answers = {ANSWERS_OF.format(question_id='old.question_id')}
+        WHERE rowid = old.question_id;
+    END""",
+]
+
+
+def foreign_key_name(table, column):
+    for foreign_key in sa.inspect(op.get_bind()).get_foreign_keys(table):
+        if foreign_key['constrained_columns'] == [column]:
+            return foreign_key['name'] or NAMING_CONVENTION['fk'] % {
+                'table_name': table, 'column_0_name': column, 'referred_table_name': foreign_key['referred_table']}
+    return None
+
+
+def replace_foreign_keys(ondelete):
+    names = {(table, column): foreign_key_name(table, column) for table, column, _, _ in FOREIGN_KEYS}
+    for table in dict.fromkeys(table for table, _, _, _ in FOREIGN_KEYS):
+        with op.batch_alter_table(table, schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+            for fk_table, column, referred, action in FOREIGN_KEYS:
+                if fk_table != table:
+                    continue
+                if names[(table, column)]:
+                    batch_op.drop_constraint(names[(table, column)], type_='foreignkey')
+                batch_op.create_foreign_key(
+                    NAMING_CONVENTION['fk'] % {'table_name': table, 'column_0_name': column,
+                                               'referred_table_name': referred},
+                    referred, [column], ['id'], ondelete=action if ondelete else None)
+
+
+def recreate_answer_triggers():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for trigger in ('answer_fts_insert', 'answer_fts_update', 'answer_fts_delete'):
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    for statement in ANSWER_FTS_TRIGGERS:
+        op.execute(statement)
+
+
+def without_foreign_key_checks(migrate):
+    # batch בונה כל טבלה מחדש, ו-DROP TABLE של טבלת הורה שיש לה שורות בן נכשל כשהאכיפה פעילה.
+    # בתוך טרנזקציה ה-PRAGMA לא עושה כלום, ולכן הוא רץ ב-autocommit
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+    if sqlite:
+        with op.get_context().autocommit_block():
+            op.execute("PRAGMA foreign_keys = OFF")
+    try:
+        migrate()
+    finally:
+        if sqlite:
+            with op.get_context().autocommit_block():
+                op.execute("PRAGMA foreign_keys = ON")
+
+
+def upgrade():
+    without_foreign_key_checks(lambda: replace_foreign_keys(ondelete=True))
+    recreate_answer_triggers()
+    # ה-cascade מחפש את הקבצים של כל תגובה שנמחקת; בלי אינדקס זו סריקה של כל attachment לכל תגובה
+    with op.batch_alter_table('attachment', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_attachment_post_id'), ['post_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_attachment_reply_id'), ['reply_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('attachment', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_attachment_reply_id'))
+        batch_op.drop_index(batch_op.f('ix_attachment_post_id'))
+    without_foreign_key_checks(lambda: replace_foreign_keys(ondelete=False))
+    recreate_answer_triggers()
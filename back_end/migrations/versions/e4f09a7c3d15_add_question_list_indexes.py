@@ -0,0 +1,26 @@
+"""add question list indexes
+
+Revision ID: e4f09a7c3d15
+Revises: c71d4b9e0f82
+Create Date: 2026-10-19 18:21:36.904417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4f09a7c3d15'
+down_revision = 'c71d4b9e0f82'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_question_asked_at_id', 'question', ['asked_at', 'id'], unique=False)
+    op.create_index('ix_question_asker_id_asked_at', 'question', ['asker_id', 'asked_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_question_asker_id_asked_at', table_name='question')
+    op.drop_index('ix_question_asked_at_id', table_name='question')
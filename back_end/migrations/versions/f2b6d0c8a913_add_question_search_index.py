@@ -0,0 +1,76 @@
+"""add FTS5 question search index
+
+Revision ID: f2b6d0c8a913
+Revises: e4f09a7c3d15
+Create Date: 2026-10-19 19:48:02.357190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b6d0c8a913'
+down_revision = 'e4f09a7c3d15'
+branch_labels = None
+depends_on = None
+
+ANSWERS_OF = "(SELECT group_concat(answer, ' ') FROM answer WHERE answer.question_id = {question_id})"
+
+UPGRADE = [
+    "CREATE VIRTUAL TABLE question_fts USING fts5(question, answers, tokenize = 'unicode61 remove_diacritics 2')",
+    "CREATE VIRTUAL TABLE question_fts_vocab USING fts5vocab(question_fts, 'row')",
+    """CREATE TRIGGER question_fts_insert AFTER INSERT ON question BEGIN
+        INSERT INTO question_fts (rowid, question, answers) VALUES (new.id, new.question, '');
+    END""",
+    """CREATE TRIGGER question_fts_update AFTER UPDATE OF question ON question BEGIN
+        UPDATE question_fts SET question = new.question WHERE rowid = new.id;
+    END""",
+    """CREATE TRIGGER question_fts_delete AFTER DELETE ON question BEGIN
+        DELETE FROM question_fts WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER answer_fts_insert AFTER INSERT ON answer BEGIN
+        UPDATE question_fts SET answers = {ANSWERS_OF.format(question_id='new.question_id')}
+        WHERE rowid = new.question_id;
+    END""",
+    f"""CREATE TRIGGER answer_fts_update AFTER UPDATE OF answer, question_id ON answer BEGIN
+        UPDATE question_fts SET answers = {ANSWERS_OF.format(question_id='old.question_id')}
+        WHERE rowid = old.question_id;
+        UPDATE question_fts SET answers = {ANSWERS_OF.format(question_id='new.question_id')}
+        WHERE rowid = new.question_id;
+    END""",
+    f"""CREATE TRIGGER answer_fts_delete AFTER DELETE ON answer BEGIN
+        UPDATE question_fts SET answers = {ANSWERS_OF.format(question_id='old.question_id')}
+        WHERE rowid = old.question_id;
+    END""",
+    # מילוי ראשוני מהשאלות והתשובות הקיימות
+    f"""INSERT INTO question_fts (rowid, question, answers)
+        SELECT question.id, question.question, COALESCE({ANSWERS_OF.format(question_id='question.id')}, '')
+        FROM question""",
+]
+
+DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS answer_fts_delete",
+    "DROP TRIGGER IF EXISTS answer_fts_update",
+    "DROP TRIGGER IF EXISTS answer_fts_insert",
+    "DROP TRIGGER IF EXISTS question_fts_delete",
+    "DROP TRIGGER IF EXISTS question_fts_update",
+    "DROP TRIGGER IF EXISTS question_fts_insert",
+    "DROP TABLE IF EXISTS question_fts_vocab",
+    "DROP TABLE IF EXISTS question_fts",
+]
+
+
+def upgrade():
+    # FTS5 קיים רק ב-SQLite; במסדים אחרים החיפוש נופל ל-LIKE
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for statement in UPGRADE:
+        op.execute(statement)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for statement in DOWNGRADE:
+        op.execute(statement)
@@ -0,0 +1,45 @@
+import pytest
+from config import Config
+from app import create_app
+from main_app.extensions import db
+
+
+@pytest.fixture
+def app(tmp_path):
+    class TestConfig(Config):
+        TESTING = True
+        SECRET_KEY = 'test-secret'
+        JWT_SECRET_KEY = 'test-jwt-secret'
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'test.db'}"
+        STORAGE_BACKEND = 'local'
+        LOCAL_STORAGE_PATH = str(tmp_path / 'storage')
+        RESPONSE_CACHE_BACKEND = 'none'
+        SLOW_QUERY_LOG_PATH = str(tmp_path / 'slow_queries.jsonl')
+        METRICS_MULTIPROC_DIR = None
+        MEDIA_ANALYSIS_ASYNC = False
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def user_id(app):
+    from main_app.models.models import User
+    user = User(firstname='Test', lastname='User', email='test@example.com', class_cycle=1)
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+def value(column, row_id):
+    # קריאה ישירה מה-DB: המונים מתעדכנים ב-UPDATE יחסי, בלי לעבור דרך ה-session
+    return db.session.execute(db.select(column).where(column.class_.id == row_id)).scalar()
@@ -0,0 +1,125 @@
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import func, select, update
+from main_app import archive
+from main_app.extensions import db, storage
+from main_app.models.models import (ForumPost, ForumReply, Attachment, Event, EventImage, ArchivedForumPost,
+                                    ArchivedForumReply, ArchivedAttachment, ArchivedEvent)
+from main_app.services.events_service import EventService
+from main_app.services.forum_service import ForumService
+
+LONG_AGO = datetime(2020, 1, 1)
+
+
+def stored(key):
+    return os.path.exists(storage.backend.local_path(key))
+
+
+def ids(model):
+    return set(db.session.execute(select(model.id)).scalars())
+
+
+def age_everything():
+    db.session.execute(update(ForumPost).values(created_at=LONG_AGO, updated_at=LONG_AGO, last_reply_at=LONG_AGO))
+    db.session.execute(update(ForumReply).values(created_at=LONG_AGO))
+    db.session.execute(update(Event).values(created_at=LONG_AGO, updated_at=LONG_AGO))
+    db.session.execute(update(EventImage).values(uploaded_at=LONG_AGO))
+    db.session.commit()
+
+
+def thread(user_id, title):
+    post = ForumService.create_post(title, 'content', user_id)
+    attachment = ForumService().add_attachment_to_post(post.id, 'notes.txt', b'data', 'text/plain')
+    reply = ForumService.create_reply('reply', user_id, post.id)
+    return post.id, reply.id, attachment.id
+
+
+def test_ids_are_not_reused_after_archiving_or_deleting(app, user_id):
+    old = [thread(user_id, f"Old {i}") for i in range(2)]
+    age_everything()
+    assert archive.run(older_than_days=30)['rows']['forum_post'] == 2
+
+    # הטבלאות הפעילות ריקות; בלי AUTOINCREMENT השרשור הבא היה מקבל מחדש את המזהה 1
+    deleted, _, _ = thread(user_id, 'Deleted')
+    ForumService().delete_post(deleted)
+    post_id, reply_id, attachment_id = thread(user_id, 'New')
+
+    assert post_id not in ids(ArchivedForumPost) | {deleted}
+    assert reply_id not in ids(ArchivedForumReply)
+    assert attachment_id not in ids(ArchivedAttachment)
+    assert ForumService.get_archived_post(old[0][0]).title == 'Old 0'
+    assert ForumService().get_attachment(attachment_id).s3_key == f"attachments/{post_id}/notes.txt"
+
+    age_everything()
+    totals = archive.run(older_than_days=30)
+    assert totals['rows']['forum_post'] == 1
+    assert ids(ArchivedForumPost) == {old[0][0], old[1][0], post_id}
+
+
+def test_archived_thread_is_served_from_the_archive(app, client, user_id):
+    post_id, reply_id, attachment_id = thread(user_id, 'Old')
+    age_everything()
+    active_id, _, _ = thread(user_id, 'Active')
+
+    totals = archive.run(older_than_days=30)
+
+    assert totals['rows'] == {'forum_post': 1, 'forum_reply': 1, 'attachment': 1, 'event': 0, 'event_image': 0}
+    assert totals['bytes']['threads'] == 4
+    assert ids(ForumPost) == {active_id}
+    assert not stored(f"attachments/{post_id}/notes.txt")
+    assert stored(f"archive/attachments/{post_id}/notes.txt")
+
+    assert [post['id'] for post in client.get('/posts').get_json()] == [active_id]
+    archived = client.get('/posts?archived=true').get_json()
+    assert [post['id'] for post in archived] == [post_id]
+    assert archived[0]['attachments'][0]['s3_key'] == f"archive/attachments/{post_id}/notes.txt"
+
+    replies = client.get(f"/posts/{post_id}/replies")
+    assert replies.status_code == 200
+    assert [reply['id'] for reply in replies.get_json()] == [reply_id]
+    assert client.get('/posts/999/replies').status_code == 404
+
+    download = client.get(f"/attachments/{attachment_id}/download")
+    assert download.status_code == 200
+    assert download.get_data() == b'data'
+
+
+def test_archived_event_is_served_from_the_archive(app, client):
+    service = EventService()
+    event_id = service.create_event('Siyum', 'Old event').id
+    image_id = service.add_image_to_event(event_id, b'png', 'photo.png').id
+    age_everything()
+    active_id = service.create_event('Upcoming').id
+
+    archive.run(older_than_days=30)
+
+    assert ids(Event) == {active_id}
+    assert ids(ArchivedEvent) == {event_id}
+    detail = client.get(f"/{event_id}")
+    assert detail.status_code == 200
+    assert detail.get_json()['title'] == 'Siyum'
+    images = client.get(f"/{event_id}/images").get_json()
+    assert [item['id'] for item in images] == [image_id]
+    assert images[0]['s3_key'].startswith('archive/')
+    assert stored(images[0]['s3_key'])
+
+
+def test_recent_activity_keeps_a_thread_active(app, user_id):
+    post_id, _, _ = thread(user_id, 'Old but busy')
+    age_everything()
+    ForumService.create_reply('still talking', user_id, post_id)
+
+    assert archive.pending(datetime.utcnow() - timedelta(days=30))['threads'] == 0
+    archive.run(older_than_days=30)
+    assert ids(ForumPost) == {post_id}
+
+
+def test_dry_run_reports_without_moving(app, user_id):
+    thread(user_id, 'Old')
+    age_everything()
+
+    output = app.test_cli_runner().invoke(args=['archive', 'run', '--older-than-days', '30', '--dry-run']).output
+
+    assert output.startswith('1 threads and 0 events with no activity for 30 days')
+    assert db.session.execute(select(func.count()).select_from(ArchivedForumPost)).scalar() == 0
+    assert len(ids(ForumPost)) == 1
@@ -0,0 +1,100 @@
+import os
+from sqlalchemy import func, select
+from main_app.extensions import db, storage
+from main_app.models.models import ForumPost, ForumReply, Attachment, Question, Answer
+from main_app.services.forum_service import ForumService
+from main_app.services.questions_service import QuestionAnswerService
+from main_app.storage.base import StorageError
+
+
+def count(model):
+    return db.session.execute(select(func.count()).select_from(model)).scalar()
+
+
+def stored(key):
+    return os.path.exists(storage.backend.local_path(key))
+
+
+def reply_attachment(reply_id, key):
+    storage.backend.put(key, b'data', content_type='text/plain')
+    db.session.add(Attachment(filename='notes.txt', s3_key=key, file_type='text/plain', file_size=4, reply_id=reply_id))
+    db.session.commit()
+
+
+def thread(user_id, title='Thread', cluster_id=None):
+    post = ForumService.create_post(title, 'content', user_id, cluster_id)
+    ForumService().add_attachment_to_post(post.id, 'post.txt', b'data', 'text/plain')
+    replies = [ForumService.create_reply(f"reply {i}", user_id, post.id) for i in range(3)]
+    reply_attachment(replies[0].id, f"attachments/{post.id}/reply.txt")
+    return post, replies
+
+
+def test_delete_post_cascades_to_replies_attachments_and_files(app, user_id):
+    post, _ = thread(user_id)
+    other, _ = thread(user_id, title='Other')
+
+    ForumService().delete_post(post.id)
+
+    assert db.session.get(ForumPost, post.id) is None
+    assert db.session.execute(select(func.count()).where(ForumReply.post_id == post.id)).scalar() == 0
+    assert count(ForumReply) == 3
+    assert count(Attachment) == 2
+    assert not stored(f"attachments/{post.id}/post.txt")
+    assert not stored(f"attachments/{post.id}/reply.txt")
+    assert stored(f"attachments/{other.id}/post.txt")
+
+
+def test_delete_reply_removes_only_its_attachments(app, user_id):
+    post, replies = thread(user_id)
+
+    ForumService().delete_reply(replies[0].id)
+
+    assert count(ForumReply) == 2
+    assert db.session.execute(select(Attachment.s3_key)).scalars().all() == [f"attachments/{post.id}/post.txt"]
+    assert not stored(f"attachments/{post.id}/reply.txt")
+    assert stored(f"attachments/{post.id}/post.txt")
+
+
+def test_delete_cluster_keeps_its_posts(app, user_id):
+    cluster = ForumService.create_cluster('General', user_id)
+    post, _ = thread(user_id, cluster_id=cluster.id)
+
+    ForumService.delete_cluster(cluster.id)
+
+    db.session.expire_all()
+    remaining = db.session.get(ForumPost, post.id)
+    assert remaining is not None and remaining.cluster_id is None
+    assert count(ForumReply) == 3
+
+
+def test_delete_question_cascades_to_answers(app, user_id):
+    question = QuestionAnswerService.create_question('Which siddur?', user_id)
+    QuestionAnswerService.create_answer('Any', user_id, question.id)
+    kept = QuestionAnswerService.create_question('Another', user_id)
+    QuestionAnswerService.create_answer('Sure', user_id, kept.id)
+
+    QuestionAnswerService.delete_question(question.id)
+
+    assert db.session.execute(select(Answer.question_id)).scalars().all() == [kept.id]
+    assert count(Question) == 1
+
+
+def test_storage_failure_after_commit_leaves_only_orphaned_files(app, user_id, caplog):
+    class FailingDeletes:
+        def __init__(self, backend):
+            self.backend = backend
+
+        def __getattr__(self, name):
+            return getattr(self.backend, name)
+
+        def delete_many(self, keys):
+            raise StorageError("storage unavailable")
+
+    post, _ = thread(user_id)
+
+    ForumService(storage_backend=FailingDeletes(storage.backend)).delete_post(post.id)
+
+    assert db.session.get(ForumPost, post.id) is None
+    assert count(Attachment) == 0
+    assert stored(f"attachments/{post.id}/post.txt")
+    assert "Failed to delete 2 stored files" in caplog.text
@@ -0,0 +1,29 @@
+from main_app.services.forum_service import ForumService
+
+
+def test_collection_etag_changes_when_the_newest_row_is_deleted(client, user_id):
+    ForumService.create_cluster('General', user_id)
+    newest = ForumService.create_cluster('Announcements', user_id)
+
+    first = client.get('/clusters')
+    assert first.status_code == 200
+    assert 'Last-Modified' not in first.headers
+    assert client.get('/clusters', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    # max(updated_at) חוזר אחורה - רק ה-ETag מבחין בשינוי
+    ForumService.delete_cluster(newest.id)
+    assert client.get('/clusters', headers={'If-None-Match': first.headers['ETag']}).status_code == 200
+
+
+def test_download_keeps_the_file_etag_for_if_range(client, user_id):
+    post = ForumService.create_post('Siddur scans', 'Attached', user_id)
+    attachment = ForumService().add_attachment_to_post(post.id, 'page.txt', b'0123456789', 'text/plain')
+
+    full = client.get(f'/attachments/{attachment.id}/download')
+    assert full.status_code == 200
+    etag = full.headers['ETag']
+    assert not etag.startswith('W/')
+
+    partial = client.get(f'/attachments/{attachment.id}/download', headers={'Range': 'bytes=2-4', 'If-Range': etag})
+    assert partial.status_code == 206
+    assert partial.data == b'234'
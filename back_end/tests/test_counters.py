@@ -0,0 +1,103 @@
+from sqlalchemy import update
+from main_app import counters
+from main_app.extensions import db
+from main_app.models.models import ForumPost, ForumCluster, Question, QueueStat, CategoryLessons
+from main_app.services.forum_service import ForumService
+from main_app.services.lesson_service import LessonService
+from main_app.services.questions_service import QuestionAnswerService
+from conftest import value
+
+
+def unanswered():
+    return db.session.execute(
+        db.select(QueueStat.value).where(QueueStat.name == QueueStat.UNANSWERED_QUESTIONS)).scalar()
+
+
+def test_reply_writes_maintain_post_counters(app, user_id):
+    cluster = ForumService.create_cluster('General', user_id)
+    post = ForumService.create_post('Shabbat times', 'When?', user_id, cluster.id)
+    first = ForumService.create_reply('18:05', user_id, post.id)
+    second = ForumService.create_reply('18:07 in Jerusalem', user_id, post.id)
+
+    assert value(ForumCluster.post_count, cluster.id) == 1
+    assert value(ForumPost.reply_count, post.id) == 2
+    assert value(ForumPost.last_reply_at, post.id) == second.created_at
+
+    ForumService().delete_reply(second.id)
+    assert value(ForumPost.reply_count, post.id) == 1
+    assert value(ForumPost.last_reply_at, post.id) == first.created_at
+
+    ForumService().delete_post(post.id)
+    assert value(ForumCluster.post_count, cluster.id) == 0
+
+
+def test_answer_writes_maintain_question_counters(app, user_id):
+    question = QuestionAnswerService.create_question('Is the eruv up?', user_id)
+    assert unanswered() == 1
+
+    answer = QuestionAnswerService.create_answer('Yes', user_id, question.id)
+    assert value(Question.answer_count, question.id) == 1
+    assert value(Question.is_answered, question.id) is True
+    assert unanswered() == 0
+
+    # בלי תשובות השאלה חוזרת לתור
+    QuestionAnswerService.delete_answer(answer.id)
+    assert value(Question.answer_count, question.id) == 0
+    assert value(Question.is_answered, question.id) is False
+    assert unanswered() == 1
+
+
+def test_lesson_writes_maintain_category_counters(app):
+    first = LessonService.create_category('Gemara')
+    second = LessonService.create_category('Halacha')
+    lesson = LessonService().create_lesson('Bava Metzia 2a', None, True, b'not really audio', 'daf.mp3', first.id)
+    assert value(CategoryLessons.lesson_count, first.id) == 1
+
+    # מהטופס המזהה מגיע כמחרוזת - אותה קטגוריה לא נוגעת במונה (וב-updated_at של הקטגוריה)
+    touched = value(CategoryLessons.updated_at, first.id)
+    LessonService().update_lesson(lesson.id, title='Bava Metzia 2b', category_id=str(first.id))
+    assert value(CategoryLessons.lesson_count, first.id) == 1
+    assert value(CategoryLessons.updated_at, first.id) == touched
+
+    LessonService().update_lesson(lesson.id, category_id=str(second.id))
+    assert value(CategoryLessons.lesson_count, first.id) == 0
+    assert value(CategoryLessons.lesson_count, second.id) == 1
+
+
+def test_repair_fixes_only_drifted_counters(app, user_id):
+    cluster = ForumService.create_cluster('General', user_id)
+    drifted = ForumService.create_post('Drifted', 'x', user_id, cluster.id)
+    correct = ForumService.create_post('Correct', 'x', user_id, cluster.id)
+    reply = ForumService.create_reply('r', user_id, drifted.id)
+    ForumService.create_reply('r', user_id, correct.id)
+    QuestionAnswerService.create_question('Open question', user_id)
+
+    db.session.execute(update(ForumPost).where(ForumPost.id == drifted.id).values(reply_count=7, last_reply_at=None))
+    db.session.execute(update(ForumCluster).values(post_count=0))
+    db.session.execute(update(QueueStat).values(value=5))
+    db.session.commit()
+
+    fixed = counters.repair()
+    assert fixed['forum_post.reply_count'] == 1
+    assert fixed['forum_post.last_reply_at'] == 1
+    assert fixed['forum_cluster.post_count'] == 1
+    assert fixed['queue_stat.unanswered_questions'] == 1
+    assert fixed['question.answer_count'] == 0
+
+    assert value(ForumPost.reply_count, drifted.id) == 1
+    assert value(ForumPost.last_reply_at, drifted.id) == reply.created_at
+    assert value(ForumCluster.post_count, cluster.id) == 2
+    assert unanswered() == 1
+    assert set(counters.repair().values()) == {0}
+
+
+def test_repair_only_touches_the_requested_counters(app, user_id):
+    post = ForumService.create_post('Post', 'x', user_id)
+    ForumService.create_reply('r', user_id, post.id)
+    db.session.execute(update(ForumPost).values(reply_count=3))
+    db.session.commit()
+
+    assert counters.repair(['question.answer_count']) == {'question.answer_count': 0}
+    assert value(ForumPost.reply_count, post.id) == 3
+    assert counters.repair(['forum_post.reply_count']) == {'forum_post.reply_count': 1}
+    assert value(ForumPost.reply_count, post.id) == 1